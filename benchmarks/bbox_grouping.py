@@ -0,0 +1,68 @@
+"""
+Benchmark of axis label grouping (`get_column_bboxes` / `get_row_bboxes`), with
+and without a single outlier-size box.
+
+Usage: python -m benchmarks.bbox_grouping [--n-boxes 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from geometry import get_column_bboxes, get_row_bboxes
+
+
+def dashboard_bboxes(n_boxes: int, seed: int = 0) -> np.ndarray:
+    """
+    Token boxes of a dense dashboard: text lines of words laid out in a grid,
+    with a share of randomly placed annotations on top.
+    """
+    rng = np.random.default_rng(seed)
+    n_grid = int(n_boxes * 0.8)
+    per_line = 20
+    line = np.arange(n_grid) // per_line
+    word = np.arange(n_grid) % per_line
+    left = word * 90 + rng.integers(0, 5, n_grid)
+    top = line * 18 + rng.integers(0, 3, n_grid)
+    width = rng.integers(20, 80, n_grid)
+    height = rng.integers(10, 14, n_grid)
+    grid = np.stack([left, top, left + width, top + height], axis=1)
+
+    n_free = n_boxes - n_grid
+    left = rng.integers(0, per_line * 90, n_free)
+    top = rng.integers(0, line.max(initial=0) * 18 + 18, n_free)
+    width = rng.integers(10, 120, n_free)
+    height = rng.integers(8, 20, n_free)
+    free = np.stack([left, top, left + width, top + height], axis=1)
+    return rng.permutation(np.concatenate([grid, free]))
+
+
+def run(n_boxes: int = 10_000, repeat: int = 5) -> dict:
+    bboxes = dashboard_bboxes(n_boxes)
+    # A single banner as wide and tall as the dashboard, away from the text
+    right, bottom = bboxes[:, 2:].max(axis=0)
+    banner = [[right + 10, bottom + 10, 2 * right + 10, 2 * bottom + 10]]
+    results = {"n_boxes": n_boxes}
+    for name, func in (("columns", get_column_bboxes), ("rows", get_row_bboxes)):
+        for suffix, boxes in (("", bboxes), ("_with_banner", [*bboxes, *banner])):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                ids, _ = func(boxes)
+                timings.append(time.perf_counter() - start)
+            results[name + suffix] = {
+                "groups": len(ids),
+                "best_s": min(timings),
+                "median_s": float(np.median(timings)),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument("--n-boxes", type=int, default=10_000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+    print(json.dumps(run(args.n_boxes, args.repeat), indent=2))
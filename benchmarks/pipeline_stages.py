@@ -0,0 +1,214 @@
+"""
+Per-stage benchmark of the extraction pipeline on generated charts.
+
+Charts are produced with `tests/data_generation.py` for every combination of
+the given sizes, DPIs, series lengths and scale types. OCR runs through a
+fixture by default (tick labels recorded while drawing the chart), so the
+CPU-only stages are measured deterministically; use `--ocr tesseract` to time
+the real OCR stage.
+
+Usage:
+    python -m benchmarks.pipeline_stages --width 1200 2400 --points 250 1000
+    python -m benchmarks.pipeline_stages --output bench.json
+    python -m benchmarks.pipeline_stages --baseline bench.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+
+import cv2
+import matplotlib
+import numpy as np
+import pandas as pd
+
+matplotlib.use("Agg")
+
+from chart_extraction import ChartPipeline  # noqa: E402
+from image_io import load_image  # noqa: E402
+from instrumentation import ExtractionMetrics  # noqa: E402
+from ocr_backends import FakeOcrBackend, PytesseractBackend  # noqa: E402
+from tests.data_generation import (  # noqa: E402
+    generate_linear_scaled,
+    generate_log_scaled,
+)
+
+STAGES = ChartPipeline.STAGES
+START_DATE = "2023-01-02"
+
+
+def generate_chart(out_dir, width, height, dpi, points, scale, seed=0):
+    """Draw a chart and return (image_path, (words, bboxes) of its tick labels)."""
+    np.random.seed(seed)
+    end_date = pd.bdate_range(START_DATE, periods=points)[-1]
+    name = f"{scale}_{width}x{height}_{dpi}dpi_{points}"
+    generate = generate_log_scaled if scale == "log" else generate_linear_scaled
+    image_path = os.path.join(out_dir, f"{name}.png")
+    tokens = generate(
+        start_date=START_DATE,
+        end_date=end_date,
+        output_csv=os.path.join(out_dir, f"{name}.csv"),
+        output_image=image_path,
+        figsize=(width / dpi, height / dpi),
+        dpi=dpi,
+    )
+    return image_path, tokens
+
+
+def run_stages(image_path, backend):
+    """Run the pipeline stage by stage; return {stage: seconds}."""
+    metrics = ExtractionMetrics()
+    ChartPipeline(ocr_backend=backend, metrics=metrics).run(image_path)
+    return {stage: wall for stage, (wall, _) in metrics.stages.items()}
+
+
+def run_case(image_path, backend, repeat):
+    samples = {stage: [] for stage in STAGES}
+    for _ in range(repeat):
+        for stage, seconds in run_stages(image_path, backend).items():
+            samples[stage].append(seconds)
+    stages = {
+        stage: {"median_s": float(np.median(values)), "min_s": float(min(values))}
+        for stage, values in samples.items()
+    }
+    return stages, sum(s["median_s"] for s in stages.values())
+
+
+def run(args):
+    cases = []
+    recorded = FakeOcrBackend()
+    fixture = FakeOcrBackend.load(args.ocr_fixture) if args.ocr_fixture else None
+    with tempfile.TemporaryDirectory() as out_dir:
+        grid = itertools.product(
+            args.width, args.height, args.dpi, args.points, args.scale
+        )
+        for width, height, dpi, points, scale in grid:
+            image_path, (words, bboxes) = generate_chart(
+                out_dir, width, height, dpi, points, scale, seed=args.seed
+            )
+            gray = load_image(image_path, color=False)
+            if args.ocr == "tesseract":
+                backend = PytesseractBackend()
+                recorded.add(gray, *backend.recognize(gray))
+            else:
+                recorded.add(gray, words, bboxes)
+                backend = fixture or recorded
+
+            case = {
+                "name": os.path.splitext(os.path.basename(image_path))[0],
+                "params": {
+                    "width": width,
+                    "height": height,
+                    "dpi": dpi,
+                    "points": points,
+                    "scale": scale,
+                },
+            }
+            try:
+                case["stages"], case["total_s"] = run_case(
+                    image_path, backend, args.repeat
+                )
+            except Exception as e:
+                case["error"] = f"{type(e).__name__}: {e}"
+            cases.append(case)
+
+    if args.record_fixture:
+        recorded.save(args.record_fixture)
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+        },
+        "ocr": args.ocr if not args.ocr_fixture else f"fixture:{args.ocr_fixture}",
+        "repeat": args.repeat,
+        "cases": cases,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare stage medians against a baseline report.
+
+    :return: list of regressions (case, stage, baseline_s, current_s, ratio)
+    """
+    baseline_cases = {case["name"]: case for case in baseline["cases"]}
+    regressions = []
+    for case in results["cases"]:
+        base = baseline_cases.get(case["name"])
+        if not base or "stages" not in base or "stages" not in case:
+            continue
+        for stage, timing in case["stages"].items():
+            base_s = base["stages"].get(stage, {}).get("median_s")
+            if not base_s:
+                continue
+            ratio = timing["median_s"] / base_s
+            timing["baseline_median_s"] = base_s
+            timing["ratio"] = ratio
+            if ratio > threshold:
+                regressions.append(
+                    (case["name"], stage, base_s, timing["median_s"], ratio)
+                )
+    return regressions
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__.strip().splitlines()[0],
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    arg_parser.add_argument("--width", type=int, nargs="+", default=[1200])
+    arg_parser.add_argument("--height", type=int, nargs="+", default=[600])
+    arg_parser.add_argument("--dpi", type=int, nargs="+", default=[100])
+    arg_parser.add_argument("--points", type=int, nargs="+", default=[500])
+    arg_parser.add_argument(
+        "--scale", nargs="+", default=["linear"], choices=["linear", "log"]
+    )
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument(
+        "--ocr",
+        default="fixture",
+        choices=["fixture", "tesseract"],
+        help="fixture - replay recorded OCR tokens, tesseract - run pytesseract",
+    )
+    arg_parser.add_argument("--ocr-fixture", help="load OCR tokens from this file")
+    arg_parser.add_argument(
+        "--record-fixture", help="save the OCR tokens used in this run to this file"
+    )
+    arg_parser.add_argument("--output", help="write the JSON report to this file")
+    arg_parser.add_argument("--baseline", help="JSON report to compare against")
+    arg_parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="fail if a stage is slower than baseline by this factor",
+    )
+    args = arg_parser.parse_args(argv)
+
+    results = run(args)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        results["regressions"] = [
+            dict(zip(("case", "stage", "baseline_s", "current_s", "ratio"), r))
+            for r in regressions
+        ]
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    print(report)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
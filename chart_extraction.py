@@ -1,11 +1,41 @@
+import copy
 import os
+import time
+from collections import deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, NamedTuple, Optional
 
 import cv2
 import numpy as np
 
-from geometry import cluster_data, cut_chart_area, get_column_bboxes, get_row_bboxes
-from ocr_utils import ocr, texts_to_datetimes, texts_to_numbers
+from color_segmentation import split_series_masks
+from function import datetime64_to_datetimes
+from gap_filling import GAP_FILL_MODES, fill_gaps, iter_fill_gaps
+from geometry import (
+    cut_chart_area,
+    cut_chart_area_pyramid,
+    detect_grid,
+    find_clusters,
+    find_panels,
+    get_column_bboxes,
+    get_row_bboxes,
+    min_pool_pyramid,
+    remove_grid,
+)
+from image_io import ImageSource, ink_mask, load_image
+from instrumentation import ExtractionMetrics, NullMetrics
+from layout_cache import ChartLayout, LayoutCache
+from ocr_backends import OcrBackend
+from ocr_cache import OcrCache
+from ocr_utils import ocr, ocr_axis_strips, ocr_label_crops, parse_axis_labels
 from scale import create_x_scale, create_y_scale
+from timeseries import TimeSeries
 
 
 def adjust_knots_to_grid(knots, grid_centers, min_dist=1, max_dist=10):
@@ -15,114 +45,827 @@ def adjust_knots_to_grid(knots, grid_centers, min_dist=1, max_dist=10):
     Returns a new numpy array of adjusted knots.
     """
     knots = np.copy(knots)
-    for i in range(len(knots)):
-        diffs = [abs(knots[i] - g) for g in grid_centers]
-        closest_grid = grid_centers[np.argmin(diffs)]
-        if min_dist < abs(knots[i] - closest_grid) <= max_dist:
-            knots[i] = closest_grid
+    grid_centers = np.asarray(grid_centers)
+    if grid_centers.size == 0:
+        return knots
+    closest = grid_centers[
+        np.argmin(np.abs(knots[:, None] - grid_centers[None, :]), axis=1)
+    ]
+    dist = np.abs(knots - closest)
+    adjust = (min_dist < dist) & (dist <= max_dist)
+    knots[adjust] = closest[adjust]
     return knots
 
 
 def fill_gaps_in_time_series(time_series, window_size=5):
     """
-    Fill gaps (None values) in the time_series by averaging the nearest previous and
-    next non-None values within a window.
-    Modifies the time_series in place.
+    Fill gaps (None values) of up to `window_size - 1` columns with the mean of
+    the nearest valid values before and after the gap. Every series of a
+    multi-series time series is filled on its own.
+    Kept for compatibility, see `gap_filling.fill_gaps`.
+    A list of (x, values) tuples is modified in place, for a `TimeSeries` (as
+    returned by `extract_time_series`) a filled copy is returned.
     """
-    for x in range(window_size, len(time_series) - window_size):
-        if time_series[x][1][0] is None:
-            prev_vals = [v[1][0] for v in time_series[x - window_size : x - 1]]
-            next_vals = [v[1][0] for v in time_series[x + 1 : x + window_size]]
-            prev_val = next(
-                (val for val in reversed(prev_vals) if val is not None), None
-            )
-            next_val = next((val for val in next_vals if val is not None), None)
-            if prev_val is not None and next_val is not None:
-                time_series[x] = (time_series[x][0], [(prev_val + next_val) / 2])
+    if isinstance(time_series, TimeSeries):
+        return time_series.fill_gaps("midpoint", window_size - 1)
+    if not len(time_series):
+        return time_series
+    values = np.array([values for _, values in time_series], dtype=np.float64)
+    values, valid = fill_gaps(values, mode="midpoint", max_gap=window_size - 1)
+    rows = values.astype(object)
+    rows[~valid] = None
+    for x, row in enumerate(rows.tolist()):
+        time_series[x] = (time_series[x][0], row)
     return time_series
 
 
-def extract_time_series(image_path):
-    # Load image
-    if not os.path.exists(image_path):
-        raise FileNotFoundError(f"Image file not found: {image_path}")
+def _labels_are_valid(column_numbers, row_index, columns_bboxes, rows_bboxes):
+    """
+    Whether parsed axis labels are fit for a layout cache: every y-axis label
+    is a number (`parse_number` gives NaN otherwise) and every x-axis label a
+    date, both strictly monotonic along their axis.
+    """
+    column_numbers = np.asarray(column_numbers, dtype=np.float64)
+    if np.isnan(column_numbers).any() or None in row_index:
+        return False
+    top_down = np.argsort([box[1] + box[3] for box in columns_bboxes])
+    steps = np.diff(column_numbers[top_down])
+    if not ((steps > 0).all() or (steps < 0).all()):
+        return False
+    left_right = np.argsort([box[0] + box[2] for box in rows_bboxes])
+    dates = [row_index[i] for i in left_right]
+    return all(a < b for a, b in zip(dates, dates[1:]))
 
-    img = cv2.imread(image_path)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    texts, bboxes = ocr(gray)
 
-    # Threshold to get the line (assuming black line on white background)
-    thresh = (gray < 250).astype(np.uint8)
+def _layout_labels_are_valid(texts, layout):
+    # Labels read from the boxes of a cached layout: a label that changed
+    # width or was misread (e.g. "1O") must not make a wrong scale
+    n_columns = len(layout.columns_bboxes)
+    try:
+        column_numbers, row_index = parse_axis_labels(
+            texts[:n_columns], texts[n_columns:]
+        )
+    except ValueError:
+        return False
+    return _labels_are_valid(
+        column_numbers, row_index, layout.columns_bboxes, layout.rows_bboxes
+    )
 
-    # Get Y-axis components
-    ids, columns_bboxes = get_column_bboxes(bboxes)
-    max_len_id = np.argmax([len(id_group) for id_group in ids]) if ids else 0
-    ids, columns_bboxes = ids[max_len_id], columns_bboxes[max_len_id]
-    column_texts = [texts[i] for i in ids]
-    column_numbers = texts_to_numbers(column_texts)
 
-    # Get X-axis components
-    ids, rows_bboxes = get_row_bboxes(bboxes)
-    max_len_id = np.argmax([len(id_group) for id_group in ids]) if ids else 0
-    ids, rows_bboxes = ids[max_len_id], rows_bboxes[max_len_id]
-    rows_texts = [texts[i] for i in ids]
-    row_index = texts_to_datetimes(rows_texts)
+OCR_MODES = ("full", "axis_strips")
 
-    cut_area, location, grid_l = cut_chart_area(thresh, rows_bboxes, columns_bboxes)
-    x_offset, y_offset, x2, y2 = location
 
-    # reconstruct grid components
-    grid_y_component_map = cut_area.mean(axis=1) > 0.5
-    grid_x_component_map = cut_area.mean(axis=0) > 0.5
+class ChartArtifacts:
+    """
+    Intermediate results of the `ChartPipeline` stages for one image.
 
-    grid_x_component = np.nonzero(grid_x_component_map)[0]
-    grid_y_component = np.nonzero(grid_y_component_map)[0]
+    Attributes are filled stage by stage and stay None until their stage ran:
 
-    # Adjust knots to create scales
-    y_knots = np.array([(box[1] + box[3]) / 2 for box in columns_bboxes])
-    x_knots = np.array([(box[2] + box[0]) / 2 for box in rows_bboxes])
+    - decode: `image` (BGR image, only decoded when series are split by
+      colour), `gray` (grayscale image), `thresh` (binary ink mask, None in
+      pyramid mode), `coarse_gray` (min-pooled pyramid level, pyramid mode
+      only)
+    - layout: `layout_key` (structural fingerprint, with a layout cache only),
+      `layout` (cached `ChartLayout` of the image's template, None on a miss)
+    - ocr: `texts`, `bboxes` (OCR tokens; only the label boxes of `layout` on
+      a layout cache hit)
+    - bbox_grouping: `column_ids`, `columns_bboxes` (y-axis labels),
+      `row_ids`, `rows_bboxes` (x-axis labels)
+    - cut_chart_area: `location` ((x1, y1, x2, y2) of the plot), `grid_l`,
+      `grid_x_component` (grid columns), `grid_y_component_map` (grid rows),
+      `plot_ink` (ink mask of the plot), `grid_mask` (grid pixels of the plot)
+    - scale_creation: `x_scale`, `y_scale`
+    - grid_removal: `chart_area` (plot ink mask without grid lines)
+    - series_separation: `series_masks` (one line mask per series),
+      `series_colors` (BGR colour per series, None for a single series)
+    - tracing: `raw_time_series` (`TimeSeries` before gap filling)
+    - fill_gaps: `time_series` (`TimeSeries`)
+    """
 
-    grid_y_component_clusters = cluster_data(grid_y_component + y_offset, margin=5)
-    grid_x_component_clusters = cluster_data(grid_x_component + x_offset, margin=5)
+    def __init__(self, source: Optional[ImageSource] = None):
+        self.source = source
+        self.image = None
+        self.gray = None
+        self.thresh = None
+        self.coarse_gray = None
+        self.layout_key = None
+        self.layout = None
+        self.texts = None
+        self.bboxes = None
+        self.column_ids = None
+        self.columns_bboxes = None
+        self.row_ids = None
+        self.rows_bboxes = None
+        self.location = None
+        self.grid_l = None
+        self.grid_x_component = None
+        self.grid_y_component_map = None
+        self.plot_ink = None
+        self.grid_mask = None
+        self.x_scale = None
+        self.y_scale = None
+        self.chart_area = None
+        self.series_masks = None
+        self.series_colors = None
+        self.raw_time_series = None
+        self.time_series = None
+
+    def copy(self):
+        """Shallow copy: stages replace attributes instead of mutating them."""
+        artifacts = ChartArtifacts.__new__(ChartArtifacts)
+        artifacts.__dict__.update(self.__dict__)
+        return artifacts
+
+
+class PanelResult(NamedTuple):
+    """Outcome of extracting one chart panel of a multi-panel image."""
+
+    index: int
+    box: tuple  # (x1, y1, x2, y2) of the panel in the image
+    status: str  # "ok" or "error"
+    time_series: Optional[TimeSeries]
+    error: Optional[str]
+    # Coordinates in the artifacts are relative to the panel
+    artifacts: Optional[ChartArtifacts] = None
+
+
+class ChartPipeline:
+    """
+    Time series extraction split into explicit stages (see `STAGES`).
+
+    `run` executes every stage and returns the `ChartArtifacts`. `rerun` starts
+    from a later stage on existing artifacts, so e.g. tuning `allowed_margin`
+    or `gap_fill` does not decode and OCR the image again:
+
+        artifacts = ChartPipeline().run("chart.png")
+        tuned = ChartPipeline(allowed_margin=3).rerun(artifacts, "tracing")
+    """
+
+    STAGES = (
+        "decode",
+        "layout",
+        "ocr",
+        "bbox_grouping",
+        "cut_chart_area",
+        "scale_creation",
+        "grid_removal",
+        "series_separation",
+        "tracing",
+        "fill_gaps",
+    )
+
+    def __init__(
+        self,
+        ocr_cache: Optional[OcrCache] = None,
+        ocr_mode: str = "full",
+        ocr_backend: Optional[OcrBackend] = None,
+        allowed_margin: int = 5,
+        gap_fill: str = "midpoint",
+        max_gap: Optional[int] = 4,
+        n_series: Optional[int] = 1,
+        chunk_size: int = 1024,
+        pyramid_levels: int = 0,
+        layout_cache: Optional[LayoutCache] = None,
+        metrics: Optional[ExtractionMetrics] = None,
+    ):
+        """
+        :param ocr_cache: optional `OcrCache` to reuse OCR results of identical
+            images
+        :param ocr_mode: "full" - OCR the whole image, "axis_strips" - OCR only
+            the axis label strips around the plot (much less pixels to recognize)
+        :param ocr_backend: OCR backend (default - pytesseract, see `ocr_utils.ocr`)
+        :param allowed_margin: max gap (in pixels) inside a single line cluster
+        :param gap_fill: how to fill columns without a line: "midpoint",
+            "linear" or "none" (see `gap_filling.fill_gaps`)
+        :param max_gap: longest gap (in columns) to fill, None - any length
+        :param n_series: number of differently coloured series to trace (None -
+            detect from the line colours, 1 - trace all ink as a single line)
+        :param chunk_size: number of columns traced at a time
+        :param pyramid_levels: locate the chart area and the grid on the image
+            downsampled by 2**pyramid_levels and refine them at full resolution
+            (0 - search at full resolution); the full image is then never
+            thresholded, only the chart area (see `cut_chart_area_pyramid`)
+        :param layout_cache: optional `LayoutCache`; images rendered from an
+            already seen template then reuse its chart area and grid and only
+            their label boxes are OCR-ed
+        :param metrics: optional `ExtractionMetrics` to record stage timings and
+            counters into
+        """
+        if ocr_mode not in OCR_MODES:
+            raise ValueError(
+                f"Unknown OCR mode: {ocr_mode}. Expected one of {OCR_MODES}"
+            )
+        if gap_fill not in GAP_FILL_MODES:
+            raise ValueError(
+                f"Unknown gap fill mode: {gap_fill}. Expected one of {GAP_FILL_MODES}"
+            )
+        self.ocr_cache = ocr_cache
+        self.ocr_mode = ocr_mode
+        self.ocr_backend = ocr_backend
+        self.allowed_margin = allowed_margin
+        self.gap_fill = gap_fill
+        self.max_gap = max_gap
+        self.n_series = n_series
+        self.chunk_size = chunk_size
+        self.pyramid_levels = pyramid_levels
+        self.layout_cache = layout_cache
+        self.metrics = metrics or NullMetrics()
+
+    def run(self, image: ImageSource) -> ChartArtifacts:
+        """Run all stages on an image (path, encoded bytes or array)."""
+        return self.rerun(ChartArtifacts(image), self.STAGES[0])
+
+    def rerun(self, artifacts: ChartArtifacts, stage: str) -> ChartArtifacts:
+        """
+        Run `stage` and every stage after it.
+
+        :param artifacts: artifacts with all stages before `stage` completed;
+            they are not modified
+        :param stage: name of the first stage to run
+        :return: new `ChartArtifacts`
+        """
+        if stage not in self.STAGES:
+            raise ValueError(f"Unknown stage: {stage}. Expected one of {self.STAGES}")
+        artifacts = artifacts.copy()
+        for name in self.STAGES[self.STAGES.index(stage) :]:
+            self.run_stage(artifacts, name)
+        return artifacts
+
+    def stream(self, image: ImageSource) -> Iterator[tuple]:
+        """
+        Yield the points of `run(image).time_series` while the chart is
+        traced, instead of building the whole list first.
+
+        The stages before tracing run when the first point is requested.
+        Tracing goes through `chunk_size` columns at a time and gap filling
+        holds back only points inside a gap of at most `max_gap` columns, so
+        points are available long before the last column is traced.
+        """
+        artifacts = ChartArtifacts(image)
+        for name in self.STAGES[: self.STAGES.index("tracing")]:
+            self.run_stage(artifacts, name)
+        yield from iter_fill_gaps(
+            self._iter_points(artifacts), self.gap_fill, self.max_gap, self.metrics
+        )
+
+    def run_panels(
+        self, image: ImageSource, max_workers: Optional[int] = None
+    ) -> list[PanelResult]:
+        """
+        Extract every chart of an image holding a grid of charts.
+
+        The image is decoded and OCR-ed once (always the full image, whatever
+        `ocr_mode`), split into panels with `geometry.find_panels` and the
+        stages from bbox_grouping on run for all panels concurrently, on views
+        of the decoded image and the OCR tokens inside each panel. An image
+        with a single chart gives a single panel. A failing panel gets an
+        "error" result instead of failing the others.
+
+        :param image: path, encoded image bytes or decoded array
+        :param max_workers: number of panels extracted at a time (default - all)
+        :return: `PanelResult` per panel, row by row
+        """
+        artifacts = ChartArtifacts(image)
+        self.run_stage(artifacts, "decode")
+        with self.metrics.stage("panel_detection"):
+            boxes = find_panels(artifacts.gray)
+        with self.metrics.stage("ocr"):
+            texts, bboxes = ocr(
+                artifacts.gray, cache=self.ocr_cache, backend=self.ocr_backend
+            )
+        self.metrics.count("ocr_tokens", len(texts))
+
+        # Metrics are not thread-safe: every panel records into its own
+        pipelines = [self] * len(boxes)
+        if not isinstance(self.metrics, NullMetrics):
+            pipelines = [copy.copy(self) for _ in boxes]
+            for pipeline in pipelines:
+                pipeline.metrics = ExtractionMetrics()
+        with ThreadPoolExecutor(max_workers=max_workers or len(boxes)) as pool:
+            results = list(
+                pool.map(
+                    lambda index: pipelines[index]._run_panel(
+                        artifacts, texts, bboxes, index, boxes[index]
+                    ),
+                    range(len(boxes)),
+                )
+            )
+        if pipelines[0] is not self:
+            for pipeline in pipelines:
+                self.metrics.merge(pipeline.metrics, count_runs=False)
+        return results
+
+    def _run_panel(self, artifacts, texts, bboxes, index, box):
+        x1, y1, x2, y2 = box
+        panel = artifacts.copy()
+        if artifacts.image is not None:
+            panel.image = artifacts.image[y1:y2, x1:x2]
+        panel.gray = artifacts.gray[y1:y2, x1:x2]
+        if artifacts.thresh is not None:
+            panel.thresh = artifacts.thresh[y1:y2, x1:x2]
+        panel.coarse_gray = None  # rebuilt for the panel in pyramid mode
+        panel.texts, panel.bboxes = [], []
+        for text, (left, top, right, bottom) in zip(texts, bboxes):
+            if x1 <= (left + right) / 2 < x2 and y1 <= (top + bottom) / 2 < y2:
+                panel.texts.append(text)
+                panel.bboxes.append([left - x1, top - y1, right - x1, bottom - y1])
+        try:
+            for stage in self.STAGES[self.STAGES.index("bbox_grouping") :]:
+                self.run_stage(panel, stage)
+        except Exception as e:
+            return PanelResult(index, box, "error", None, f"{type(e).__name__}: {e}")
+        return PanelResult(index, box, "ok", panel.time_series, None, panel)
+
+    def run_stage(self, artifacts: ChartArtifacts, stage: str):
+        """Run a single stage, updating `artifacts` in place."""
+        with self.metrics.stage(stage):
+            getattr(self, f"_{stage}")(artifacts)
+
+    def _decode(self, artifacts):
+        if self.n_series == 1:
+            # Colours are not needed: decode straight to grayscale
+            artifacts.image = None
+            artifacts.gray = load_image(artifacts.source, color=False)
+        else:
+            artifacts.image = load_image(artifacts.source, color=True)
+            artifacts.gray = cv2.cvtColor(artifacts.image, cv2.COLOR_BGR2GRAY)
+        if self.pyramid_levels:
+            artifacts.thresh = None
+            artifacts.coarse_gray = min_pool_pyramid(
+                artifacts.gray, self.pyramid_levels
+            )
+        else:
+            # Threshold to get the line (assuming black line on white background)
+            artifacts.thresh = ink_mask(artifacts.gray)
+
+    def _layout(self, artifacts):
+        artifacts.layout_key = artifacts.layout = None
+        if self.layout_cache is None:
+            return
+        coarse = None
+        if self.pyramid_levels == self.layout_cache.levels:
+            coarse = artifacts.coarse_gray
+        artifacts.layout_key = self.layout_cache.fingerprint(artifacts.gray, coarse)
+        artifacts.layout = self.layout_cache.get(artifacts.layout_key)
+
+    def _ocr(self, artifacts):
+        layout = artifacts.layout
+        if layout is not None:
+            bboxes = [*layout.columns_bboxes.tolist(), *layout.rows_bboxes.tolist()]
+            texts = ocr_label_crops(
+                artifacts.gray, bboxes, cache=self.ocr_cache, backend=self.ocr_backend
+            )
+            if None not in texts and _layout_labels_are_valid(texts, layout):
+                artifacts.texts, artifacts.bboxes = texts, bboxes
+                self.metrics.count("layout_hits")
+                self.metrics.count("ocr_tokens", len(texts))
+                return
+            # The labels moved or changed: forget the layout, start from scratch
+            self.layout_cache.discard(artifacts.layout_key)
+            artifacts.layout = None
+        recognize = ocr_axis_strips if self.ocr_mode == "axis_strips" else ocr
+        artifacts.texts, artifacts.bboxes = recognize(
+            artifacts.gray, cache=self.ocr_cache, backend=self.ocr_backend
+        )
+        self.metrics.count("ocr_tokens", len(artifacts.texts))
+
+    def _bbox_grouping(self, artifacts):
+        layout = artifacts.layout
+        if layout is not None:  # the label boxes are already grouped
+            n_columns = len(layout.columns_bboxes)
+            artifacts.column_ids = list(range(n_columns))
+            artifacts.columns_bboxes = layout.columns_bboxes
+            artifacts.row_ids = list(range(n_columns, len(artifacts.bboxes)))
+            artifacts.rows_bboxes = layout.rows_bboxes
+            return
+        # Y-axis labels share a column, x-axis labels share a row
+        ids, columns_bboxes = get_column_bboxes(artifacts.bboxes)
+        max_len_id = np.argmax([len(id_group) for id_group in ids]) if ids else 0
+        artifacts.column_ids = ids[max_len_id]
+        artifacts.columns_bboxes = columns_bboxes[max_len_id]
+
+        ids, rows_bboxes = get_row_bboxes(artifacts.bboxes)
+        max_len_id = np.argmax([len(id_group) for id_group in ids]) if ids else 0
+        artifacts.row_ids = ids[max_len_id]
+        artifacts.rows_bboxes = rows_bboxes[max_len_id]
+
+    def _cut_chart_area(self, artifacts):
+        layout = artifacts.layout
+        if layout is not None:
+            artifacts.location = x1, y1, x2, y2 = layout.location
+            artifacts.grid_l = layout.grid_l
+            artifacts.grid_x_component = layout.grid_x_component
+            artifacts.grid_y_component_map = layout.grid_y_component_map
+            if artifacts.thresh is None:  # pyramid mode: threshold the plot only
+                artifacts.plot_ink = ink_mask(artifacts.gray[y1:y2, x1:x2])
+            else:
+                artifacts.plot_ink = artifacts.thresh[y1:y2, x1:x2]
+            artifacts.grid_mask = detect_grid(artifacts.plot_ink).mask
+            return
+        if self.pyramid_levels:
+            grid = self._cut_chart_area_pyramid(artifacts)
+        else:
+            if artifacts.thresh is None:  # decoded by a pipeline in pyramid mode
+                artifacts.thresh = ink_mask(artifacts.gray)
+            artifacts.plot_ink, artifacts.location, artifacts.grid_l, grid = (
+                cut_chart_area(
+                    artifacts.thresh, artifacts.rows_bboxes, artifacts.columns_bboxes
+                )
+            )
+        artifacts.grid_mask = grid.mask
+        artifacts.grid_y_component_map = np.zeros(len(grid.mask), dtype=bool)
+        artifacts.grid_y_component_map[grid.rows] = True
+        artifacts.grid_x_component = grid.cols
+
+    def _cut_chart_area_pyramid(self, artifacts):
+        gray, coarse = artifacts.gray, artifacts.coarse_gray
+        factor = 2**self.pyramid_levels
+        if coarse is None or coarse.shape != (
+            -(-gray.shape[0] // factor),
+            -(-gray.shape[1] // factor),
+        ):
+            coarse = None  # decoded with other settings, rebuild the level
+        artifacts.location, artifacts.grid_l, grid, artifacts.plot_ink = (
+            cut_chart_area_pyramid(
+                gray,
+                artifacts.rows_bboxes,
+                artifacts.columns_bboxes,
+                self.pyramid_levels,
+                coarse,
+            )
+        )
+        return grid
+
+    def _scale_creation(self, artifacts):
+        x_offset, y_offset, _, _ = artifacts.location
+        column_numbers, row_index = parse_axis_labels(
+            [artifacts.texts[i] for i in artifacts.column_ids],
+            [artifacts.texts[i] for i in artifacts.row_ids],
+        )
+
+        # Adjust knots to create scales
+        y_knots = np.array([(box[1] + box[3]) / 2 for box in artifacts.columns_bboxes])
+        x_knots = np.array([(box[2] + box[0]) / 2 for box in artifacts.rows_bboxes])
+
+        grid_y_component = np.nonzero(artifacts.grid_y_component_map)[0]
+        grid_y_component_clusters_centers = np.round(
+            find_clusters(grid_y_component + y_offset, margin=5).centers
+        )
+        grid_x_component_clusters_centers = np.round(
+            find_clusters(artifacts.grid_x_component + x_offset, margin=5).centers
+        )
+
+        # find the closest grid line to each knot and adjust
+        y_knots = adjust_knots_to_grid(y_knots, grid_y_component_clusters_centers)
+        x_knots = adjust_knots_to_grid(x_knots, grid_x_component_clusters_centers)
+
+        # Labels that are not numbers are left out, like labels OCR missed
+        numeric = ~np.isnan(column_numbers)
+        artifacts.y_scale = create_y_scale(
+            np.asarray(column_numbers)[numeric], y_knots[numeric]
+        )
+        artifacts.x_scale = create_x_scale(row_index, x_knots)
+
+        # The labels made valid scales: remember the layout of this template
+        new_layout = artifacts.layout_key is not None and artifacts.layout is None
+        scales = artifacts.y_scale is not None and artifacts.x_scale is not None
+        if not (new_layout and scales):
+            return
+        columns_bboxes, rows_bboxes = artifacts.columns_bboxes, artifacts.rows_bboxes
+        if _labels_are_valid(column_numbers, row_index, columns_bboxes, rows_bboxes):
+            self.layout_cache.put(
+                artifacts.layout_key,
+                ChartLayout(
+                    artifacts.location,
+                    artifacts.grid_l,
+                    artifacts.grid_x_component,
+                    artifacts.grid_y_component_map,
+                    columns_bboxes,
+                    rows_bboxes,
+                ),
+            )
+
+    def _grid_removal(self, artifacts):
+        artifacts.chart_area = remove_grid(artifacts.plot_ink, artifacts.grid_mask)
+
+    def _series_separation(self, artifacts):
+        if self.n_series == 1:
+            artifacts.series_masks = [artifacts.chart_area]
+            artifacts.series_colors = None
+            return
+        x1, y1, x2, y2 = artifacts.location
+        masks, colors = split_series_masks(
+            artifacts.image[y1:y2, x1:x2], artifacts.chart_area, self.n_series
+        )
+        # Keep at least one (empty) series so that the output shape is stable
+        artifacts.series_masks = masks or [artifacts.chart_area]
+        artifacts.series_colors = colors
+
+    def _tracing(self, artifacts):
+        x_offset, _, _, _ = artifacts.location
+        series_values = [list(values) for values in self._trace_series(artifacts)]
+        width = artifacts.chart_area.shape[1]
+        x = artifacts.x_scale.call_array(np.arange(width) + x_offset - artifacts.grid_l)
+        # None (no line in the column) becomes NaN
+        values = np.array(series_values, dtype=np.float64).T
+        artifacts.raw_time_series = TimeSeries(x, values)
+
+    def _trace_series(self, artifacts):
+        # Find the y-coordinate of every line for each x, against shared scales
+        _, y_offset, _, _ = artifacts.location
+        # The masks are free of grid lines, line pixels on them included
+        return [
+            iter_line_values(
+                mask,
+                artifacts.y_scale,
+                None,
+                None,
+                y_offset,
+                allowed_margin=self.allowed_margin,
+                chunk_size=self.chunk_size,
+                metrics=self.metrics,
+            )
+            for mask in artifacts.series_masks
+        ]
+
+    def _iter_points(self, artifacts):
+        x_offset, _, _, _ = artifacts.location
+        series_values = zip(*self._trace_series(artifacts))
+        width = artifacts.chart_area.shape[1]
+        for start in range(0, width, self.chunk_size):
+            stop = min(start + self.chunk_size, width)
+            x_dates = column_dates(
+                artifacts.x_scale, stop, x_offset, artifacts.grid_l, start=start
+            )
+            for x_date, values in zip(x_dates, series_values):
+                yield x_date, list(values)
+
+    def _fill_gaps(self, artifacts):
+        raw = artifacts.raw_time_series
+        artifacts.time_series = raw.fill_gaps(self.gap_fill, self.max_gap)
+        filled = int(artifacts.time_series.valid.sum() - raw.valid.sum())
+        self.metrics.count("gaps_filled", filled)
+
+
+def extract_time_series(
+    image: ImageSource,
+    ocr_cache: Optional[OcrCache] = None,
+    ocr_mode: str = "full",
+    ocr_backend: Optional[OcrBackend] = None,
+    n_series: Optional[int] = 1,
+    pyramid_levels: int = 0,
+    metrics: Optional[ExtractionMetrics] = None,
+):
+    """
+    Extract time series from a line chart image.
+
+    Runs every `ChartPipeline` stage; use the pipeline directly to keep the
+    intermediate artifacts.
+
+    :param image: path to the image, encoded image bytes (e.g. an upload) or a
+        decoded uint8 array (grayscale, BGR or BGRA), see `image_io.load_image`
+    :param ocr_cache: optional `OcrCache` to reuse OCR results of identical images
+    :param ocr_mode: "full" - OCR the whole image, "axis_strips" - OCR only the
+        axis label strips around the plot (much less pixels to recognize)
+    :param ocr_backend: OCR backend (default - pytesseract, see `ocr_utils.ocr`)
+    :param n_series: number of differently coloured series (None - detect); the
+        chart colours are quantized once and every series is traced against
+        the same scales
+    :param pyramid_levels: locate the chart area and grid on the image
+        downsampled by 2**pyramid_levels first (0 - at full resolution); useful
+        for large screenshots, the result is the same
+    :param metrics: optional `ExtractionMetrics` to record stage timings and
+        counters into
+    :return: `TimeSeries` with one row per pixel column and one value per
+        series (largest series first); it iterates and compares like the former
+        list of (datetime, [value, ...]) tuples
+    """
+    pipeline = ChartPipeline(
+        ocr_cache=ocr_cache,
+        ocr_mode=ocr_mode,
+        ocr_backend=ocr_backend,
+        n_series=n_series,
+        pyramid_levels=pyramid_levels,
+        metrics=metrics,
+    )
+    return pipeline.run(image).time_series
+
+
+def extract_panels(
+    image: ImageSource,
+    ocr_cache: Optional[OcrCache] = None,
+    ocr_backend: Optional[OcrBackend] = None,
+    n_series: Optional[int] = 1,
+    pyramid_levels: int = 0,
+    max_workers: Optional[int] = None,
+    metrics: Optional[ExtractionMetrics] = None,
+) -> list[PanelResult]:
+    """
+    `extract_time_series` for an image holding a grid of charts: every panel
+    is extracted on its own, concurrently, from a single OCR pass over the
+    image (see `ChartPipeline.run_panels`).
+
+    :param max_workers: number of panels extracted at a time (default - all)
+    :return: `PanelResult` per panel, row by row
+    """
+    pipeline = ChartPipeline(
+        ocr_cache=ocr_cache,
+        ocr_backend=ocr_backend,
+        n_series=n_series,
+        pyramid_levels=pyramid_levels,
+        metrics=metrics,
+    )
+    return pipeline.run_panels(image, max_workers=max_workers)
+
+
+def iter_time_series(
+    image: ImageSource,
+    ocr_cache: Optional[OcrCache] = None,
+    ocr_mode: str = "full",
+    ocr_backend: Optional[OcrBackend] = None,
+    n_series: Optional[int] = 1,
+    chunk_size: int = 1024,
+    pyramid_levels: int = 0,
+    metrics: Optional[ExtractionMetrics] = None,
+) -> Iterator[tuple]:
+    """
+    Streaming `extract_time_series`: yields (datetime, [value, ...]) points as
+    the columns are resolved (see `ChartPipeline.stream`).
+
+    Pair it with a writer from `writers` to stream the series to disk.
+
+    :param chunk_size: number of columns traced at a time
+    :return: iterator over (datetime, [value, ...]) tuples, one per pixel column
+    """
+    pipeline = ChartPipeline(
+        ocr_cache=ocr_cache,
+        ocr_mode=ocr_mode,
+        ocr_backend=ocr_backend,
+        n_series=n_series,
+        chunk_size=chunk_size,
+        pyramid_levels=pyramid_levels,
+        metrics=metrics,
+    )
+    return pipeline.stream(image)
 
-    grid_y_component_clusters_centers = [
-        round(np.mean(cluster)) for cluster in grid_y_component_clusters
-    ]
-    grid_x_component_clusters_centers = [
-        round(np.mean(cluster)) for cluster in grid_x_component_clusters
-    ]
 
-    # find the closest grid line to each knot and adjust
-    y_knots = adjust_knots_to_grid(y_knots, grid_y_component_clusters_centers)
-    x_knots = adjust_knots_to_grid(x_knots, grid_x_component_clusters_centers)
+def locate_line_pixels(line_mask, allowed_margin=5):
+    """
+    Find the line pixels of every column of `line_mask` in one pass.
+
+    A column is "simple" when its pixels form a single cluster, i.e. either all
+    gaps between consecutive pixels are equal or none exceeds `allowed_margin`.
+    Only the remaining "ambiguous" columns need per-column clustering.
+
+    :param line_mask: 2D array, non-zero where the line is
+    :param allowed_margin: max gap (in pixels) inside a single cluster
+    :return: counts (pixels per column), means (mean row per column, NaN when
+        the column is empty), ambiguous (bool per column)
+    """
+    width = line_mask.shape[1]
+    cols, rows = np.nonzero(line_mask.T)
+
+    counts = np.bincount(cols, minlength=width)
+    sums = np.bincount(cols, weights=rows, minlength=width)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+
+    ambiguous = np.zeros(width, dtype=bool)
+    if rows.size < 2:
+        return counts, means, ambiguous
+
+    # Gaps between consecutive pixels of the same column. Gaps that cross a
+    # column boundary are replaced with neutral values for max/min reduction.
+    diffs = np.diff(rows)
+    same_col = cols[1:] == cols[:-1]
+    multi = np.flatnonzero(counts > 1)
+    if multi.size == 0:
+        return counts, means, ambiguous
+
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])[multi]
+    max_diffs = np.maximum.reduceat(np.where(same_col, diffs, 0), starts)
+    min_diffs = np.minimum.reduceat(
+        np.where(same_col, diffs, np.iinfo(diffs.dtype).max), starts
+    )
+    ambiguous[multi] = (max_diffs > allowed_margin) & (min_diffs != max_diffs)
+    return counts, means, ambiguous
+
+
+def iter_line_values(
+    chart_area,
+    y_scale,
+    grid_x_component,
+    grid_y_component_map,
+    y_offset,
+    allowed_margin=5,
+    reversed=False,
+    chunk_size=1024,
+    metrics: Optional[ExtractionMetrics] = None,
+    carry: Optional[list] = None,
+) -> Iterator[Optional[float]]:
+    """
+    Trace a single line, yielding one scaled value (or None) per column of
+    `chart_area` as soon as it is resolved.
 
-    y_scale = create_y_scale(column_numbers, y_knots)
-    x_scale = create_x_scale(row_index, x_knots)
+    Columns are located in chunks of `chunk_size`; only the last few resolved
+    values are carried over to the next chunk. Values come in tracing order:
+    left to right, or right to left when `reversed`.
 
-    # Remove grid lines from chart area
-    chart_area = thresh[y_offset:y2, x_offset:x2]
-    chart_area[grid_y_component, :] = 0
-    chart_area[:, grid_x_component] = 0
+    `carry` continues an earlier trace: the values resolved for the (up to 5)
+    columns just before `chart_area`, or just after it when `reversed`, in
+    column order.
 
-    # Find the y-coordinate of the line for each x
-    time_series = []
+    Grid rows are left out of the mask and grid columns give None; pass None
+    for both when `chart_area` is already free of grid lines (see
+    `geometry.remove_grid`).
+    """
     height, width = chart_area.shape
-    allowed_margin = 5
+    line_mask = chart_area
+    if grid_y_component_map is not None:
+        line_mask = chart_area[~grid_y_component_map]
 
-    time_series = extract_time_series_from_chart_area(
-        chart_area,
-        x_scale,
-        y_scale,
-        grid_x_component,
-        grid_y_component_map,
-        grid_l,
-        x_offset,
-        y_offset,
-        allowed_margin=allowed_margin,
-        reversed=False,
+    grid_x_component_map = np.zeros(width, dtype=bool)
+    if grid_x_component is not None:
+        grid_x_component_map[grid_x_component[grid_x_component < width]] = True
+
+    starts = range(0, width, chunk_size)
+    carry = list(carry or [])  # resolved values next to the chunk, in column order
+    for start in starts[::-1] if reversed else starts:
+        stop = min(start + chunk_size, width)
+        chunk_mask = line_mask[:, start:stop]
+        counts, means, ambiguous = locate_line_pixels(chunk_mask, allowed_margin)
+        has_data = (counts > 0) & ~grid_x_component_map[start:stop]
+        ambiguous &= has_data
+        if metrics is not None:
+            metrics.count("columns_traced", int(has_data.sum()))
+            metrics.count("ambiguous_columns", int(ambiguous.sum()))
+
+        # Single-cluster columns are resolved in bulk
+        chunk = [None] * (stop - start)
+        simple_xs = np.flatnonzero(has_data & ~ambiguous)
+        for x, value in zip(simple_xs, y_scale.call_array(means[simple_xs] + y_offset)):
+            chunk[x] = value.item()
+
+        # Ambiguous columns depend on the points resolved just before them, so
+        # they go through the slow path in tracing order
+        values = chunk + carry if reversed else carry + chunk
+        offset = 0 if reversed else len(carry)
+        ambiguous_xs = np.flatnonzero(ambiguous)
+        for x in ambiguous_xs[::-1] if reversed else ambiguous_xs:
+            ys = np.nonzero(chunk_mask[:, x])[0]
+            i = x + offset
+            recent = values[i + 1 : i + 6] if reversed else values[max(0, i - 5) : i]
+            recent_points = [pt for pt in recent if pt is not None]
+            if recent_points:
+                centers = find_clusters(ys, allowed_margin).centers
+                inverted = y_scale.invert(np.mean(recent_points)) - y_offset
+                y = centers[np.argmin(np.abs(centers - inverted))]
+            else:
+                y = np.mean(ys)
+            values[i] = y_scale(y + y_offset)
+
+        chunk = values[offset : offset + stop - start]
+        carry = values[:5] if reversed else values[-5:]
+        yield from chunk[::-1] if reversed else chunk
+
+
+def trace_line_values(
+    chart_area,
+    y_scale,
+    grid_x_component,
+    grid_y_component_map,
+    y_offset,
+    allowed_margin=5,
+    reversed=False,
+    metrics: Optional[ExtractionMetrics] = None,
+):
+    """
+    Trace a single line: one scaled value (or None) per column of `chart_area`.
+    """
+    values = list(
+        iter_line_values(
+            chart_area,
+            y_scale,
+            grid_x_component,
+            grid_y_component_map,
+            y_offset,
+            allowed_margin=allowed_margin,
+            reversed=reversed,
+            metrics=metrics,
+        )
     )
-    time_series = fill_gaps_in_time_series(time_series, window_size=5)
-    return time_series
+    return values[::-1] if reversed else values
+
+
+def column_dates(x_scale, width, x_offset, grid_l, start=0):
+    """
+    Scaled x value (datetime or number) of the columns `start` to `width` of the
+    chart area.
+    """
+    x_dates = x_scale.call_array(np.arange(start, width) + x_offset - grid_l)
+    if x_dates.dtype.kind == "M":
+        return datetime64_to_datetimes(x_dates)
+    return x_dates.tolist()
 
 
 def extract_time_series_from_chart_area(
@@ -136,50 +879,202 @@ def extract_time_series_from_chart_area(
     y_offset,
     allowed_margin=5,
     reversed=False,
+    metrics: Optional[ExtractionMetrics] = None,
 ):
-    time_series = []
-    height, width = chart_area.shape
-    x_range = range(width - 1, -1, -1) if reversed else range(width)
-
-    for x in x_range:
-        x_date = x_scale(x + x_offset - grid_l)
-        if x in grid_x_component:
-            time_series.append((x_date, [None]))
-            continue
-
-        ys = np.nonzero(chart_area[~grid_y_component_map, x])[0]
-        if ys.size > 0:
-            unique_diffs = np.unique(np.diff(ys))
-            if unique_diffs.size > 1 and any(
-                d > allowed_margin for d in unique_diffs[1:]
-            ):
-                recent_points = [
-                    pt
-                    for _, pt_list in time_series[-5:]
-                    for pt in pt_list
-                    if pt is not None
-                ]
-                if recent_points:
-                    clusters = cluster_data(ys, allowed_margin)
-                    inverted = y_scale.invert(np.mean(recent_points)) - y_offset
-                    if clusters:
-                        closest_cluster = min(
-                            clusters, key=lambda c: abs(np.mean(c) - inverted)
-                        )
-                        y = np.mean(closest_cluster)
-                    else:
-                        y = np.mean(ys)
+    values = trace_line_values(
+        chart_area,
+        y_scale,
+        grid_x_component,
+        grid_y_component_map,
+        y_offset,
+        allowed_margin=allowed_margin,
+        reversed=reversed,
+        metrics=metrics,
+    )
+    x_dates = column_dates(x_scale, chart_area.shape[1], x_offset, grid_l)
+    return [(x_date, [value]) for x_date, value in zip(x_dates, values)]
+
+
+class BatchResult(NamedTuple):
+    """Outcome of extracting a single image within a batch."""
+
+    index: int
+    path: str
+    status: str  # "ok" or "error"
+    time_series: Optional[TimeSeries]
+    error: Optional[str]
+    duration: float
+    metrics: Optional[ExtractionMetrics] = None
+
+
+def _extract_one(index, path, extract_kwargs, collect_metrics=False):
+    # Runs inside a pool worker: never let an exception escape, so one broken
+    # image cannot take the rest of the batch down with it.
+    start = time.perf_counter()
+    metrics = ExtractionMetrics() if collect_metrics else None
+    try:
+        time_series = extract_time_series(path, metrics=metrics, **extract_kwargs)
+    except Exception as e:
+        return BatchResult(
+            index,
+            path,
+            "error",
+            None,
+            f"{type(e).__name__}: {e}",
+            _since(start),
+            metrics,
+        )
+    return BatchResult(index, path, "ok", time_series, None, _since(start), metrics)
+
+
+def _since(start):
+    return time.perf_counter() - start
+
+
+_EXHAUSTED = object()
+
+
+def iter_extract_batch(
+    paths: Iterable[str],
+    workers: Optional[int] = None,
+    ordered: bool = True,
+    max_pending: Optional[int] = None,
+    collect_metrics: bool = False,
+    **extract_kwargs,
+) -> Iterator[BatchResult]:
+    """
+    Run `extract_time_series` over many images using a process pool.
+
+    Results are yielded as `BatchResult` records, either in input order
+    (`ordered=True`) or as soon as each image finishes. A failing image yields
+    a record with status "error" instead of aborting the batch. When a worker
+    process dies (e.g. out of memory), the pool is restarted and the images
+    that were running are retried one at a time: the one that kills a worker
+    again gets an "error" record.
+
+    :param paths: image paths
+    :param workers: number of worker processes (None - one per CPU, 1 - inline)
+    :param ordered: yield results in input order instead of completion order
+    :param max_pending: maximum number of images submitted but not yet yielded
+    :param collect_metrics: attach an `ExtractionMetrics` to every result
+    :param extract_kwargs: passed to `extract_time_series` (e.g. `ocr_cache`;
+        an `OcrCache` shares only its disk tier between worker processes)
+    :return: iterator over `BatchResult`
+    """
+    paths = iter(paths)
+    if workers == 1:
+        for index, path in enumerate(paths):
+            yield _extract_one(index, path, extract_kwargs, collect_metrics)
+        return
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or 4 * workers
+    pool = ProcessPoolExecutor(max_workers=workers)
+    pending = {}  # future -> (index, path)
+    done_results = {}  # index -> result, only used when ordered
+    retry = deque()  # (index, path) not submitted because the pool broke
+    suspects = deque()  # (index, path) running when a worker died
+    isolated = None  # index of the suspect running alone
+    next_index = 0
+    submitted = 0
+    exhausted = False
+
+    try:
+        while True:
+            broken = False
+            while isolated is None:
+                if suspects:
+                    # Suspects run one at a time, so that a worker dying again
+                    # points at the image that killed it
+                    if pending:
+                        break
+                    item = suspects.popleft()
+                    isolated = item[0]
+                elif retry:
+                    item = retry.popleft()
+                elif exhausted or len(pending) + len(done_results) >= max_pending:
+                    break
                 else:
-                    y = np.mean(ys)
+                    path = next(paths, _EXHAUSTED)
+                    if path is _EXHAUSTED:
+                        exhausted = True
+                        break
+                    item = (submitted, path)
+                    submitted += 1
+                try:
+                    future = pool.submit(
+                        _extract_one, *item, extract_kwargs, collect_metrics
+                    )
+                except BrokenProcessPool:
+                    (suspects if item[0] == isolated else retry).appendleft(item)
+                    isolated = None
+                    broken = True
+                    break
+                pending[future] = item
+
+            if not pending and not broken:
+                break
+
+            if broken:
+                finished = wait(pending)[0]
             else:
-                y = np.mean(ys)
+                finished = wait(pending, return_when=FIRST_COMPLETED)[0]
+            results = []
+            while finished:
+                future = finished.pop()
+                index, path = pending.pop(future)
+                try:
+                    result = future.result()
+                except BrokenProcessPool as e:
+                    if not broken:
+                        # Every image still on the pool fails with it
+                        broken = True
+                        finished |= wait(pending)[0]
+                    if index != isolated:
+                        suspects.append((index, path))
+                        continue
+                    result = _error_result(index, path, e)
+                except Exception as e:
+                    result = _error_result(index, path, e)
+                if index == isolated:
+                    isolated = None
+                results.append(result)
 
-            scaled = y_scale(y + y_offset)
-            time_series.append((x_date, [scaled]))
-        else:
-            time_series.append((x_date, [None]))  # No data at this x
+            if broken:
+                pool.shutdown()
+                pool = ProcessPoolExecutor(max_workers=workers)
+
+            for result in results:
+                if not ordered:
+                    yield result
+                else:
+                    done_results[result.index] = result
+
+            while next_index in done_results:
+                yield done_results.pop(next_index)
+                next_index += 1
+    finally:
+        pool.shutdown()
+
+
+def _error_result(index, path, e):
+    return BatchResult(index, path, "error", None, f"{type(e).__name__}: {e}", 0.0)
 
-    return time_series if not reversed else time_series[::-1]
+
+def extract_batch(
+    paths: Iterable[str], workers: Optional[int] = None, **extract_kwargs
+) -> list[BatchResult]:
+    """
+    Extract time series from many images in parallel.
+
+    :param paths: image paths
+    :param workers: number of worker processes (None - one per CPU, 1 - inline)
+    :param extract_kwargs: passed to `extract_time_series`
+    :return: list of `BatchResult` in input order
+    """
+    return list(
+        iter_extract_batch(paths, workers=workers, ordered=True, **extract_kwargs)
+    )
 
 
 # from PIL import Image
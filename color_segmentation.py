@@ -0,0 +1,155 @@
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+
+class LineColors(NamedTuple):
+    centers: np.ndarray  # (k, 3) unit ink directions, see `ink_directions`
+    colors: np.ndarray  # (k, 3) representative BGR colour of each cluster
+    labels: np.ndarray  # (n,) cluster of every pixel
+    sizes: np.ndarray  # (k,) pixels per cluster, descending
+
+
+def ink_directions(pixels: np.ndarray):
+    """
+    Direction and length of the ink `255 - bgr` of each pixel.
+
+    An anti-aliased line pixel is the line colour blended with the white
+    background: the blend changes the ink length but keeps its direction, so
+    directions of one line cluster tightly.
+
+    :param pixels: (n, 3) BGR pixels
+    :return: directions ((n, 3) unit vectors), lengths (n,)
+    """
+    ink = 255.0 - pixels.astype(np.float32)
+    lengths = np.linalg.norm(ink, axis=1)
+    return ink / np.maximum(lengths, 1e-6)[:, None], lengths
+
+
+def _seed_centers(directions, n_colors, bins, min_share, min_distance):
+    # Coarse histogram of the directions: the most populated, well separated
+    # bins are deterministic seeds for k-means.
+    codes = np.round(directions * bins).astype(np.int32)
+    _, inverse, counts = np.unique(
+        codes, axis=0, return_inverse=True, return_counts=True
+    )
+    inverse = inverse.ravel()
+    means = np.stack(
+        [np.bincount(inverse, weights=directions[:, i]) for i in range(3)], axis=1
+    )
+    means /= np.maximum(np.linalg.norm(means, axis=1, keepdims=True), 1e-6)
+
+    order = np.argsort(-counts, kind="stable")
+    seeds = []
+    for i in order:
+        if n_colors is not None and len(seeds) == n_colors:
+            break
+        if n_colors is None and counts[i] < min_share * len(directions):
+            break
+        if all(np.linalg.norm(means[i] - seed) >= min_distance for seed in seeds):
+            seeds.append(means[i])
+
+    # Not enough distinct colours: fall back to the next most populated bins
+    for i in order:
+        if n_colors is None or len(seeds) >= n_colors:
+            break
+        if not any(np.array_equal(means[i], seed) for seed in seeds):
+            seeds.append(means[i])
+    return np.array(seeds, dtype=np.float32).reshape(-1, 3)
+
+
+def _nearest(directions, centers):
+    # Unit vectors: the nearest center has the largest dot product
+    return np.argmax(directions @ centers.T, axis=1).astype(np.int32)
+
+
+def quantize_line_colors(
+    pixels: np.ndarray,
+    n_colors: Optional[int] = None,
+    bins: int = 8,
+    min_share: float = 0.05,
+    min_distance: float = 0.2,
+    max_samples: int = 20000,
+) -> LineColors:
+    """
+    Cluster ink pixels into line colours.
+
+    Seeds come from a coarse histogram of the ink directions and are refined
+    with k-means on (at most `max_samples`) pixels; every pixel is then
+    assigned to the nearest center. Clusters are ordered by size, largest
+    first.
+
+    :param pixels: (n, 3) BGR ink pixels
+    :param n_colors: number of colours (None - every histogram peak holding at
+        least `min_share` of the pixels)
+    :param bins: histogram resolution per direction component
+    :param min_share: min share of pixels of a colour when `n_colors` is None
+    :param min_distance: min distance between the seed directions
+    :param max_samples: max number of pixels k-means is run on
+    :return: `LineColors`
+    """
+    pixels = np.asarray(pixels).reshape(-1, 3)
+    if len(pixels) == 0:
+        empty = np.zeros((0, 3), dtype=np.float32)
+        return LineColors(
+            empty, empty.astype(np.uint8), np.zeros(0, np.int32), np.zeros(0, int)
+        )
+
+    directions, lengths = ink_directions(pixels)
+    centers = _seed_centers(directions, n_colors, bins, min_share, min_distance)
+
+    if len(centers) > 1:
+        step = max(1, len(directions) // max_samples)
+        samples = np.ascontiguousarray(directions[::step])
+        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 1e-4)
+        _, _, refined = cv2.kmeans(
+            samples,
+            len(centers),
+            _nearest(samples, centers).reshape(-1, 1),
+            criteria,
+            1,
+            cv2.KMEANS_USE_INITIAL_LABELS,
+        )
+        norms = np.linalg.norm(refined, axis=1, keepdims=True)
+        centers = np.where(norms > 0, refined / np.maximum(norms, 1e-6), centers)
+
+    labels = _nearest(directions, centers)
+    sizes = np.bincount(labels, minlength=len(centers))
+    order = np.argsort(-sizes, kind="stable")
+    labels = np.argsort(order).astype(np.int32)[labels]
+    centers, sizes = centers[order], sizes[order]
+
+    # Representative colour: mean of the most saturated quarter of each cluster
+    colors = np.zeros((len(centers), 3), dtype=np.uint8)
+    for k in range(len(centers)):
+        in_cluster = labels == k
+        if not in_cluster.any():
+            continue
+        strong = lengths[in_cluster] >= np.percentile(lengths[in_cluster], 75)
+        colors[k] = np.round(pixels[in_cluster][strong].mean(axis=0))
+    return LineColors(centers, colors, labels, sizes)
+
+
+def split_series_masks(
+    image: np.ndarray, mask: np.ndarray, n_series: Optional[int] = None, **kwargs
+):
+    """
+    Split a binary line mask into one mask per line colour.
+
+    :param image: BGR image of the same height and width as `mask`
+    :param mask: non-zero where line pixels are (e.g. grid-free chart area)
+    :param n_series: number of series (None - detect, see `quantize_line_colors`)
+    :param kwargs: passed to `quantize_line_colors`
+    :return: masks (list of uint8 arrays, largest series first), colors ((k, 3)
+        BGR colour of each series)
+    """
+    ys, xs = np.nonzero(mask)
+    line_colors = quantize_line_colors(image[ys, xs], n_series, **kwargs)
+    masks = []
+    for k in range(len(line_colors.centers)):
+        series_mask = np.zeros(mask.shape, dtype=np.uint8)
+        in_cluster = line_colors.labels == k
+        series_mask[ys[in_cluster], xs[in_cluster]] = 1
+        masks.append(series_mask)
+    return masks, line_colors.colors
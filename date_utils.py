@@ -1,4 +1,5 @@
 import re
+from functools import lru_cache
 
 YEAR_REGEX = r"19\d{2}|20[0-2]\d"
 MONTH_REGEX = r"0?[1-9]|1[0-2]"
@@ -36,34 +37,56 @@ class DateComponentClassifier:
     }
 
     def classify(self, s):
-        s = s.strip().replace("‘", "").replace("’", "")
-        # Year: 4 digits or 2 digits (assume 2000+)
-        if re.fullmatch(YEAR_REGEX, s):
-            return "year"
-        # Month: text or 1-2 digit number 1-12
-        if s.lower() in self.MONTHS or re.fullmatch(MONTH_REGEX, s):
-            return "month"
-        # Day: 1-2 digit number 1-31
-        if re.fullmatch(DAY_REGEX, s):
-            return "day"
-        # Year and month: e.g. 2023-05, 05/2023, 2023.05, May 2023, 05.23, 05-23
-        if re.fullmatch(YEAR_REGEX + r"[-/.]" + MONTH_REGEX, s) or re.fullmatch(
-            MONTH_REGEX + r"[-/.]" + YEAR_REGEX, s
-        ):
-            return "year and month"
-        if any(month in s.lower() for month in self.MONTHS) and re.search(
-            YEAR_REGEX, s
-        ):
-            return "year and month"
-        # Month and day: e.g. 12-25, Dec 25, 25 Dec
-        if re.fullmatch(MONTH_REGEX + r"[-/.]" + DAY_REGEX, s):
-            return "month and day"
-        if any(month in s.lower() for month in self.MONTHS) and re.search(DAY_REGEX, s):
-            return "month and day"
-        # Day, month, and year: e.g. 25-12-2023, 2023/12/25, 25 Dec 2023
-        try:
-            # dt = parse(s, fuzzy=False)
-            return "day, month and year"
-        except Exception:
-            pass
-        return "unknown"
+        return classify_date_component(s)
+
+
+# Compiled once: labels are classified many times per batch
+_YEAR = re.compile(YEAR_REGEX)
+_MONTH = re.compile(MONTH_REGEX)
+_DAY = re.compile(DAY_REGEX)
+_YEAR_MONTH = re.compile(YEAR_REGEX + r"[-/.]" + MONTH_REGEX)
+_MONTH_YEAR = re.compile(MONTH_REGEX + r"[-/.]" + YEAR_REGEX)
+_MONTH_DAY = re.compile(MONTH_REGEX + r"[-/.]" + DAY_REGEX)
+_MONTH_NAME = re.compile(
+    "|".join(re.escape(m) for m in sorted(DateComponentClassifier.MONTHS))
+)
+
+
+@lru_cache(maxsize=4096)
+def classify_date_component(s: str) -> str:
+    """
+    Date component of an axis label: "year", "month", "day", "year and month",
+    "month and day" or "day, month and year".
+
+    Results are cached, axis labels repeat a lot across charts.
+    """
+    s = s.strip().replace("‘", "").replace("’", "")
+    lower = s.lower()
+    # Year: 4 digits or 2 digits (assume 2000+)
+    if _YEAR.fullmatch(s):
+        return "year"
+    # Month: text or 1-2 digit number 1-12
+    if lower in DateComponentClassifier.MONTHS or _MONTH.fullmatch(s):
+        return "month"
+    # Day: 1-2 digit number 1-31
+    if _DAY.fullmatch(s):
+        return "day"
+    # Year and month: e.g. 2023-05, 05/2023, 2023.05, May 2023, 05.23, 05-23
+    if _YEAR_MONTH.fullmatch(s) or _MONTH_YEAR.fullmatch(s):
+        return "year and month"
+    has_month_name = _MONTH_NAME.search(lower) is not None
+    if has_month_name and _YEAR.search(s):
+        return "year and month"
+    # Month and day: e.g. 12-25, Dec 25, 25 Dec
+    if _MONTH_DAY.fullmatch(s):
+        return "month and day"
+    if has_month_name and _DAY.search(s):
+        return "month and day"
+    # Day, month, and year: e.g. 25-12-2023, 2023/12/25, 25 Dec 2023
+    return "day, month and year"
+
+
+def classify_date_components(texts) -> list:
+    """`classify_date_component` of every label, each distinct label once."""
+    classes = {text: classify_date_component(text) for text in set(texts)}
+    return [classes[text] for text in texts]
@@ -1,8 +1,74 @@
+import logging
 from abc import ABC, abstractmethod
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import cached_property
 
 import numpy as np
-from scipy.interpolate import interp1d
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class PiecewiseLinear:
+    """
+    Piecewise linear interpolation with linear extrapolation past the end knots.
+
+    Gives the same results as scipy's
+    `interp1d(x, y, kind="linear", fill_value="extrapolate")` but is cheap to
+    build and accepts scalars as well as arrays.
+    """
+
+    def __init__(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        order = np.argsort(x, kind="mergesort")
+        self.x = x[order]
+        self.y = y[order]
+
+    def __call__(self, x_new):
+        x_new = np.asarray(x_new, dtype=float)
+        hi = np.searchsorted(self.x, x_new).clip(1, len(self.x) - 1)
+        lo = hi - 1
+        x_lo, x_hi = self.x[lo], self.x[hi]
+        y_lo, y_hi = self.y[lo], self.y[hi]
+        slope = (y_hi - y_lo) / (x_hi - x_lo)
+        return slope * (x_new - x_lo) + y_lo
+
+
+def datetimes_to_seconds(datetimes) -> np.ndarray:
+    """Convert datetimes (python or numpy) to float seconds since 1970-01-01."""
+    arr = np.asarray(datetimes)
+    if arr.dtype.kind != "M":
+        arr = np.array(
+            [dt.replace(tzinfo=None) for dt in arr.ravel()], dtype="datetime64[us]"
+        ).reshape(arr.shape)
+    return arr.astype("datetime64[ns]").astype(np.int64) / 1e9
+
+
+def seconds_to_datetime64(seconds) -> np.ndarray:
+    """Convert float seconds since 1970-01-01 to a `datetime64[ns]` array."""
+    seconds = np.asarray(seconds, dtype=float)
+    valid = np.isfinite(seconds)
+    seconds = np.where(valid, seconds, 0)
+    # Split off whole seconds so that no precision is lost in the float product
+    whole = np.floor(seconds)
+    ns = whole.astype(np.int64) * 10**9 + np.rint((seconds - whole) * 1e9).astype(
+        np.int64
+    )
+    result = ns.view("datetime64[ns]")
+    result[~valid] = np.datetime64("NaT")
+    return result
+
+
+def datetime64_to_datetimes(arr: np.ndarray) -> list:
+    """Convert a `datetime64` array to python datetimes (rounded to microseconds)."""
+    ns = np.asarray(arr).astype("datetime64[ns]")
+    us, rest = np.divmod(ns.astype(np.int64), 1000)
+    us += (rest > 500) | ((rest == 500) & (us % 2 == 1))  # round half to even
+    us = us.view("datetime64[us]")
+    us[np.isnat(ns)] = np.datetime64("NaT")
+    return us.tolist()
 
 
 class FunctionBase(ABC):
@@ -16,18 +82,77 @@ class FunctionBase(ABC):
         """Inverse mapping: value to pixel."""
         pass
 
+    @abstractmethod
+    def call_array(self, px) -> np.ndarray:
+        """Forward mapping of a whole array of pixel coordinates."""
+        pass
+
+    @abstractmethod
+    def invert_array(self, v) -> np.ndarray:
+        """Inverse mapping of a whole array of values."""
+        pass
+
+
+class KnotScale(FunctionBase):
+    """
+    Scale defined by a few knots: pixel coordinates and the matching values in
+    the form the scale interpolates (plain values, seconds or logarithms).
+
+    The scale is just its `KIND` tag and these two float arrays. Pickling
+    sends only them, `to_array` packs them into one contiguous block (e.g. for
+    shared memory or storing next to results), and the interpolators are built
+    on first use.
+    """
+
+    KIND = ""
+
+    def __init__(self, knots, points):
+        self.knots = np.asarray(knots, dtype=np.float64)
+        self.points = np.asarray(points, dtype=np.float64)
+
+    @classmethod
+    def from_points(cls, knots, points):
+        """Scale from `knots` and `points` as stored, without any conversion."""
+        scale = cls.__new__(cls)
+        KnotScale.__init__(scale, knots, points)
+        return scale
+
+    @cached_property
+    def interpolator(self):
+        return PiecewiseLinear(self.knots, self.points)
+
+    @cached_property
+    def inverse_interpolator(self):
+        return PiecewiseLinear(self.points, self.knots)
+
+    def __reduce__(self):
+        return scale_from_array, (self.KIND, self.to_array().tobytes())
+
+    def to_array(self) -> np.ndarray:
+        """Knots and points as one (2, n) float64 array."""
+        return np.stack([self.knots, self.points])
+
+    def __repr__(self):
+        return f"{type(self).__name__}(knots={self.knots!r}, points={self.points!r})"
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    # Writing to the knots would not reach the cached interpolators
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class Linear(KnotScale):
+    KIND = "linear"
 
-class Linear(FunctionBase):
     def __init__(self, knots, values):
         # knots: pixel coordinates, values: corresponding values
-        self.knots = np.array(knots)
-        self.values = np.array(values)
-        self.interpolator = interp1d(
-            self.knots, self.values, kind="linear", fill_value="extrapolate"
-        )
-        self.inverse_interpolator = interp1d(
-            self.values, self.knots, kind="linear", fill_value="extrapolate"
-        )
+        super().__init__(knots, values)
+
+    @property
+    def values(self) -> np.ndarray:
+        return _read_only(self.points)
 
     def __call__(self, px: int):
         return float(self.interpolator(px))
@@ -35,50 +160,89 @@ class Linear(FunctionBase):
     def invert(self, v):
         return float(self.inverse_interpolator(v))
 
+    def call_array(self, px) -> np.ndarray:
+        return self.interpolator(px)
+
+    def invert_array(self, v) -> np.ndarray:
+        return self.inverse_interpolator(v)
+
+
+class LinearDatetime(KnotScale):
+    KIND = "linear_datetime"
 
-class LinearDatetime(FunctionBase):
     def __init__(self, knots, datetimes):
-        # knots: pixel coordinates, datetimes: corresponding datetime objects
-        self.knots = np.array(knots)
-        self.timestamps = np.array([dt.timestamp() for dt in datetimes])
-        self.interpolator = interp1d(
-            self.knots, self.timestamps, kind="linear", fill_value="extrapolate"
-        )
-        self.inverse_interpolator = interp1d(
-            self.timestamps, self.knots, kind="linear", fill_value="extrapolate"
-        )
+        # knots: pixel coordinates, datetimes: corresponding datetime objects.
+        # Datetimes are handled as naive wall-clock time, so the mapping does not
+        # depend on the local timezone of the machine.
+        super().__init__(knots, datetimes_to_seconds(datetimes))
+
+    @property
+    def timestamps(self) -> np.ndarray:
+        return _read_only(self.points)
 
     def __call__(self, px: int):
         # Return datetime for given pixel coordinate
         ts = float(self.interpolator(px))
-        return datetime.fromtimestamp(ts)
+        return EPOCH + timedelta(seconds=ts)
 
     def invert(self, dt: datetime):
         # Return pixel coordinate for given datetime
-        ts = dt.timestamp()
+        ts = datetimes_to_seconds(dt)
         return float(self.inverse_interpolator(ts))
 
+    def call_array(self, px) -> np.ndarray:
+        # Returns datetime64[ns] array for given pixel coordinates
+        return seconds_to_datetime64(self.interpolator(px))
+
+    def invert_array(self, dts) -> np.ndarray:
+        return self.inverse_interpolator(datetimes_to_seconds(dts))
+
+
+class Logarithmic(KnotScale):
+    KIND = "logarithmic"
 
-class Logarithmic(FunctionBase):
     def __init__(self, knots, values):
         # knots: pixel coordinates, values: corresponding values
-        self.knots = np.array(knots)
-        self.log_values = np.log(np.array(values))
-        self.interpolator = interp1d(
-            self.knots, self.log_values, kind="linear", fill_value="extrapolate"
-        )
-        self.inverse_interpolator = interp1d(
-            self.log_values, self.knots, kind="linear", fill_value="extrapolate"
-        )
+        super().__init__(knots, np.log(np.array(values)))
+
+    @property
+    def log_values(self) -> np.ndarray:
+        return _read_only(self.points)
 
     def __call__(self, px: int):
         # Returns value for given pixel coordinate
         val = float(np.exp(self.interpolator(px)))
         if not val:
-            print(val)
+            logger.warning("Logarithmic scale underflowed to %r at pixel %r", val, px)
         return val
 
     def invert(self, v):
         # Returns pixel coordinate for given value
         log_v = np.log(v)
         return float(self.inverse_interpolator(log_v))
+
+    def call_array(self, px) -> np.ndarray:
+        return np.exp(self.interpolator(px))
+
+    def invert_array(self, v) -> np.ndarray:
+        return self.inverse_interpolator(np.log(v))
+
+
+SCALE_KINDS = {cls.KIND: cls for cls in (Linear, LinearDatetime, Logarithmic)}
+
+
+def scale_from_array(kind: str, array) -> KnotScale:
+    """
+    Rebuild a scale from its `KIND` and `to_array()`.
+
+    :param kind: `KIND` of the scale class
+    :param array: the (2, n) array, or a buffer with its float64 bytes (e.g.
+        `bytes` or a `multiprocessing.shared_memory` buffer); float64 data is
+        used without a copy
+    """
+    if kind not in SCALE_KINDS:
+        raise ValueError(f"Unknown scale kind {kind!r}, expected one of {SCALE_KINDS}")
+    if not isinstance(array, np.ndarray):
+        array = np.frombuffer(array, dtype=np.float64).reshape(2, -1)
+    knots, points = np.asarray(array, dtype=np.float64)
+    return SCALE_KINDS[kind].from_points(knots, points)
@@ -0,0 +1,122 @@
+from collections import deque
+from typing import Iterable, Iterator, Optional
+
+import numpy as np
+
+GAP_FILL_MODES = ("midpoint", "linear", "none")
+
+
+def _check_mode(mode):
+    if mode not in GAP_FILL_MODES:
+        raise ValueError(
+            f"Unknown gap fill mode: {mode}. Expected one of {GAP_FILL_MODES}"
+        )
+
+
+def fill_gaps(
+    values: np.ndarray,
+    valid: Optional[np.ndarray] = None,
+    mode: str = "midpoint",
+    max_gap: Optional[int] = None,
+):
+    """
+    Fill runs of missing values that have a valid value on both sides.
+
+    Nearest valid neighbours are found with running max/min over indices, so the
+    cost is linear in the number of values. The inputs are not modified.
+
+    :param values: (n,) or (n, n_series) values
+    :param valid: bool mask of the same shape (default - not NaN)
+    :param mode: "midpoint" - mean of the two neighbours, "linear" - linear
+        interpolation between them, "none" - leave gaps as they are
+    :param max_gap: longest run of missing values to fill (None - any length)
+    :return: filled values (gaps left open are NaN) and the new validity mask
+    """
+    _check_mode(mode)
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values) if valid is None else np.asarray(valid, dtype=bool)
+    values = np.where(valid, values, np.nan)
+    if mode == "none" or values.size == 0:
+        return values, valid.copy()
+
+    n = len(values)
+    index = np.arange(n).reshape((n,) + (1,) * (values.ndim - 1))
+    prev_idx = np.maximum.accumulate(np.where(valid, index, -1), axis=0)
+    next_idx = np.minimum.accumulate(np.where(valid, index, n)[::-1], axis=0)[::-1]
+
+    fill = ~valid & (prev_idx >= 0) & (next_idx < n)
+    if max_gap is not None:
+        fill &= next_idx - prev_idx - 1 <= max_gap
+    if not fill.any():
+        return values, valid.copy()
+
+    prev_val = np.take_along_axis(values, np.clip(prev_idx, 0, n - 1), axis=0)
+    next_val = np.take_along_axis(values, np.clip(next_idx, 0, n - 1), axis=0)
+    if mode == "midpoint":
+        filled = (prev_val + next_val) / 2
+    else:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = (index - prev_idx) / (next_idx - prev_idx)
+        filled = prev_val + (next_val - prev_val) * t
+    return np.where(fill, filled, values), valid | fill
+
+
+def iter_fill_gaps(
+    points: Iterable,
+    mode: str = "midpoint",
+    max_gap: Optional[int] = None,
+    metrics=None,
+) -> Iterator[tuple]:
+    """
+    Streaming `fill_gaps` over `(x, [value or None, ...])` points.
+
+    A point is held back only while one of its series is inside a gap that may
+    still be filled, so at most about `max_gap` points are buffered.
+    """
+    _check_mode(mode)
+    buffer = deque()  # points not yielded yet
+    first = 0  # index of buffer[0]
+    last_valid = {}  # series -> (index, value) of its last valid value
+    open_gaps = {}  # series -> index where a fillable gap starts
+    too_long = set()  # series inside a gap longer than max_gap
+    fillable = mode != "none" and (max_gap is None or max_gap > 0)
+    n = 0
+    for x_value, values in points:
+        values = list(values)
+        buffer.append((x_value, values))
+        for k, value in enumerate(values):
+            if value is not None:
+                start = open_gaps.pop(k, None)
+                if start is not None:
+                    filled = _fill_run(
+                        buffer, first, k, start, n, last_valid[k], value, mode
+                    )
+                    if metrics is not None:
+                        metrics.count("gaps_filled", filled)
+                last_valid[k] = (n, value)
+                too_long.discard(k)
+            elif k in open_gaps:
+                if max_gap is not None and n - open_gaps[k] + 1 > max_gap:
+                    del open_gaps[k]  # leave the rest of this gap open
+                    too_long.add(k)
+            elif fillable and k in last_valid and k not in too_long:
+                open_gaps[k] = n
+        n += 1
+
+        hold = min(open_gaps.values(), default=n)
+        while first < hold:
+            yield buffer.popleft()
+            first += 1
+    yield from buffer
+
+
+def _fill_run(buffer, first, k, start, stop, prev, next_value, mode):
+    prev_index, prev_value = prev
+    for i in range(start, stop):
+        if mode == "midpoint":
+            value = (prev_value + next_value) / 2
+        else:
+            t = (i - prev_index) / (stop - prev_index)
+            value = prev_value + (next_value - prev_value) * t
+        buffer[i - first][1][k] = value
+    return stop - start
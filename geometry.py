@@ -1,37 +1,69 @@
+from typing import NamedTuple, Optional
+
 import cv2
 import numpy as np
 
+from image_io import ink_mask
+
+
+class Clusters(NamedTuple):
+    """Runs of sorted points; cluster k is `values[starts[k]:ends[k]]`."""
+
+    values: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+    sizes: np.ndarray
+    centers: np.ndarray
+
+
+def find_clusters(points, margin) -> Clusters:
+    """
+    Split sorted points into clusters wherever two neighbours are more than
+    `margin` apart.
+
+    :param points: 1D array-like of numbers (need not be sorted)
+    :param margin: max distance between neighbouring points of a cluster
+    :return: `Clusters` with sorted values, start / end (exclusive) indices,
+        sizes and centers (means) of the clusters; all empty for empty input
+    """
+    values = np.sort(np.asarray(points).ravel())
+    if values.size == 0:
+        empty = np.zeros(0, dtype=np.intp)
+        return Clusters(values, empty, empty, empty, np.zeros(0))
+
+    breaks = np.flatnonzero(np.diff(values) > margin) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [values.size]])
+    sizes = ends - starts
+    centers = np.add.reduceat(values, starts) / sizes
+    return Clusters(values, starts, ends, sizes, centers)
+
 
 def cluster_data(points, margin):
-    points = sorted(points)
-    clusters = []
-    current_cluster = [points[0]]
-    for p in points[1:]:
-        if p - current_cluster[-1] <= margin:
-            current_cluster.append(p)
-        else:
-            clusters.append(current_cluster)
-            current_cluster = [p]
-    clusters.append(current_cluster)
-    return clusters
+    """List-of-lists variant of `find_clusters`, kept for compatibility."""
+    clusters = find_clusters(points, margin)
+    return [
+        clusters.values[start:end].tolist()
+        for start, end in zip(clusters.starts, clusters.ends)
+    ]
 
 
-def cut_chart_area(
-    img: np.ndarray,
-    rows_bboxes: list,
-    columns_bboxes: list,
-) -> tuple[np.ndarray, tuple[int, int, int, int]]:
+def _outer_grid_edges(grid_component, size):
     """
-    0. Cut chart area - stage 1: locate x and y axes to exclude them from chart area
-    1. Cut chart area - stage 2: cut empty edges
-    :param img:
-    :param rows_bboxes:
-    :param columns_bboxes:
-    :return: chart_area, area_loc (x1, y1, x2, y2)
+    Inner edges of the first and the last grid line, i.e. the last pixel of the
+    first cluster and the first pixel of the last one. (0, size) without grid.
     """
-    h, w = img.shape
+    clusters = find_clusters(grid_component, margin=5)
+    if clusters.values.size == 0:
+        return 0, size
+    first_end = clusters.values[clusters.ends[0] - 1]
+    last_start = clusters.values[clusters.starts[-1]]
+    return first_end, last_start
 
-    # 1. Locate x and y axes to exclude them from chart area
+
+def _axes_free_area(shape, rows_bboxes, columns_bboxes):
+    """Image area left of / above the axis labels: (x1, y1, x2, y2)."""
+    h, w = shape
     y1_min = np.min([b[1] for b in rows_bboxes])
     y2_max = np.max([b[3] for b in rows_bboxes])
     x1_min = np.min([b[0] for b in columns_bboxes])
@@ -54,7 +86,116 @@ def cut_chart_area(
         x = w - (w - x2_max)
         w = w - x
 
-    x1, y1, x2, y2 = x, y, x + w, y + h
+    return x, y, x + w, y + h
+
+
+def _cut_grid_edges(area, grid_x_component, grid_y_component):
+    """Shrink the area to the outermost grid lines near its edges."""
+    x1, y1, x2, y2 = area
+    width, height = x2 - x1, y2 - y1
+    grid_l, grid_r = _outer_grid_edges(grid_x_component, width)
+    grid_t, grid_b = _outer_grid_edges(grid_y_component, height)
+
+    # cut edges of grid lines
+    if grid_l < 50:
+        x1 += grid_l
+    if width - grid_r < 50:
+        x2 -= width - grid_r
+    if grid_t < 50:
+        y1 += grid_t
+    if height - grid_b < 50:
+        y2 -= height - grid_b
+    return (x1, y1, x2, y2), grid_l
+
+
+def _long_runs(ink, size, gap_size):
+    # Ink pixels of runs at least `size` long, with gaps up to `gap_size` - 1
+    runs = ink
+    if max(gap_size) > 1:
+        runs = cv2.morphologyEx(ink, cv2.MORPH_CLOSE, np.ones(gap_size, np.uint8))
+    runs = cv2.morphologyEx(runs, cv2.MORPH_OPEN, np.ones(size, np.uint8))
+    return cv2.bitwise_and(runs, ink)
+
+
+class Grid(NamedTuple):
+    """Grid lines of a plot ink mask."""
+
+    mask: np.ndarray  # uint8, 1 on the pixels of the grid lines
+    rows: np.ndarray  # rows with a horizontal grid line
+    cols: np.ndarray  # columns with a vertical grid line
+
+
+def detect_grid(ink: np.ndarray, line_ratio: float = 0.5, max_gap: int = 3) -> Grid:
+    """
+    Find the horizontal and vertical grid lines of a plot.
+
+    A morphological opening with a kernel longer than `line_ratio` of the plot
+    width (height) keeps only the ink runs at least that long. The runs are
+    closed over gaps of up to `max_gap` pixels first, so dashed and dotted
+    grids are found as well.
+
+    :param ink: uint8 ink mask of the plot (1 - ink)
+    :param line_ratio: min length of a grid line, as a share of the plot size
+    :param max_gap: longest gap (in pixels) inside a dashed grid line
+    :return: `Grid` with the grid pixels (ink only) and the grid rows / columns
+    """
+    height, width = ink.shape
+    horizontal = _long_runs(ink, (1, int(width * line_ratio) + 1), (1, max_gap + 1))
+    vertical = _long_runs(ink, (int(height * line_ratio) + 1, 1), (max_gap + 1, 1))
+    return Grid(
+        cv2.bitwise_or(horizontal, vertical),
+        np.flatnonzero(horizontal.any(axis=1)),
+        np.flatnonzero(vertical.any(axis=0)),
+    )
+
+
+def _crop_grid(grid: Grid, origin, area) -> Grid:
+    # `grid` found on an area starting at `origin`, cropped to `area` inside it
+    left, top = area[0] - origin[0], area[1] - origin[1]
+    right, bottom = area[2] - origin[0], area[3] - origin[1]
+    rows = grid.rows[(grid.rows >= top) & (grid.rows < bottom)] - top
+    cols = grid.cols[(grid.cols >= left) & (grid.cols < right)] - left
+    return Grid(grid.mask[top:bottom, left:right], rows, cols)
+
+
+def remove_grid(ink: np.ndarray, grid_mask: np.ndarray, thickness: int = 1):
+    """
+    Line mask of a plot: its ink without the grid lines.
+
+    Line pixels on a grid line are kept: a grid pixel between line pixels
+    right above and below it (left and right of it for vertical grid lines),
+    at most `thickness` pixels away, belongs to a line crossing the grid.
+
+    :param ink: uint8 ink mask of the plot (1 - ink)
+    :param grid_mask: `Grid.mask` of the plot
+    :param thickness: thickness of the grid lines (in pixels)
+    :return: uint8 line mask, a new array
+    """
+    lines = cv2.subtract(ink, grid_mask)
+    size = thickness + 2
+    across_rows = cv2.morphologyEx(lines, cv2.MORPH_CLOSE, np.ones((size, 1), np.uint8))
+    across_cols = cv2.morphologyEx(lines, cv2.MORPH_CLOSE, np.ones((1, size), np.uint8))
+    crossings = cv2.bitwise_and(cv2.bitwise_or(across_rows, across_cols), grid_mask)
+    return cv2.bitwise_or(lines, crossings)
+
+
+def cut_chart_area(
+    img: np.ndarray,
+    rows_bboxes: list,
+    columns_bboxes: list,
+) -> tuple[np.ndarray, tuple[int, int, int, int], int, Grid]:
+    """
+    0. Cut chart area - stage 1: locate x and y axes to exclude them from chart area
+    1. Cut chart area - stage 2: cut empty edges
+    2. Cut chart area - stage 3: cut the edges outside the outer grid lines
+    :param img:
+    :param rows_bboxes:
+    :param columns_bboxes:
+    :return: chart_area, area_loc (x1, y1, x2, y2), left grid edge, `Grid` of
+        the chart area
+    """
+    # 1. Locate x and y axes to exclude them from chart area
+    x1, y1, x2, y2 = _axes_free_area(img.shape, rows_bboxes, columns_bboxes)
     cut_area_1 = img[y1:y2, x1:x2]
 
     # 2. Cut empty edges
@@ -80,79 +221,276 @@ def cut_chart_area(
     cut_area_2 = img[y1:y2, x1:x2]
 
     # 3. Grid-edges cut
-    grid_y_component_map = cut_area_2.mean(axis=1) > 0.5
-    grid_x_component_map = cut_area_2.mean(axis=0) > 0.5
+    grid = detect_grid(cut_area_2)
+    area_loc, grid_l = _cut_grid_edges((x1, y1, x2, y2), grid.cols, grid.rows)
+    grid = _crop_grid(grid, (x1, y1), area_loc)
 
-    grid_x_component = np.nonzero(grid_x_component_map)[0]
-    grid_y_component = np.nonzero(grid_y_component_map)[0]
+    # update chart area
+    x1, y1, x2, y2 = area_loc
+    chart_area = img[y1:y2, x1:x2]
 
-    grid_x_component_clusters = cluster_data(grid_x_component, margin=5)
-    grid_y_component_clusters = cluster_data(grid_y_component, margin=5)
+    return chart_area, area_loc, grid_l + new_x1, grid
 
-    # cut edges of grid lines
-    grid_l = max(grid_x_component_clusters[0])
-    grid_r = min(grid_x_component_clusters[-1])
-    grid_t = max(grid_y_component_clusters[0])
-    grid_b = min(grid_y_component_clusters[-1])
 
-    if grid_l < 50:
-        x1 += grid_l
-    if cut_area_2.shape[1] - grid_r < 50:
-        x2 -= cut_area_2.shape[1] - grid_r
-    if grid_t < 50:
-        y1 += grid_t
-    if cut_area_2.shape[0] - grid_b < 50:
-        y2 -= cut_area_2.shape[0] - grid_b
+def min_pool_pyramid(gray: np.ndarray, levels: int) -> np.ndarray:
+    """
+    Downsample by 2**levels, keeping the darkest pixel of every block, so a
+    block with any ink is still ink at the coarse level. Odd sizes are rounded
+    up (the last block is smaller).
 
-    # update chart area
-    chart_area = img[y1:y2, x1:x2]
-    area_loc = (x1, y1, x2, y2)
+    :param gray: grayscale image
+    :param levels: number of halvings
+    :return: coarse grayscale image of shape ceil(shape / 2**levels)
+    """
+    factor = 2**levels
+    # Erosion with the kernel anchored at its top-left corner puts the minimum of
+    # every block at the block's first pixel
+    kernel = np.ones((factor, factor), dtype=np.uint8)
+    eroded = cv2.erode(gray, kernel, anchor=(0, 0))
+    return np.ascontiguousarray(eroded[::factor, ::factor])
+
+
+def _coarse_cells(coarse_ink, factor, area):
+    # Coarse cells covering a full resolution area
+    x1, y1, x2, y2 = area
+    return coarse_ink[y1 // factor : -(-y2 // factor), x1 // factor : -(-x2 // factor)]
+
+
+def _ink_range(gray, coarse_ink, factor, area, ink_threshold):
+    """
+    First and last row of `area` that contain ink, relative to the area top.
+
+    Only the blocks of rows that have ink at the coarse level are read at full
+    resolution, from the outside in.
+    """
+    x1, y1, x2, y2 = area
+    candidates = np.flatnonzero(_coarse_cells(coarse_ink, factor, area).any(axis=1))
+    candidates += y1 // factor
+
+    def first_ink_row(blocks, last):
+        for block in blocks:
+            start = max(block * factor, y1)
+            stop = min((block + 1) * factor, y2)
+            rows = np.flatnonzero((gray[start:stop, x1:x2] < ink_threshold).any(1))
+            if rows.size:
+                return start + (rows[-1] if last else rows[0]) - y1
+        raise ValueError("No ink inside the chart area")
 
-    return chart_area, area_loc, grid_l + new_x1
+    return first_ink_row(candidates, False), first_ink_row(candidates[::-1], True)
+
+
+def cut_chart_area_pyramid(
+    gray: np.ndarray,
+    rows_bboxes: list,
+    columns_bboxes: list,
+    levels: int = 2,
+    coarse: Optional[np.ndarray] = None,
+    ink_threshold: int = 250,
+) -> tuple[tuple[int, int, int, int], int, Grid, np.ndarray]:
+    """
+    `cut_chart_area` on a grayscale image, located coarse-to-fine.
+
+    Empty edges are searched for on the coarse pyramid level and refined at
+    full resolution, so only a few rows and columns outside the plot are read
+    and only the plot is thresholded, to find its grid lines. The result is
+    the same as `cut_chart_area(ink_mask(gray), ...)`, with the ink mask of
+    the chart area in place of the chart area of the whole mask.
+
+    :param gray: full resolution grayscale image
+    :param rows_bboxes: bounding boxes of the x axis labels
+    :param columns_bboxes: bounding boxes of the y axis labels
+    :param levels: pyramid level to search on (downsampling by 2**levels)
+    :param coarse: `min_pool_pyramid(gray, levels)`, if already computed
+    :param ink_threshold: pixels darker than this are ink
+    :return: area_loc (x1, y1, x2, y2), left grid edge, `Grid` of the chart
+        area, ink mask of the chart area
+    """
+    if coarse is None:
+        coarse = min_pool_pyramid(gray, levels)
+    factor = 2**levels
+    coarse_ink = coarse < ink_threshold
+
+    # 1. Locate x and y axes to exclude them from chart area
+    x1, y1, x2, y2 = _axes_free_area(gray.shape, rows_bboxes, columns_bboxes)
+
+    # 2. Cut empty edges
+    top, bottom = _ink_range(gray, coarse_ink, factor, (x1, y1, x2, y2), ink_threshold)
+    left, right = _ink_range(
+        gray.T, coarse_ink.T, factor, (y1, x1, y2, x2), ink_threshold
+    )
+    y1 += top
+    x1 += left
+    x2 = x1 + right - left
+    y2 = y1 + bottom - top
+
+    # 3. Grid-edges cut, on the ink of the plot only
+    ink = ink_mask(gray[y1:y2, x1:x2], ink_threshold)
+    grid = detect_grid(ink)
+    area_loc, grid_l = _cut_grid_edges((x1, y1, x2, y2), grid.cols, grid.rows)
+    grid = _crop_grid(grid, (x1, y1), area_loc)
+    ink = ink[area_loc[1] - y1 : area_loc[3] - y1, area_loc[0] - x1 : area_loc[2] - x1]
+    return area_loc, grid_l + left, grid, ink
+
+
+def crop_axis_label_strips(
+    gray: np.ndarray,
+    ink_threshold: int = 250,
+    line_ratio: float = 0.5,
+    fallback_ratio: float = 0.2,
+    pad: int = 10,
+) -> list[tuple[int, int, np.ndarray]]:
+    """
+    Cheaply locate the axis label strips around the plot and crop them.
+
+    The plot frame is taken from the outermost long horizontal / vertical lines
+    (falling back to `fallback_ratio` of the image size on each side). Ink
+    outside the frame is split into connected components, which are assigned
+    to the top, bottom, left or right strip by their centroid. Each crop keeps
+    only the ink of its own strip and gets a white border of `pad` pixels.
+
+    :param gray: grayscale image
+    :param ink_threshold: pixels darker than this are ink
+    :param line_ratio: min share of ink in a row / column to treat it as a line
+    :param fallback_ratio: plot margin to assume when no frame lines are found
+    :param pad: white border added around each crop
+    :return: list of (x_offset, y_offset, crop); add the offsets to coordinates
+        inside a crop to get full-image coordinates
+    """
+    h, w = gray.shape
+    ink = (gray < ink_threshold).astype(np.uint8)
+
+    long_rows = np.flatnonzero(ink.mean(axis=1) > line_ratio)
+    long_cols = np.flatnonzero(ink.mean(axis=0) > line_ratio)
+    top = long_rows[0] if long_rows.size else int(h * fallback_ratio)
+    bottom = long_rows[-1] if long_rows.size else int(h * (1 - fallback_ratio))
+    left = long_cols[0] if long_cols.size else int(w * fallback_ratio)
+    right = long_cols[-1] if long_cols.size else int(w * (1 - fallback_ratio))
+
+    # Remove the plot interior and the frame lines, keep the margins only
+    margins = ink.copy()
+    margins[top : bottom + 1, left : right + 1] = 0
+    margins[long_rows, :] = 0
+    margins[:, long_cols] = 0
+
+    # Merge characters into words so that a label is never split between strips
+    margins = cv2.dilate(margins, np.ones((3, 9), dtype=np.uint8))
+    n_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(
+        margins, connectivity=8
+    )
+    if n_labels <= 1:
+        return []
+
+    cx, cy = centroids[:, 0], centroids[:, 1]
+    strip_of_label = np.select(
+        [cy > bottom, cx < left, cx > right, cy < top], [1, 2, 3, 4], default=0
+    )
+    strip_of_label[0] = 0  # background
+
+    x1s, y1s = stats[:, cv2.CC_STAT_LEFT], stats[:, cv2.CC_STAT_TOP]
+    x2s = x1s + stats[:, cv2.CC_STAT_WIDTH]
+    y2s = y1s + stats[:, cv2.CC_STAT_HEIGHT]
+
+    strip_map = strip_of_label[labels]
+    crops = []
+    for strip in range(1, 5):
+        members = strip_of_label == strip
+        if not members.any():
+            continue
+        x1, y1 = x1s[members].min(), y1s[members].min()
+        x2, y2 = x2s[members].max(), y2s[members].max()
+
+        keep = (strip_map[y1:y2, x1:x2] == strip) | (ink[y1:y2, x1:x2] == 0)
+        crop = np.where(keep, gray[y1:y2, x1:x2], 255).astype(gray.dtype)
+        crop = cv2.copyMakeBorder(
+            crop, pad, pad, pad, pad, cv2.BORDER_CONSTANT, value=255
+        )
+        crops.append((int(x1) - pad, int(y1) - pad, crop))
+    return crops
 
 
 def find_largest_empty_rectangle(img_shape, bboxes):
-    mask = np.zeros(img_shape[:2], dtype=np.uint8)
-    for left, top, right, bottom in bboxes:
-        cv2.rectangle(mask, (left, top), (right, bottom), 255, -1)
-    inv_mask = cv2.bitwise_not(mask)
-    binary = (inv_mask > 0).astype(np.uint8)
-
-    # Dynamic programming to find largest rectangle of 1s
-    height, width = binary.shape
-    dp = np.zeros((height, width), dtype=int)
-    max_area = 0
-    max_rect = (0, 0, 0, 0)  # x, y, w, h
+    """
+    Find the largest axis-aligned rectangle of the image not covered by bboxes.
+
+    Works in compressed coordinates: the image is cut into a grid along the
+    box edges, so the search runs over O(n^2) cells for n boxes instead of
+    every pixel, with numpy operations per grid row. Boxes are inclusive of
+    their right / bottom edge.
 
-    for i in range(height):
-        for j in range(width):
-            if binary[i, j]:
-                dp[i, j] = dp[i - 1, j] + 1 if i > 0 else 1
-            else:
-                dp[i, j] = 0
-
-        # For each row, use histogram approach to find max rectangle
-        stack = []
-        j = 0
-        while j <= width:
-            cur_height = dp[i, j] if j < width else 0
-            if not stack or cur_height >= dp[i, stack[-1]]:
-                stack.append(j)
-                j += 1
-            else:
-                h = dp[i, stack.pop()]
-                w = j if not stack else j - stack[-1] - 1
-                area = h * w
-                if area > max_area:
-                    max_area = area
-                    x = stack[-1] + 1 if stack else 0
-                    y = i - h + 1
-                    max_rect = (x, y, w, h)
+    :param img_shape: image shape (height, width, ...)
+    :param bboxes: iterable of [left, top, right, bottom]
+    :return: (x, y, w, h) of the largest empty rectangle
+    """
+    height, width = img_shape[:2]
+    boxes = np.asarray(bboxes, dtype=np.int64).reshape(-1, 4)
+    x1 = np.clip(np.minimum(boxes[:, 0], boxes[:, 2]), 0, width)
+    x2 = np.clip(np.maximum(boxes[:, 0], boxes[:, 2]) + 1, 0, width)
+    y1 = np.clip(np.minimum(boxes[:, 1], boxes[:, 3]), 0, height)
+    y2 = np.clip(np.maximum(boxes[:, 1], boxes[:, 3]) + 1, 0, height)
+
+    xs = np.unique(np.concatenate([[0, width], x1, x2]))
+    ys = np.unique(np.concatenate([[0, height], y1, y2]))
+    ix1, ix2 = np.searchsorted(xs, x1), np.searchsorted(xs, x2)
+    iy1, iy2 = np.searchsorted(ys, y1), np.searchsorted(ys, y2)
+
+    # Mark covered cells with a 2D difference array
+    covered = np.zeros((len(ys), len(xs)), dtype=np.int64)
+    np.add.at(covered, (iy1, ix1), 1)
+    np.add.at(covered, (iy1, ix2), -1)
+    np.add.at(covered, (iy2, ix1), -1)
+    np.add.at(covered, (iy2, ix2), 1)
+    free = covered.cumsum(axis=0).cumsum(axis=1)[:-1, :-1] == 0
+
+    # Row-wise DP over cells: height of the free run above each cell and the
+    # horizontal extent shared by that whole run; vectorized per compressed row.
+    n_rows, n_cols = free.shape
+    row_heights = np.diff(ys)
+    heights = np.zeros((n_rows, n_cols), dtype=np.int64)
+    best_areas = np.zeros(n_rows, dtype=np.int64)
+    h = np.zeros(n_cols, dtype=np.int64)
+    left = np.zeros(n_cols, dtype=np.int64)
+    right = np.full(n_cols, width, dtype=np.int64)
+    for i in range(n_rows):
+        f = free[i]
+        h = np.where(f, h + row_heights[i], 0)
+        run_left = np.maximum.accumulate(np.where(f, 0, xs[1:]))
+        run_right = np.minimum.accumulate(np.where(f, width, xs[:-1])[::-1])[::-1]
+        left = np.where(f, np.maximum(left, run_left), 0)
+        right = np.where(f, np.minimum(right, run_right), width)
+        heights[i] = h
+        best_areas[i] = (h * (right - left)).max(initial=0)
+
+    max_area = best_areas.max(initial=0)
+    if max_area == 0:
+        return 0, 0, 0, 0
+
+    # Resolve the rectangle itself with the histogram stack on the first row
+    # that reaches the maximum, so ties resolve as in a pixel-by-pixel scan
+    i = int(np.argmax(best_areas == max_area))
+    row = heights[i].tolist() + [0]
+    col_edges = xs.tolist()
+    bottom = int(ys[i + 1]) - 1
+    max_rect = (0, 0, 0, 0)  # x, y, w, h
+    max_area = 0
+    stack = []
+    j = 0
+    while j <= n_cols:
+        if not stack or row[j] >= row[stack[-1]]:
+            stack.append(j)
+            j += 1
+        else:
+            h = row[stack.pop()]
+            x = col_edges[stack[-1] + 1] if stack else 0
+            w = col_edges[j] - x
+            area = h * w
+            if area > max_area:
+                max_area = area
+                max_rect = (x, bottom - h + 1, w, h)
     return max_rect  # (x, y, w, h)
 
 
 def get_lines(img):
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    gray = img if img.ndim == 2 else cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     edges = cv2.Canny(gray, 50, 150, apertureSize=3)
 
     lines = cv2.HoughLinesP(
@@ -160,7 +498,8 @@ def get_lines(img):
     )
 
     if lines is not None:
-        return np.array([line[0] for line in lines])
+        # (n, 1, 4) or (n, 4) depending on the OpenCV version
+        return lines.reshape(-1, 4)
 
     return []
 
@@ -194,67 +533,183 @@ def find_largest_rectangle(img):
     return x1, y1, x2 - x1, y2 - y1  # (x, y, w, h)
 
 
+def _merge_spans(spans, tolerance):
+    """Merge [start, end] spans that overlap or are at most `tolerance` apart."""
+    merged = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + tolerance:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _gutter_cuts(blank, bands, size):
+    """
+    Panel edges along one axis: 0, the middle of the longest blank run in each
+    gap between neighbouring bands (the middle of the gap without one), size.
+    """
+    cuts = [0]
+    for (_, gap_start), (gap_end, _) in zip(bands, bands[1:]):
+        gap = blank[gap_start + 1 : gap_end]
+        runs = find_clusters(np.flatnonzero(gap), margin=1)
+        if runs.sizes.size:
+            k = int(np.argmax(runs.sizes))
+            cut = gap_start + 1 + int(round(runs.centers[k]))
+        else:
+            cut = (gap_start + gap_end) // 2
+        cuts.append(cut)
+    cuts.append(size)
+    return cuts
+
+
+def find_panels(
+    gray: np.ndarray,
+    min_size: float = 0.15,
+    tolerance: int = 10,
+    ink_threshold: int = 250,
+    max_skew: int = 1,
+) -> list[tuple[int, int, int, int]]:
+    """
+    Split an image holding a grid of charts into one region per chart.
+
+    The frames and axes of the plots are found as long straight lines
+    (`get_lines`). The x extents of the horizontal lines merge into one band
+    per grid column, the y extents of the vertical lines into one band per
+    grid row. A grid cell is a panel when both kinds of lines cross it. The
+    panels are separated in the middle of the widest blank gutter between
+    neighbouring bands, so that every panel keeps its axis labels.
+
+    :param gray: grayscale image
+    :param min_size: min band length, as a share of the image width / height
+    :param tolerance: max distance (in pixels) between the lines of one band
+    :param ink_threshold: pixels darker than this are ink
+    :param max_skew: max offset (in pixels) between the ends of a horizontal
+        or vertical line, e.g. from anti-aliasing
+    :return: (x1, y1, x2, y2) per panel, row by row; the whole image when it
+        holds fewer than 2 panels
+    """
+    height, width = gray.shape[:2]
+    whole = [(0, 0, width, height)]
+    lines = np.asarray(get_lines(gray), dtype=np.int64).reshape(-1, 4)
+    horizontal = lines[np.abs(lines[:, 1] - lines[:, 3]) <= max_skew]
+    vertical = lines[np.abs(lines[:, 0] - lines[:, 2]) <= max_skew]
+    h_spans = np.sort(horizontal[:, [0, 2]], axis=1)
+    v_spans = np.sort(vertical[:, [1, 3]], axis=1)
+
+    columns = [
+        band
+        for band in _merge_spans(h_spans.tolist(), tolerance)
+        if band[1] - band[0] >= min_size * width
+    ]
+    rows = [
+        band
+        for band in _merge_spans(v_spans.tolist(), tolerance)
+        if band[1] - band[0] >= min_size * height
+    ]
+    if len(columns) * len(rows) < 2:
+        return whole
+
+    def crossed(positions, spans, band, across):
+        # Any line at a position inside `band` with a span inside `across`?
+        low, high = band[0] - tolerance, band[1] + tolerance
+        in_band = (positions >= low) & (positions <= high)
+        low, high = across[0] - tolerance, across[1] + tolerance
+        in_across = (spans[:, 0] >= low) & (spans[:, 1] <= high)
+        return bool(np.any(in_band & in_across))
+
+    ink = gray < ink_threshold
+    x_cuts = _gutter_cuts(~ink.any(axis=0), columns, width)
+    y_cuts = _gutter_cuts(~ink.any(axis=1), rows, height)
+    panels = [
+        (x_cuts[c], y_cuts[r], x_cuts[c + 1], y_cuts[r + 1])
+        for r, row in enumerate(rows)
+        for c, column in enumerate(columns)
+        if crossed(horizontal[:, 1], h_spans, row, column)
+        if crossed(vertical[:, 0], v_spans, column, row)
+    ]
+    return panels if len(panels) > 1 else whole
+
+
+def group_by_overlap(bboxes, axis: int, overlap_thresh: float = 0.7):
+    """
+    Group bounding boxes by their overlap along one axis.
+
+    Boxes are visited in input order; every box not yet grouped seeds a group
+    and takes all other ungrouped boxes whose overlap with the seed, relative
+    to the narrower of the two, exceeds `overlap_thresh`. Boxes are bucketed by
+    size (powers of two) and only boxes inside the sorted window of each bucket
+    that can possibly overlap the seed are compared, so a few outlier widths do
+    not widen the window of all the others and typical layouts are grouped in
+    O(n log n).
+
+    :param bboxes: (N, 4) array-like of [left, top, right, bottom]
+    :param axis: 0 - overlap along x (columns), 1 - overlap along y (rows)
+    :param overlap_thresh: min overlap relative to the narrower box
+    :return: ids (list of index lists), groups (list of (k, 4) arrays); groups
+        of a single box are dropped
+    """
+    boxes = np.asarray(bboxes).reshape(-1, 4)
+    lo, hi = boxes[:, axis], boxes[:, axis + 2]
+    sizes = hi - lo
+
+    # Any overlapping box of a bucket starts within (lo_i - max size, hi_i)
+    size_class = np.ceil(np.log2(np.maximum(sizes, 1))).astype(int)
+    buckets = []
+    for size in np.unique(size_class):
+        bucket = np.flatnonzero(size_class == size)
+        bucket = bucket[np.argsort(lo[bucket], kind="stable")]
+        sorted_lo = lo[bucket]
+        starts = np.searchsorted(sorted_lo, lo - sizes[bucket].max(), side="right")
+        ends = np.searchsorted(sorted_lo, hi, side="left")
+        buckets.append((bucket, starts, ends))
+
+    used = np.zeros(len(boxes), dtype=bool)
+    ids, groups = [], []
+    for i in range(len(boxes)):
+        if used[i]:
+            continue
+        used[i] = True
+
+        candidates = np.concatenate(
+            [bucket[starts[i] : ends[i]] for bucket, starts, ends in buckets]
+        )
+        candidates = candidates[~used[candidates]]
+
+        overlap = np.maximum(
+            0, np.minimum(hi[i], hi[candidates]) - np.maximum(lo[i], lo[candidates])
+        )
+        size = np.minimum(sizes[i], sizes[candidates])
+        matches = np.zeros(len(candidates), dtype=bool)
+        np.greater(overlap / np.where(size > 0, size, 1), overlap_thresh, out=matches)
+        matches &= size > 0
+
+        members = np.sort(candidates[matches])
+        if members.size:
+            used[members] = True
+            group_ids = [i, *members.tolist()]
+            ids.append(group_ids)
+            groups.append(boxes[group_ids])
+    return ids, groups
+
+
 def get_column_bboxes(bboxes: list, x_overlap_thresh: float = 0.7):
     """
     Group bounding boxes into columns based on horizontal overlap.
 
-    :param bboxes:
-    :param x_overlap_thresh:
-    :return:
+    :param bboxes: (N, 4) array-like of [left, top, right, bottom]
+    :param x_overlap_thresh: min horizontal overlap relative to the narrower box
+    :return: ids (list of index lists), columns (list of (k, 4) arrays)
     """
-    ids, columns = [], []
-    used = set()
-    for i, box in enumerate(bboxes):
-        if i in used:
-            continue
-        col, col_ids = [box], [i]
-        used.add(i)
-        for j, other in enumerate(bboxes):
-            if j in used:
-                continue
-            # Compute horizontal overlap
-            left = max(box[0], other[0])
-            right = min(box[2], other[2])
-            overlap = max(0, right - left)
-            width = min(box[2] - box[0], other[2] - other[0])
-            if width > 0 and overlap / width > x_overlap_thresh:
-                col.append(other)
-                col_ids.append(j)
-                used.add(j)
-        if len(col) > 1:
-            columns.append(col)
-            ids.append(col_ids)
-    return ids, columns
+    return group_by_overlap(bboxes, axis=0, overlap_thresh=x_overlap_thresh)
 
 
 def get_row_bboxes(bboxes: list, y_overlap_thresh: float = 0.7):
     """
     Group bounding boxes into rows based on vertical overlap.
 
-    :param bboxes:
-    :param y_overlap_thresh:
-    :return:
+    :param bboxes: (N, 4) array-like of [left, top, right, bottom]
+    :param y_overlap_thresh: min vertical overlap relative to the shorter box
+    :return: ids (list of index lists), rows (list of (k, 4) arrays)
     """
-    ids, rows = [], []
-    used = set()
-    for i, box in enumerate(bboxes):
-        if i in used:
-            continue
-        row, row_ids = [box], [i]
-        used.add(i)
-        for j, other in enumerate(bboxes):
-            if j in used:
-                continue
-            # Compute vertical overlap
-            top = max(box[1], other[1])
-            bottom = min(box[3], other[3])
-            overlap = max(0, bottom - top)
-            height = min(box[3] - box[1], other[3] - other[1])
-            if height > 0 and overlap / height > y_overlap_thresh:
-                row.append(other)
-                row_ids.append(j)
-                used.add(j)
-        if len(row) > 1:
-            rows.append(row)
-            ids.append(row_ids)
-    return ids, rows
+    return group_by_overlap(bboxes, axis=1, overlap_thresh=y_overlap_thresh)
@@ -0,0 +1,67 @@
+import os
+from typing import Union
+
+import cv2
+import numpy as np
+
+ImageSource = Union[str, os.PathLike, bytes, bytearray, memoryview, np.ndarray]
+
+_TO_GRAY = {3: cv2.COLOR_BGR2GRAY, 4: cv2.COLOR_BGRA2GRAY}
+_TO_BGR = {1: cv2.COLOR_GRAY2BGR, 4: cv2.COLOR_BGRA2BGR}
+
+
+def load_image(source: ImageSource, color: bool = True) -> np.ndarray:
+    """
+    Load an image from a path, an encoded buffer or an already decoded array.
+
+    Paths and buffers are decoded straight into the requested format, so a
+    grayscale load never materializes the BGR image. Buffers are wrapped
+    without copying (`np.frombuffer`) before `cv2.imdecode`. Arrays already in
+    the requested format are returned as they are, not copied.
+
+    Note that a grayscale decode may differ by one intensity level from
+    converting the decoded BGR image, depending on the codec.
+
+    :param source: file path, encoded image bytes (bytes, bytearray or
+        memoryview) or a uint8 array (grayscale HxW, BGR HxWx3 or BGRA HxWx4)
+    :param color: True - return a BGR image, False - return a grayscale image
+    :return: uint8 array, HxWx3 (BGR) or HxW (grayscale)
+    """
+    flag = cv2.IMREAD_COLOR if color else cv2.IMREAD_GRAYSCALE
+    if isinstance(source, np.ndarray):
+        return _convert(source, color)
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        buffer = np.frombuffer(source, dtype=np.uint8)
+        img = cv2.imdecode(buffer, flag) if buffer.size else None
+        if img is None:
+            raise ValueError("Could not decode image from buffer")
+        return img
+    if isinstance(source, (str, os.PathLike)):
+        if not os.path.exists(source):
+            raise FileNotFoundError(f"Image file not found: {source}")
+        img = cv2.imread(os.fspath(source), flag)
+        if img is None:
+            raise ValueError(f"Could not decode image: {source}")
+        return img
+    raise TypeError(
+        f"Unsupported image source: {type(source).__name__}. "
+        "Expected a path, bytes or a numpy array"
+    )
+
+
+def _convert(img: np.ndarray, color: bool) -> np.ndarray:
+    if img.dtype != np.uint8:
+        raise ValueError(f"Expected a uint8 image, got {img.dtype}")
+    channels = 1 if img.ndim == 2 else img.shape[2]
+    if img.ndim not in (2, 3) or channels not in (1, 3, 4):
+        raise ValueError(f"Unsupported image shape: {img.shape}")
+    if color:
+        return img if channels == 3 else cv2.cvtColor(img, _TO_BGR[channels])
+    if channels == 1:
+        return img if img.ndim == 2 else img[:, :, 0]
+    return cv2.cvtColor(img, _TO_GRAY[channels])
+
+
+def ink_mask(gray: np.ndarray, threshold: int = 250) -> np.ndarray:
+    """uint8 mask, 1 where `gray < threshold` (dark ink on a light background)."""
+    return cv2.threshold(gray, threshold - 1, 1, cv2.THRESH_BINARY_INV)[1]
@@ -0,0 +1,111 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+COUNTERS = (
+    "ocr_tokens",
+    "columns_traced",
+    "ambiguous_columns",
+    "gaps_filled",
+    "layout_hits",
+)
+
+
+class ExtractionMetrics:
+    """
+    Stage timings and counters of one or more extractions.
+
+    Pass an instance to `extract_time_series(..., metrics=...)` to fill it.
+    Several instances can be merged into one, e.g. to aggregate a batch or a
+    service process, and exported as Prometheus text or JSON lines.
+    """
+
+    def __init__(self, labels: Optional[dict] = None):
+        self.labels = dict(labels or {})
+        self.runs = 1
+        self.stages = {}  # stage -> [wall_s, cpu_s]
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+    @contextmanager
+    def stage(self, name: str):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            timing = self.stages.setdefault(name, [0.0, 0.0])
+            timing[0] += time.perf_counter() - wall
+            timing[1] += time.process_time() - cpu
+
+    def count(self, name: str, value: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def merge(self, other: "ExtractionMetrics", count_runs: bool = True):
+        """
+        Add the timings and counters of `other` to these.
+
+        :param other: metrics to add
+        :param count_runs: False when `other` timed a part of an extraction
+            these metrics already count, e.g. one panel of an image
+        """
+        if count_runs:
+            self.runs += other.runs
+        for name, (wall, cpu) in other.stages.items():
+            timing = self.stages.setdefault(name, [0.0, 0.0])
+            timing[0] += wall
+            timing[1] += cpu
+        for name, value in other.counters.items():
+            self.count(name, value)
+        return self
+
+    def to_dict(self) -> dict:
+        return {
+            "labels": self.labels,
+            "runs": self.runs,
+            "stages": {
+                name: {"wall_s": wall, "cpu_s": cpu}
+                for name, (wall, cpu) in self.stages.items()
+            },
+            "counters": dict(self.counters),
+        }
+
+    def to_json_line(self) -> str:
+        return json.dumps(self.to_dict(), separators=(",", ":"))
+
+    def to_prometheus(self, prefix: str = "chart_extraction") -> str:
+        labels = _format_labels(self.labels)
+        lines = [
+            f"# TYPE {prefix}_runs_total counter",
+            f"{prefix}_runs_total{labels} {self.runs}",
+        ]
+        for kind, index in (("wall", 0), ("cpu", 1)):
+            metric = f"{prefix}_stage_{kind}_seconds_total"
+            lines.append(f"# TYPE {metric} counter")
+            for name, timing in self.stages.items():
+                stage_labels = _format_labels({**self.labels, "stage": name})
+                lines.append(f"{metric}{stage_labels} {timing[index]:.6f}")
+        for name, value in self.counters.items():
+            lines.append(f"# TYPE {prefix}_{name}_total counter")
+            lines.append(f"{prefix}_{name}_total{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+
+class NullMetrics(ExtractionMetrics):
+    """Metrics sink that records nothing; used when metrics are not requested."""
+
+    @contextmanager
+    def stage(self, name: str):
+        yield
+
+    def count(self, name: str, value: int = 1):
+        pass
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in labels.items()
+    )
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
@@ -0,0 +1,130 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from geometry import min_pool_pyramid
+
+
+class ChartLayout(NamedTuple):
+    """Geometry of a chart template, as found by the pipeline on a first image."""
+
+    location: tuple  # (x1, y1, x2, y2) of the plot
+    grid_l: int
+    grid_x_component: np.ndarray
+    grid_y_component_map: np.ndarray
+    columns_bboxes: np.ndarray  # y-axis label boxes
+    rows_bboxes: np.ndarray  # x-axis label boxes
+
+
+def layout_fingerprint(
+    gray: np.ndarray,
+    levels: int = 2,
+    coarse: Optional[np.ndarray] = None,
+    ink_threshold: int = 250,
+    line_ratio: float = 0.5,
+) -> str:
+    """
+    Hash of the structural features of a chart image.
+
+    The image size and the positions of its long horizontal and vertical lines
+    (plot frame, axes, grid) are taken from a coarse pyramid level. They stay
+    the same between renders of a dashboard template while the plotted line
+    and the label texts change.
+
+    :param gray: grayscale image
+    :param levels: pyramid level to compute the features on
+    :param coarse: `min_pool_pyramid(gray, levels)`, if already computed
+    :param ink_threshold: pixels darker than this are ink
+    :param line_ratio: min share of ink cells in a coarse row / column
+    :return: hex digest
+    """
+    if coarse is None:
+        coarse = min_pool_pyramid(gray, levels)
+    ink = coarse < ink_threshold
+    digest = hashlib.sha256(f"{gray.shape}|{levels}".encode())
+    digest.update(np.packbits(ink.mean(axis=1) > line_ratio).tobytes())
+    digest.update(np.packbits(ink.mean(axis=0) > line_ratio).tobytes())
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    """
+    In-memory LRU cache of chart layouts keyed by `layout_fingerprint`.
+
+    Pass it to `ChartPipeline(layout_cache=...)`: the first image of a template
+    goes through the whole pipeline and its layout is stored once the labels
+    produced valid scales. Later images with the same fingerprint reuse the
+    chart area and grid and only OCR the known label boxes. A layout is
+    dropped (counted as `stale`) and the image processed from scratch when a
+    label box no longer holds a whole word, or when the labels read from the
+    boxes are not all numbers (y axis) and dates (x axis), strictly monotonic
+    along their axis.
+    """
+
+    def __init__(self, max_items: int = 256, levels: int = 2):
+        """
+        :param max_items: number of layouts to keep
+        :param levels: pyramid level of the fingerprint features
+        """
+        self.max_items = max_items
+        self.levels = levels
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Layouts are learnt again in other processes
+        state = self.__dict__.copy()
+        state["_layouts"] = OrderedDict()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def fingerprint(self, gray: np.ndarray, coarse: Optional[np.ndarray] = None):
+        return layout_fingerprint(gray, self.levels, coarse)
+
+    def get(self, key: str) -> Optional[ChartLayout]:
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is None:
+                self.misses += 1
+                return None
+            self._layouts.move_to_end(key)
+            self.hits += 1
+            return layout
+
+    def put(self, key: str, layout: ChartLayout):
+        with self._lock:
+            self._layouts[key] = layout
+            self._layouts.move_to_end(key)
+            while len(self._layouts) > self.max_items:
+                self._layouts.popitem(last=False)
+
+    def discard(self, key: str):
+        """Drop a layout that did not fit its image any more."""
+        with self._lock:
+            if self._layouts.pop(key, None) is not None:
+                self.stale += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "items": len(self._layouts),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._layouts.clear()
@@ -0,0 +1,225 @@
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from chart_extraction import ChartArtifacts, ChartPipeline, iter_line_values
+from image_io import ImageSource
+from timeseries import TimeSeries
+
+# Artifacts of the stages that only depend on the axes: kept while the frame
+# changes inside the plot only
+_AXES_ARTIFACTS = (
+    "layout_key",
+    "layout",
+    "texts",
+    "bboxes",
+    "column_ids",
+    "columns_bboxes",
+    "row_ids",
+    "rows_bboxes",
+    "x_scale",
+    "y_scale",
+)
+
+# Artifacts of the chart area stage: the scales hold as long as they are equal
+_PLOT_ARTIFACTS = (
+    "location",
+    "grid_l",
+    "grid_x_component",
+    "grid_y_component_map",
+)
+
+# Tracing state: resolving a column looks at this many columns before it
+_CONTEXT = 5
+
+
+class FrameUpdate(NamedTuple):
+    """Result of `LiveChartSession.update` for one frame."""
+
+    time_series: TimeSeries  # the whole series extracted from the frame
+    changed: np.ndarray  # rows of `time_series` that are new or changed
+    full: bool  # True - the whole pipeline ran, False - the axes were reused
+
+    def changed_points(self) -> list:
+        """The new or changed points as (x, [value or None, ...]) tuples."""
+        ts = self.time_series
+        return TimeSeries(
+            ts.x[self.changed], ts.values[self.changed], ts.valid[self.changed]
+        ).to_points()
+
+
+class LiveChartSession:
+    """
+    Extraction from successive captures of the same live chart.
+
+    Every frame is compared with the previous one. When nothing changed
+    outside the plot area (axis labels, ticks, frame), the OCR output, label
+    groups, chart area and scales of the previous frame are kept, and only
+    the plot columns from the first changed one on are traced again, until
+    the trace agrees with the previous one. Otherwise the frame goes through
+    the whole pipeline. The chart area is cut again on every changed frame, and
+    the scales are created again when its edges or grid lines moved, so the
+    series equals the one a full `ChartPipeline.run` would extract from it.
+
+    Charts with several coloured series keep the axes too, but are separated
+    and traced again as a whole.
+
+        session = LiveChartSession(ocr_backend=backend)
+        for frame in frames:
+            update = session.update(frame)
+            store(update.changed_points())
+    """
+
+    def __init__(
+        self,
+        pipeline: Optional[ChartPipeline] = None,
+        tolerance: int = 0,
+        **pipeline_kwargs,
+    ):
+        """
+        :param pipeline: pipeline to run the frames through (default - a new
+            `ChartPipeline(**pipeline_kwargs)`)
+        :param tolerance: pixel intensity differences up to this value are not
+            changes, e.g. to ignore compression noise of the captures
+        """
+        self.pipeline = pipeline or ChartPipeline(**pipeline_kwargs)
+        self.tolerance = tolerance
+        self.artifacts: Optional[ChartArtifacts] = None
+
+    @property
+    def time_series(self) -> Optional[TimeSeries]:
+        """Series of the last frame, None before the first one."""
+        return None if self.artifacts is None else self.artifacts.time_series
+
+    def reset(self):
+        """Forget the previous frame: the next one runs the whole pipeline."""
+        self.artifacts = None
+
+    def update(self, frame: ImageSource) -> FrameUpdate:
+        """
+        Extract the series of the next frame.
+
+        :param frame: path, encoded image bytes or decoded array
+        :return: `FrameUpdate` with the series and the rows that changed since
+            the previous frame
+        """
+        pipeline = self.pipeline
+        previous = self.artifacts
+        artifacts = ChartArtifacts(frame)
+        pipeline.run_stage(artifacts, "decode")
+
+        if previous is None or artifacts.gray.shape != previous.gray.shape:
+            return self._run_all(artifacts, previous)
+
+        diff = cv2.absdiff(artifacts.gray, previous.gray) > self.tolerance
+        x1, y1, x2, y2 = previous.location
+        inside = diff[y1:y2, x1:x2]
+        if np.count_nonzero(inside) != np.count_nonzero(diff):
+            return self._run_all(artifacts, previous)
+
+        for name in _AXES_ARTIFACTS:
+            setattr(artifacts, name, getattr(previous, name))
+        if not inside.any():
+            _reuse_series(artifacts, previous)
+            self.artifacts = artifacts
+            return FrameUpdate(artifacts.time_series, np.zeros(0, np.intp), False)
+
+        pipeline.run_stage(artifacts, "cut_chart_area")
+        if not _same_plot(artifacts, previous):
+            # The line moved the plot edges or the grid lines found
+            artifacts = pipeline.rerun(artifacts, "scale_creation")
+        elif pipeline.n_series == 1:
+            pipeline.run_stage(artifacts, "grid_removal")
+            self._retrace(artifacts, previous)
+        else:
+            artifacts = pipeline.rerun(artifacts, "grid_removal")
+        self.artifacts = artifacts
+        changed = _changed_rows(previous.time_series, artifacts.time_series)
+        return FrameUpdate(artifacts.time_series, changed, False)
+
+    def _run_all(self, artifacts, previous):
+        artifacts = self.pipeline.rerun(artifacts, "layout")
+        self.artifacts = artifacts
+        old = None if previous is None else previous.time_series
+        return FrameUpdate(
+            artifacts.time_series, _changed_rows(old, artifacts.time_series), True
+        )
+
+    def _retrace(self, artifacts, previous):
+        # Single series: trace again from the first column whose line mask
+        # changed, until 5 values in a row past the last one agree with the
+        # previous trace. A column only depends on its mask and the 5 values
+        # before it, so the rest of the trace is unchanged
+        pipeline = self.pipeline
+        chart_area = artifacts.chart_area
+        columns = np.flatnonzero((chart_area != previous.chart_area).any(axis=0))
+        if columns.size == 0:  # e.g. only grid pixels changed
+            _reuse_series(artifacts, previous)
+            return
+        first, last = columns[0], columns[-1]
+        _, y1, _, _ = artifacts.location
+        artifacts.series_masks = [chart_area]
+        artifacts.series_colors = None
+
+        raw = previous.raw_time_series
+        old = raw.values[:, 0]
+        old_valid = raw.valid[:, 0]
+
+        def old_value(column):
+            return old[column].item() if old_valid[column] else None
+
+        with pipeline.metrics.stage("tracing"):
+            carry = [old_value(c) for c in range(max(0, first - _CONTEXT), first)]
+            traced = iter_line_values(
+                chart_area[:, first:],
+                artifacts.y_scale,
+                None,
+                None,
+                y1,
+                allowed_margin=pipeline.allowed_margin,
+                chunk_size=last - first + 1 + _CONTEXT,
+                metrics=pipeline.metrics,
+                carry=carry,
+            )
+            values = raw.values.copy()
+            agree = 0
+            for column, value in enumerate(traced, start=first):
+                values[column, 0] = np.nan if value is None else value
+                agree = agree + 1 if value == old_value(column) else 0
+                if column > last and agree >= _CONTEXT:
+                    break
+            artifacts.raw_time_series = TimeSeries(raw.x, values)
+
+        pipeline.run_stage(artifacts, "fill_gaps")
+
+
+def _same_plot(artifacts, previous):
+    return all(
+        np.array_equal(getattr(artifacts, name), getattr(previous, name))
+        for name in _PLOT_ARTIFACTS
+    )
+
+
+def _reuse_series(artifacts, previous):
+    for name in (
+        *_PLOT_ARTIFACTS,
+        "plot_ink",
+        "grid_mask",
+        "chart_area",
+        "series_masks",
+        "series_colors",
+        "raw_time_series",
+        "time_series",
+    ):
+        setattr(artifacts, name, getattr(previous, name))
+
+
+def _changed_rows(old: Optional[TimeSeries], new: TimeSeries) -> np.ndarray:
+    """Rows of `new` that are not in `old` with the same x and values."""
+    if old is None or len(old) != len(new) or old.n_series != new.n_series:
+        return np.arange(len(new))
+    same_values = (old.values == new.values) | ~new.valid
+    same = (old.x == new.x) & (old.valid == new.valid).all(axis=1)
+    same &= same_values.all(axis=1)
+    return np.flatnonzero(~same)
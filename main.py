@@ -1,14 +1,47 @@
+import argparse
+import logging
+import sys
+
 import matplotlib.pyplot as plt
 
-from chart_extraction import extract_time_series
+from chart_extraction import iter_time_series
+from writers import open_writer
 
 if __name__ == "__main__":
-    ts = extract_time_series("data/img_5.png")
-    # plot time series
-    dates = [t[0] for t in ts if t is not None]
-    values = [t[1] for t in ts if t is not None]
-    plt.plot(dates, values)
-    plt.xlabel("Date")
-    plt.ylabel("Value")
-    plt.title("Extracted Time Series")
-    plt.show()
+    arg_parser = argparse.ArgumentParser(
+        description="Extract time series from a line chart image."
+    )
+    arg_parser.add_argument("image", nargs="?", default="data/img_5.png")
+    arg_parser.add_argument(
+        "--output",
+        help="stream the series to a .csv or .jsonl file instead of plotting",
+    )
+    arg_parser.add_argument(
+        "--series",
+        type=int,
+        default=1,
+        help="number of coloured series (0 - detect from the line colours)",
+    )
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+
+    points = iter_time_series(args.image, n_series=args.series or None)
+    if args.output:
+        with open_writer(args.output) as writer:
+            n_points = writer.write_all(points)
+        print(f"Wrote {n_points} points to {args.output}")
+    else:
+        # plot time series
+        points = list(points)
+        if not points:
+            logging.error("No time series found in %s", args.image)
+            sys.exit(1)
+        dates, values = zip(*points)
+        plt.plot(
+            dates, [[float("nan") if v is None else v for v in vs] for vs in values]
+        )
+        plt.xlabel("Date")
+        plt.ylabel("Value")
+        plt.title("Extracted Time Series")
+        plt.show()
@@ -0,0 +1,312 @@
+import json
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import traceback
+from abc import ABC, abstractmethod
+from multiprocessing import get_context
+from typing import Optional
+
+import cv2
+import numpy as np
+from pytesseract import pytesseract
+
+from ocr_cache import image_digest
+
+DEFAULT_CONFIG = "--oem 3 --psm 11"
+
+
+def data_to_words(data: dict):
+    """Convert tesseract `image_to_data` style columns to (words, bboxes)."""
+    words = []
+    bboxes = []
+    for txt, left, top, width, height in zip(
+        data["text"], data["left"], data["top"], data["width"], data["height"]
+    ):
+        if txt.strip():
+            words.append(txt)
+            bboxes.append([left, top, left + width, top + height])
+    return words, bboxes
+
+
+class OcrBackend(ABC):
+    """
+    OCR engine interface.
+
+    `recognize` returns `(words, bboxes)` with one `[left, top, right, bottom]`
+    box per word. Backends must be safe to call from several threads.
+    """
+
+    name = "base"
+    config = ""
+
+    @abstractmethod
+    def recognize(self, img: np.ndarray):
+        """Recognize words in a grayscale or BGR image."""
+        pass
+
+    @property
+    def cache_key(self) -> str:
+        """Identifies the backend settings in `OcrCache` keys."""
+        return f"{self.name}|{self.config}"
+
+    def close(self):
+        """Release resources held by the backend."""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PytesseractBackend(OcrBackend):
+    """Runs `pytesseract.image_to_data`: a new tesseract process per call."""
+
+    name = "pytesseract"
+
+    def __init__(self, config: str = DEFAULT_CONFIG):
+        self.config = config
+
+    def recognize(self, img):
+        data = pytesseract.image_to_data(
+            img, config=self.config, output_type=pytesseract.Output.DICT
+        )
+        return data_to_words(data)
+
+
+class TesseractWorkerBackend(OcrBackend):
+    """
+    Keeps a pool of worker processes and feeds them images over pipes, so the
+    calling process neither starts a process nor writes temp files per call.
+
+    With the default `engine="tesserocr"` every worker loads the tesseract
+    engine once and reuses it for all its images. `engine="cli"` pipes every
+    image to `tesseract stdin stdout tsv` instead, for hosts without
+    `tesserocr`: it still starts one tesseract process per image.
+    Workers are started lazily, so the backend can be pickled to other processes.
+    """
+
+    name = "tesseract-workers"
+
+    def __init__(
+        self,
+        config: str = DEFAULT_CONFIG,
+        workers: int = 2,
+        tesseract_cmd: Optional[str] = None,
+        timeout: float = 60.0,
+        engine: str = "tesserocr",
+    ):
+        if engine not in _ENGINES:
+            raise ValueError(
+                f"Unknown OCR engine {engine!r}, expected one of {list(_ENGINES)}"
+            )
+        self.config = config
+        self.workers = workers
+        self.tesseract_cmd = tesseract_cmd or pytesseract.tesseract_cmd
+        self.timeout = timeout
+        self.engine = engine
+        self._idle = None
+        self._processes = []
+        self._lock = threading.Lock()
+
+    @property
+    def cache_key(self) -> str:
+        return f"{self.name}|{self.engine}|{self.config}"
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.update(_idle=None, _processes=[], _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def recognize(self, img):
+        self._start()
+        conn = self._idle.get()
+        try:
+            conn.send(np.ascontiguousarray(img))
+            if not conn.poll(self.timeout):
+                raise TimeoutError("OCR worker did not respond in time")
+            status, payload = conn.recv()
+        except (EOFError, OSError, TimeoutError) as e:
+            # The worker is gone or stuck: replace it and report the failure
+            conn = self._replace(conn)
+            raise RuntimeError(f"OCR worker failed: {type(e).__name__}: {e}") from e
+        finally:
+            self._idle.put(conn)
+        if status != "ok":
+            raise RuntimeError(f"OCR worker failed:\n{payload}")
+        return payload
+
+    def close(self):
+        with self._lock:
+            for process, conn in self._processes:
+                try:
+                    conn.send(None)
+                except OSError:
+                    pass
+                process.join(timeout=1)
+                if process.is_alive():
+                    process.terminate()
+            self._processes = []
+            self._idle = None
+
+    def _start(self):
+        with self._lock:
+            if self._idle is not None:
+                return
+            self._idle = queue.Queue()
+            for _ in range(self.workers):
+                self._idle.put(self._spawn())
+
+    def _spawn(self):
+        parent_conn, child_conn = get_context("spawn").Pipe()
+        process = get_context("spawn").Process(
+            target=_tesseract_worker,
+            args=(child_conn, self.engine, self.config, self.tesseract_cmd),
+            daemon=True,
+        )
+        process.start()
+        child_conn.close()
+        self._processes.append((process, parent_conn))
+        return parent_conn
+
+    def _replace(self, conn):
+        with self._lock:
+            for i, (process, old_conn) in enumerate(self._processes):
+                if old_conn is conn:
+                    process.terminate()
+                    del self._processes[i]
+                    break
+            return self._spawn()
+
+
+def _parse_config(config):
+    psm = re.search(r"--psm\s+(\d+)", config)
+    oem = re.search(r"--oem\s+(\d+)", config)
+    return (int(psm.group(1)) if psm else 3), (int(oem.group(1)) if oem else 3)
+
+
+def _tesserocr_engine(config, tesseract_cmd):
+    import tesserocr
+
+    psm, oem = _parse_config(config)
+    api = tesserocr.PyTessBaseAPI(psm=psm, oem=oem)
+
+    def recognize(img):
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        h, w = img.shape
+        api.SetImageBytes(img.tobytes(), w, h, 1, w)
+        api.Recognize()
+        words, bboxes = [], []
+        iterator = api.GetIterator()
+        level = tesserocr.RIL.WORD
+        for word in tesserocr.iterate_level(iterator, level):
+            text = word.GetUTF8Text(level)
+            box = word.BoundingBox(level)
+            if text and text.strip() and box:
+                words.append(text)
+                bboxes.append(list(box))
+        return words, bboxes
+
+    return recognize
+
+
+def _tesseract_cli_engine(config, tesseract_cmd):
+    if not shutil.which(tesseract_cmd):
+        raise RuntimeError(f"tesseract executable not found: {tesseract_cmd}")
+    args = [tesseract_cmd, "stdin", "stdout", *config.split(), "tsv"]
+
+    def recognize(img):
+        ok, encoded = cv2.imencode(".pnm", img)
+        if not ok:
+            raise ValueError("Could not encode image for tesseract")
+        out = subprocess.run(
+            args, input=encoded.tobytes(), capture_output=True, check=True
+        ).stdout.decode("utf-8")
+        lines = [line.split("\t") for line in out.splitlines()]
+        header, rows = lines[0], [row for row in lines[1:] if len(row) == 12]
+        columns = {name: [row[i] for row in rows] for i, name in enumerate(header)}
+        for name in ("left", "top", "width", "height"):
+            columns[name] = [int(v) for v in columns[name]]
+        return data_to_words(columns)
+
+    return recognize
+
+
+_ENGINES = {"tesserocr": _tesserocr_engine, "cli": _tesseract_cli_engine}
+
+
+def _tesseract_worker(conn, engine, config, tesseract_cmd):
+    # The engine is created once and serves every image sent to this worker
+    try:
+        recognize = _ENGINES[engine](config, tesseract_cmd)
+    except Exception:
+        recognize = None
+        error = traceback.format_exc()
+
+    while True:
+        try:
+            img = conn.recv()
+        except EOFError:
+            return
+        if img is None:
+            return
+        if recognize is None:
+            conn.send(("error", error))
+            continue
+        try:
+            conn.send(("ok", recognize(img)))
+        except Exception:
+            conn.send(("error", traceback.format_exc()))
+
+
+class FakeOcrBackend(OcrBackend):
+    """
+    Deterministic OCR backend for tests and benchmarks.
+
+    Results are looked up by image content (see `image_digest`); unknown images
+    get `default` (a fixed result or a callable taking the image).
+    """
+
+    name = "fake"
+
+    def __init__(self, results: Optional[dict] = None, default=None):
+        self.results = dict(results or {})
+        self.default = default
+        self.calls = 0
+
+    def add(self, img, words, bboxes):
+        self.results[image_digest(img)] = (list(words), [list(b) for b in bboxes])
+
+    def recognize(self, img):
+        self.calls += 1
+        result = self.results.get(image_digest(img))
+        if result is None:
+            default = self.default
+            result = default(img) if callable(default) else default
+        if result is None:
+            return [], []
+        words, bboxes = result
+        return list(words), [list(b) for b in bboxes]
+
+    def save(self, path: str):
+        with open(path, "w") as f:
+            json.dump(
+                {k: {"words": w, "bboxes": b} for k, (w, b) in self.results.items()},
+                f,
+            )
+
+    @classmethod
+    def load(cls, path: str, default=None):
+        with open(path) as f:
+            data = json.load(f)
+        results = {k: (v["words"], v["bboxes"]) for k, v in data.items()}
+        return cls(results, default=default)
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def image_digest(img: np.ndarray, extra: str = "") -> str:
+    """Hash of the image pixels, shape and dtype (plus an optional suffix)."""
+    img = np.ascontiguousarray(img)
+    digest = hashlib.sha256()
+    digest.update(f"{img.shape}|{img.dtype.str}|{extra}".encode())
+    digest.update(memoryview(img).cast("B"))
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """
+    Content-addressed cache of OCR results.
+
+    Entries are keyed by a hash of the image pixels (shape, dtype and bytes) and
+    the OCR config, so byte-identical images skip OCR entirely. Lookups go
+    through an in-memory LRU tier first and an optional on-disk tier second;
+    the disk tier evicts the least recently used files once it grows above
+    `max_disk_bytes`.
+    """
+
+    def __init__(
+        self,
+        max_memory_items: int = 1024,
+        cache_dir: Optional[str] = None,
+        max_disk_bytes: int = 256 * 2**20,
+    ):
+        self.max_memory_items = max_memory_items
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+
+    def __getstate__(self):
+        # Only the configuration and the disk tier travel to other processes
+        state = self.__dict__.copy()
+        state["_memory"] = OrderedDict()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(img: np.ndarray, config: str) -> str:
+        return image_digest(img, config)
+
+    def get(self, key: str):
+        """Return the cached `(words, bboxes)` for `key` or None."""
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return _copy(result)
+
+        result = self._read_disk(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            self._put_memory(key, result)
+        return _copy(result)
+
+    def put(self, key: str, result):
+        words, bboxes = result
+        result = (list(words), [[int(v) for v in box] for box in bboxes])
+        with self._lock:
+            self._put_memory(key, result)
+        self._write_disk(key, result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._disk_bytes = 0
+        for path, _, _ in self._disk_entries():
+            os.remove(path)
+
+    def _put_memory(self, key, result):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if not _is_result(data):
+                return None  # not an entry of this cache: a miss
+            os.utime(path)  # mark as recently used for eviction
+        except (OSError, ValueError):
+            return None
+        return data["words"], data["bboxes"]
+
+    def _write_disk(self, key, result):
+        if not self.cache_dir:
+            return
+        words, bboxes = result
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"words": words, "bboxes": bboxes}, f)
+            size = os.path.getsize(tmp_path)
+            try:
+                size -= os.path.getsize(path)  # an entry being overwritten
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # A full or read-only disk only costs the cache entry
+            logger.warning("Could not write OCR cache entry %s: %s", path, e)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._disk_bytes += size
+            if self._disk_bytes <= self.max_disk_bytes:
+                return
+        self._evict_disk()
+
+    def _disk_entries(self):
+        if not self.cache_dir:
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((path, st.st_size, st.st_mtime))
+        return entries
+
+    def _evict_disk(self):
+        # Rescan the directory: other processes may share the same disk tier
+        entries = self._disk_entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in sorted(entries, key=lambda e: e[2]):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        with self._lock:
+            self._disk_bytes = total
+
+
+def _is_result(data):
+    # Shape of the disk entries: {"words": [...], "bboxes": [[l, t, r, b], ...]}
+    if not isinstance(data, dict):
+        return False
+    words, bboxes = data.get("words"), data.get("bboxes")
+    if not isinstance(words, list) or not isinstance(bboxes, list):
+        return False
+    if len(words) != len(bboxes) or not all(isinstance(w, str) for w in words):
+        return False
+    return all(isinstance(box, list) and len(box) == 4 for box in bboxes)
+
+
+def _copy(result):
+    words, bboxes = result
+    return list(words), [list(box) for box in bboxes]
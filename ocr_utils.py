@@ -1,57 +1,202 @@
-from datetime import datetime
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional
 
+import cv2
+import numpy as np
 from dateutil import parser
-from pytesseract import pytesseract
 
-from date_utils import DateComponentClassifier
+from date_utils import (
+    DateComponentClassifier,
+    classify_date_component,
+    classify_date_components,
+)
+from geometry import crop_axis_label_strips
+from ocr_backends import DEFAULT_CONFIG, OcrBackend, PytesseractBackend
+from ocr_cache import OcrCache
 
 date_component = DateComponentClassifier()
-pytesseract_config = "--oem 3 --psm 11"
+pytesseract_config = DEFAULT_CONFIG
+default_backend: Optional[OcrBackend] = None
 
 
-def ocr(img):
-    data = pytesseract.image_to_data(
-        img, config=pytesseract_config, output_type=pytesseract.Output.DICT
-    )
-    words = []
-    bboxes = []
-    for txt, left, top, width, height in zip(
-        data["text"], data["left"], data["top"], data["width"], data["height"]
-    ):
-        if txt.strip():
-            words.append(txt)
-            bboxes.append([left, top, left + width, top + height])
+def set_default_backend(backend: Optional[OcrBackend]):
+    """Use `backend` for every `ocr` call that does not pass one explicitly."""
+    global default_backend
+    default_backend = backend
+
+
+def ocr(img, cache: Optional[OcrCache] = None, backend: Optional[OcrBackend] = None):
+    """
+    Recognize words in the image.
+
+    :param img: image as numpy array
+    :param cache: optional `OcrCache`; identical images are then OCR-ed only once
+    :param backend: OCR backend (default - `default_backend` or pytesseract)
+    :return: words, bboxes ([left, top, right, bottom] per word)
+    """
+    backend = backend or default_backend or PytesseractBackend(pytesseract_config)
+    if cache is None:
+        return backend.recognize(img)
+
+    key = cache.make_key(img, backend.cache_key)
+    result = cache.get(key)
+    if result is None:
+        result = backend.recognize(img)
+        cache.put(key, result)
+    return result
+
+
+def ocr_axis_strips(
+    img,
+    cache: Optional[OcrCache] = None,
+    max_workers: Optional[int] = None,
+    backend: Optional[OcrBackend] = None,
+):
+    """
+    Recognize words in the axis label strips only, instead of the whole image.
+
+    The strips are located with `crop_axis_label_strips` and OCR-ed
+    concurrently; bounding boxes are mapped back to full-image coordinates.
+
+    :param img: grayscale image as numpy array
+    :param cache: optional `OcrCache`, applied per strip
+    :param max_workers: number of concurrent OCR calls (default - one per strip)
+    :param backend: OCR backend, see `ocr`
+    :return: words, bboxes ([left, top, right, bottom] per word)
+    """
+    strips = crop_axis_label_strips(img)
+    if not strips:
+        return [], []
+
+    with ThreadPoolExecutor(max_workers=max_workers or len(strips)) as pool:
+        results = list(
+            pool.map(lambda s: ocr(s[2], cache=cache, backend=backend), strips)
+        )
+
+    words, bboxes = [], []
+    for (x_offset, y_offset, _), (strip_words, strip_bboxes) in zip(strips, results):
+        words.extend(strip_words)
+        bboxes.extend(
+            [left + x_offset, top + y_offset, right + x_offset, bottom + y_offset]
+            for left, top, right, bottom in strip_bboxes
+        )
     return words, bboxes
 
 
+def label_crop(img, bbox, pad: int = 4, border: int = 10):
+    """
+    Crop of a label box with `pad` pixels of context around it and a white
+    `border`, so that the OCR engine sees the text with a margin.
+    """
+    h, w = img.shape[:2]
+    left, top, right, bottom = bbox
+    crop = img[
+        max(top - pad, 0) : min(bottom + pad, h),
+        max(left - pad, 0) : min(right + pad, w),
+    ]
+    return cv2.copyMakeBorder(
+        crop, border, border, border, border, cv2.BORDER_CONSTANT, value=255
+    )
+
+
+def ocr_label_crops(
+    img,
+    bboxes: list,
+    cache: Optional[OcrCache] = None,
+    max_workers: Optional[int] = None,
+    backend: Optional[OcrBackend] = None,
+):
+    """
+    Recognize the text of known label boxes, e.g. from a cached chart layout.
+
+    Each box is cropped with `label_crop` and OCR-ed on its own, concurrently.
+
+    :param img: grayscale image as numpy array
+    :param bboxes: label boxes ([left, top, right, bottom])
+    :param cache: optional `OcrCache`, applied per crop
+    :param max_workers: number of concurrent OCR calls (default - one per CPU)
+    :param backend: OCR backend, see `ocr`
+    :return: text per box (the word closest to the crop centre), None for boxes
+        without text and for words reaching the edge of the crop, which may
+        be cut off (e.g. a label that grew wider than the box)
+    """
+    if not bboxes:
+        return []
+
+    pad, border = 4, 10
+    crops = [label_crop(img, bbox, pad, border) for bbox in bboxes]
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count()) as pool:
+        results = list(pool.map(lambda c: ocr(c, cache=cache, backend=backend), crops))
+
+    texts = []
+    for bbox, crop, (words, word_bboxes) in zip(bboxes, crops, results):
+        if not words:
+            texts.append(None)
+            continue
+        centers = np.array(
+            [[(b[0] + b[2]) / 2, (b[1] + b[3]) / 2] for b in word_bboxes]
+        )
+        distances = np.abs(centers - [crop.shape[1] / 2, crop.shape[0] / 2]).sum(axis=1)
+        i = int(np.argmin(distances))
+        if _touches_crop_edge(word_bboxes[i], bbox, img.shape, pad, border):
+            texts.append(None)
+        else:
+            texts.append(words[i])
+    return texts
+
+
+def _touches_crop_edge(word_bbox, bbox, img_shape, pad, border):
+    # Edges of the `label_crop` of `bbox` in crop coordinates; only the ones
+    # inside the image can cut a word off
+    h, w = img_shape[:2]
+    left, top, right, bottom = bbox
+    x1, y1 = max(left - pad, 0), max(top - pad, 0)
+    x2, y2 = min(right + pad, w), min(bottom + pad, h)
+    word_left, word_top, word_right, word_bottom = word_bbox
+    return any(
+        (
+            x1 > 0 and word_left <= border,
+            y1 > 0 and word_top <= border,
+            x2 < w and word_right >= border + x2 - x1,
+            y2 < h and word_bottom >= border + y2 - y1,
+        )
+    )
+
+
+# Multipliers of the number suffixes on axis labels
+NUMBER_SUFFIXES = {"k": 1e3, "m": 1e6, "b": 1e9, "%": 0.01}
+
+
+@lru_cache(maxsize=4096)
+def parse_number(text: str) -> float:
+    """
+    Number of an axis label, e.g. "1,5", "1.5k", "2M", "45%"; NaN if the
+    label is not a number. Results are cached.
+    """
+    text = text.replace(",", ".").strip().lower()
+    multiplier = NUMBER_SUFFIXES.get(text[-1:])
+    if multiplier is not None:
+        text = text[:-1].strip()
+    try:
+        number = float(text)
+    except ValueError:
+        return np.nan
+    # Divide percentages, 45 * 0.01 is not exactly 0.45
+    return number / 100.0 if multiplier == 0.01 else number * (multiplier or 1)
+
+
 def texts_to_numbers(texts):
-    numbers = []
-    for text in texts:
-        text = text.replace(",", ".").strip().lower()
-        try:
-            if text.endswith("k"):
-                text = text[:-1].strip()
-                num = float(text) * 1e3
-            elif text.endswith("m"):
-                text = text[:-1].strip()
-                num = float(text) * 1e6
-            elif text.endswith("b"):
-                text = text[:-1].strip()
-                num = float(text) * 1e9
-            elif text.endswith("%"):
-                text = text[:-1].strip()
-                num = float(text) / 100.0
-            else:
-                num = float(text)
-            numbers.append(num)
-        except ValueError:
-            numbers.append(-1.0)
-    return numbers
+    """`parse_number` of every label, each distinct label once."""
+    numbers = {text: parse_number(text) for text in set(texts)}
+    return [numbers[text] for text in texts]
 
 
 def texts_to_datetimes(texts):
     index = []
-    date_components = [date_component.classify(text) for text in texts]
+    date_components = classify_date_components(texts)
 
     # Handle short format like '12.19', '12/19', '12-19' as month and year
     if all(dc == "year and month" for dc in date_components):
@@ -77,7 +222,7 @@ def texts_to_datetimes(texts):
                 month = 1
                 result.append(datetime(year, month, 1))
             elif dc == "month":
-                month = parser.parse(t.replace("‘", "").replace("’", "")).month
+                month = _parse_month(t)
                 result.append(datetime(year if year else first_year - 1, month, 1))
             elif dc == "day":
                 result.append(
@@ -88,11 +233,37 @@ def texts_to_datetimes(texts):
         return result
 
     # Fallback: parse as full date
-    for text in texts:
-        text = text.strip()
-        try:
-            extracted_date = parser.parse(text, fuzzy=True)
-        except (ValueError, TypeError):
-            extracted_date = None
-        index.append(extracted_date)
-    return index
+    today = date.today()
+    dates = {text: _parse_date(text.strip(), today) for text in set(texts)}
+    return [dates[text] for text in texts]
+
+
+def parse_axis_labels(column_texts, row_texts):
+    """
+    Parse the labels of both axes at once.
+
+    :param column_texts: y-axis labels
+    :param row_texts: x-axis labels
+    :return: numbers of the y-axis labels, datetimes of the x-axis labels
+    """
+    return texts_to_numbers(column_texts), texts_to_datetimes(row_texts)
+
+
+def clear_label_caches():
+    """Empty the caches of parsed axis labels."""
+    for cached in (parse_number, _parse_month, _parse_date, classify_date_component):
+        cached.cache_clear()
+
+
+@lru_cache(maxsize=1024)
+def _parse_month(text):
+    return parser.parse(text.replace("‘", "").replace("’", "")).month
+
+
+@lru_cache(maxsize=4096)
+def _parse_date(text, today):
+    # Fields missing from the label are taken from `today`, hence the key
+    try:
+        return parser.parse(text, fuzzy=True)
+    except (ValueError, TypeError):
+        return None
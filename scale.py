@@ -1,9 +1,12 @@
-from typing import Callable, Optional
+import logging
+from typing import Optional
 
 import numpy as np
 
 from data_integrity import ensure_linear_continuity
-from function import Linear, LinearDatetime, Logarithmic
+from function import FunctionBase, Linear, LinearDatetime, Logarithmic
+
+logger = logging.getLogger(__name__)
 
 
 def estimate_log_base(numbers: np.ndarray) -> float:
@@ -38,12 +41,13 @@ def is_log_scale(numbers: np.ndarray, tolerance: float = 0.1) -> bool:
     return False
 
 
-def create_y_scale(values, knots: np.ndarray) -> Optional[Callable]:
+def create_y_scale(values, knots: np.ndarray) -> Optional[FunctionBase]:
     """
 
     :param values:
     :param knots:
-    :return: function mapping y-coordinate to value. Function should be reversible.
+    :return: function mapping y-coordinate to value. Function should be reversible
+        and supports array evaluation (`call_array` / `invert_array`).
     """
     if len(knots) != len(values):
         raise ValueError("Number of bounding boxes and numbers must match")
@@ -52,13 +56,13 @@ def create_y_scale(values, knots: np.ndarray) -> Optional[Callable]:
         return None
 
     if is_log_scale(values):
-        print("Using logarithmic scale for y-axis")
+        logger.debug("Using logarithmic scale for y-axis")
         arg_sorted = np.argsort(knots)
         y_sorted = knots[arg_sorted]
         n_sorted = np.array(values)[arg_sorted]
         return Logarithmic(knots=y_sorted, values=n_sorted)
     else:
-        print("Using linear scale for y-axis")
+        logger.debug("Using linear scale for y-axis")
         values, knots = ensure_linear_continuity(
             x1=np.array(values), x2=np.array(knots)
         )
@@ -68,7 +72,7 @@ def create_y_scale(values, knots: np.ndarray) -> Optional[Callable]:
         return Linear(knots=y_sorted, values=n_sorted)
 
 
-def create_x_scale(row_index, knots: np.ndarray) -> Optional[Callable]:
+def create_x_scale(row_index, knots: np.ndarray) -> Optional[FunctionBase]:
     if len(knots) != len(row_index):
         raise ValueError("Number of bounding boxes and index values must match")
 
@@ -0,0 +1,515 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+
+from chart_extraction import OCR_MODES, ChartPipeline
+from gap_filling import GAP_FILL_MODES
+from instrumentation import ExtractionMetrics
+from layout_cache import LayoutCache
+from ocr_cache import OcrCache
+from writers import WRITERS
+
+logger = logging.getLogger(__name__)
+
+FORMATS = {
+    "json": "application/json",
+    "csv": "text/csv; charset=utf-8",
+    "jsonl": "application/x-ndjson",
+}
+MAX_HEADER_BYTES = 64 * 2**10
+
+# Pipeline settings of a pool worker, set once by `_init_worker` so that the OCR
+# backend and cache stay warm across requests
+_worker_kwargs = {}
+
+
+def _init_worker(pipeline_kwargs):
+    global _worker_kwargs
+    _worker_kwargs = pipeline_kwargs
+    # The pool provides the parallelism, one OpenCV thread per process is enough
+    cv2.setNumThreads(1)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_job(data, options):
+    # Runs inside a pool worker: extract one uploaded image and serialize it, so
+    # the event loop only copies bytes around
+    options = dict(options)
+    output_format = options.pop("format", "json")
+    metrics = ExtractionMetrics()
+    try:
+        pipeline = ChartPipeline(**{**_worker_kwargs, **options}, metrics=metrics)
+        time_series = pipeline.run(data).time_series
+    except Exception as e:
+        return "error", f"{type(e).__name__}: {e}", metrics
+    return "ok", serialize_time_series(time_series, output_format), metrics
+
+
+def serialize_time_series(time_series, output_format: str = "json") -> bytes:
+    """
+    Encode an extraction result as a response body.
+
+    :param time_series: `TimeSeries`
+    :param output_format: "json" - `{"dates": [...], "values": [[...], ...]}`
+        with one row of values per date, "csv" or "jsonl" - see `writers`
+    :return: UTF-8 encoded body
+    """
+    if output_format == "json":
+        points = time_series.to_points()
+        body = {
+            "dates": [
+                x.isoformat() if hasattr(x, "isoformat") else x for x, _ in points
+            ],
+            "values": [values for _, values in points],
+        }
+        return json.dumps(body, separators=(",", ":")).encode()
+    buffer = io.StringIO()
+    with WRITERS["." + output_format](buffer) as writer:
+        writer.write_all(time_series)
+    return buffer.getvalue().encode()
+
+
+def parse_options(query: str) -> dict:
+    """
+    Per-request pipeline options from a query string, e.g.
+    `n_series=2&gap_fill=linear&max_gap=none&format=csv`.
+
+    :raise ValueError: on unknown or malformed parameters
+    """
+    params = {name: values[-1] for name, values in parse_qs(query).items()}
+    options = {"format": params.pop("format", "json")}
+    if options["format"] not in FORMATS:
+        raise ValueError(f"format must be one of {list(FORMATS)}")
+    if "n_series" in params:
+        n_series = _parse_int(params.pop("n_series"), "n_series")
+        options["n_series"] = n_series or None  # 0 - detect from the colours
+    if "gap_fill" in params:
+        options["gap_fill"] = params.pop("gap_fill")
+        if options["gap_fill"] not in GAP_FILL_MODES:
+            raise ValueError(f"gap_fill must be one of {list(GAP_FILL_MODES)}")
+    if "max_gap" in params:
+        max_gap = params.pop("max_gap")
+        options["max_gap"] = (
+            None if max_gap == "none" else _parse_int(max_gap, "max_gap")
+        )
+    if params:
+        raise ValueError(f"Unknown parameters: {sorted(params)}")
+    return options
+
+
+def _parse_int(text, name):
+    try:
+        value = int(text)
+    except ValueError:
+        value = -1
+    if value < 0:
+        raise ValueError(f"{name} must be a non-negative integer, got {text!r}")
+    return value
+
+
+class _Response:
+    __slots__ = ("status", "body", "content_type", "headers")
+
+    def __init__(self, status, body=b"", content_type="application/json", headers=()):
+        self.status = status
+        self.body = body
+        self.content_type = content_type
+        self.headers = headers
+
+
+def _json_response(status, payload, headers=()):
+    body = json.dumps(payload, separators=(",", ":")).encode()
+    return _Response(status, body, headers=headers)
+
+
+def _error(status, message, headers=()):
+    return _json_response(status, {"error": message}, headers)
+
+
+async def _read_head(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    method, target, _ = lines[0].split(" ")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return method, target, headers
+
+
+class ExtractionServer:
+    """
+    Local HTTP front end for chart extraction.
+
+    Requests are accepted by an asyncio server and put on a bounded job queue;
+    `concurrency` dispatchers move jobs from the queue to a pool of `workers`
+    processes that are started up front and keep their OCR backend and cache
+    between jobs. When the queue is full new uploads are rejected right away
+    with 429, so overload shows up as fast failures instead of a growing
+    backlog.
+
+    Endpoints:
+
+    - `POST /extract`: body - encoded image (PNG, JPEG, ...), query - see
+      `parse_options`; 200 with the series, 422 when extraction fails, 429 when
+      the queue is full, 504 after `timeout`
+    - `GET /healthz`: 200 with queue and worker state, 503 while stopped or
+      while a worker is dead and the pool is being restarted
+    - `GET /metrics`: Prometheus text, the merged `ExtractionMetrics` of all
+      jobs plus response, queue and worker metrics
+
+    Each connection serves a single request.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        workers: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        queue_size: int = 16,
+        timeout: float = 60.0,
+        read_timeout: float = 10.0,
+        max_body_bytes: int = 32 * 2**20,
+        **pipeline_kwargs,
+    ):
+        """
+        :param host: interface to listen on
+        :param port: port to listen on (0 - any free port, see `address`)
+        :param workers: number of worker processes (None - one per CPU)
+        :param concurrency: maximum number of jobs being extracted at once
+            (default - `workers`)
+        :param queue_size: maximum number of jobs waiting for a worker
+        :param timeout: seconds a request may wait for its result, queueing
+            included; a job that is already running is not interrupted, its
+            result is dropped
+        :param read_timeout: seconds allowed for receiving the request
+        :param max_body_bytes: largest accepted upload (413 above)
+        :param pipeline_kwargs: passed to `ChartPipeline` in the workers (e.g.
+            `ocr_backend`, `ocr_cache`, `ocr_mode`)
+        """
+        ChartPipeline(**pipeline_kwargs)  # fail early on invalid settings
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.concurrency = concurrency or self.workers
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.read_timeout = read_timeout
+        self.max_body_bytes = max_body_bytes
+        self.pipeline_kwargs = pipeline_kwargs
+        self.metrics = ExtractionMetrics()
+        self.metrics.runs = 0
+        self.responses = {}  # status code -> count
+        self.in_flight = 0
+        self._pool = None
+        self._queue = None
+        self._server = None
+        self._dispatchers = []
+        self._warm_up = None
+
+    @property
+    def address(self):
+        """(host, port) the server listens on."""
+        return self._server.sockets[0].getsockname()[:2]
+
+    @property
+    def running(self) -> bool:
+        return self._server is not None and self._server.is_serving()
+
+    async def start(self) -> "ExtractionServer":
+        """Start the worker processes, then start accepting connections."""
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(self.queue_size)
+        self._pool = self._new_pool()
+        await asyncio.gather(
+            *(loop.run_in_executor(self._pool, _ping) for _ in range(self.workers))
+        )
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch()) for _ in range(self.concurrency)
+        ]
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=MAX_HEADER_BYTES
+        )
+        logger.info("Listening on http://%s:%s", *self.address)
+        return self
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting connections, fail queued jobs and stop the workers."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for task in self._dispatchers:
+            task.cancel()
+        await asyncio.gather(*self._dispatchers, return_exceptions=True)
+        self._dispatchers = []
+        while self._queue is not None and not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Server is shutting down"))
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: pool.shutdown(cancel_futures=True)
+            )
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            self.workers, initializer=_init_worker, initargs=(self.pipeline_kwargs,)
+        )
+
+    def _restart_pool(self, pool, reason):
+        if pool is not self._pool:  # already replaced
+            return
+        logger.error("Worker pool broke, restarting it: %s", reason)
+        pool.shutdown(wait=False)
+        self._pool = self._new_pool()
+        # Start the new workers up front, like `start` does
+        loop = asyncio.get_running_loop()
+        self._warm_up = asyncio.gather(
+            *(loop.run_in_executor(self._pool, _ping) for _ in range(self.workers)),
+            return_exceptions=True,
+        )
+
+    def _pool_state(self):
+        pool = self._pool
+        if pool is None:
+            return "stopped"
+        # The pool only notices dead workers when it hands out the next job
+        if pool._broken:
+            self._restart_pool(pool, pool._broken)
+            return "restarting"
+        processes = list((pool._processes or {}).values())
+        if len(processes) < self.workers or not all(p.is_alive() for p in processes):
+            return "restarting"
+        return "ok"
+
+    async def _dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            data, options, future = await self._queue.get()
+            if future.done():  # the request timed out while queued
+                continue
+            pool = self._pool
+            self.in_flight += 1
+            try:
+                result = await loop.run_in_executor(pool, _run_job, data, options)
+            except BrokenProcessPool as e:
+                # A worker died (e.g. killed for memory): replace the whole pool
+                self._restart_pool(pool, e)
+                result = ("crash", f"{type(e).__name__}: {e}", None)
+            except Exception as e:
+                result = ("crash", f"{type(e).__name__}: {e}", None)
+            finally:
+                self.in_flight -= 1
+            if result[2] is not None:
+                self.metrics.merge(result[2])
+            if not future.done():
+                future.set_result(result)
+
+    async def _handle(self, reader, writer):
+        try:
+            response = await self._respond(reader, writer)
+        except Exception:
+            logger.exception("Unhandled error while serving a request")
+            response = _error(500, "Internal server error")
+        self.responses[response.status] = self.responses.get(response.status, 0) + 1
+        head = [
+            f"HTTP/1.1 {response.status} {HTTPStatus(response.status).phrase}",
+            f"Content-Type: {response.content_type}",
+            f"Content-Length: {len(response.body)}",
+            "Connection: close",
+            *(f"{name}: {value}" for name, value in response.headers),
+        ]
+        try:
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+            writer.write(response.body)
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except ConnectionError:
+            pass  # the client went away
+
+    async def _respond(self, reader, writer):
+        try:
+            method, target, headers = await asyncio.wait_for(
+                _read_head(reader), self.read_timeout
+            )
+        except asyncio.TimeoutError:
+            return _error(408, "Timed out reading the request")
+        except asyncio.LimitOverrunError:
+            return _error(431, "Request headers too large")
+        except (asyncio.IncompleteReadError, ValueError):
+            return _error(400, "Malformed request")
+
+        url = urlsplit(target)
+        routes = {
+            "/extract": ("POST", self._extract),
+            "/healthz": ("GET", self._healthz),
+            "/metrics": ("GET", self._metrics),
+        }
+        if url.path not in routes:
+            return _error(404, f"Unknown path: {url.path}")
+        allowed, handler = routes[url.path]
+        if method != allowed:
+            return _error(405, f"Use {allowed}", headers=[("Allow", allowed)])
+        return await handler(reader, writer, headers, url.query)
+
+    async def _healthz(self, reader, writer, headers, query):
+        status = self._pool_state() if self.running else "stopped"
+        state = {
+            "status": status,
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queued": self._queue.qsize(),
+            "queue_size": self.queue_size,
+        }
+        return _json_response(200 if status == "ok" else 503, state)
+
+    async def _metrics(self, reader, writer, headers, query):
+        body = self.to_prometheus().encode()
+        return _Response(200, body, "text/plain; version=0.0.4")
+
+    def to_prometheus(self, prefix: str = "chart_extraction") -> str:
+        lines = [
+            self.metrics.to_prometheus(prefix).rstrip("\n"),
+            f"# TYPE {prefix}_http_responses_total counter",
+        ]
+        for status, count in sorted(self.responses.items()):
+            lines.append(f'{prefix}_http_responses_total{{code="{status}"}} {count}')
+        for name, value in (
+            ("queued_jobs", self._queue.qsize()),
+            ("in_flight_jobs", self.in_flight),
+            ("workers", self.workers),
+        ):
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    async def _extract(self, reader, writer, headers, query):
+        try:
+            options = parse_options(query)
+        except ValueError as e:
+            return _error(400, str(e))
+        if "content-length" not in headers:
+            return _error(411, "Content-Length is required")
+        try:
+            length = _parse_int(headers["content-length"], "Content-Length")
+        except ValueError as e:
+            return _error(400, str(e))
+        if length == 0:
+            return _error(400, "Empty body, expected an encoded image")
+        if length > self.max_body_bytes:
+            return _error(413, f"Images are limited to {self.max_body_bytes} bytes")
+        if self._queue.full():  # reject before receiving the upload
+            return self._busy()
+
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        try:
+            data = await asyncio.wait_for(reader.readexactly(length), self.read_timeout)
+        except asyncio.TimeoutError:
+            return _error(408, "Timed out reading the request body")
+        except asyncio.IncompleteReadError:
+            return _error(400, "Request body shorter than Content-Length")
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((data, options, future))
+        except asyncio.QueueFull:
+            return self._busy()
+        start = time.perf_counter()
+        try:
+            status, payload, _ = await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            return _error(504, f"Extraction did not finish within {self.timeout}s")
+        except RuntimeError as e:
+            return _error(503, str(e))
+        if status == "ok":
+            duration = f"{time.perf_counter() - start:.3f}"
+            return _Response(
+                200,
+                payload,
+                FORMATS[options["format"]],
+                headers=[("X-Extraction-Seconds", duration)],
+            )
+        if status == "error":
+            return _error(422, payload)
+        return _error(500, payload)
+
+    def _busy(self):
+        return _error(429, "Extraction queue is full", headers=[("Retry-After", "1")])
+
+
+async def _serve(server):
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Serve chart extraction over HTTP: POST an image to /extract."
+    )
+    arg_parser.add_argument("--host", default="127.0.0.1")
+    arg_parser.add_argument("--port", type=int, default=8000)
+    arg_parser.add_argument(
+        "--workers", type=int, help="worker processes (default - one per CPU)"
+    )
+    arg_parser.add_argument(
+        "--concurrency", type=int, help="jobs extracted at once (default - workers)"
+    )
+    arg_parser.add_argument(
+        "--queue-size", type=int, default=16, help="jobs waiting before 429"
+    )
+    arg_parser.add_argument(
+        "--timeout", type=float, default=60.0, help="seconds per request"
+    )
+    arg_parser.add_argument("--ocr-mode", choices=OCR_MODES, default="full")
+    arg_parser.add_argument("--ocr-cache-dir", help="persist OCR results here")
+    arg_parser.add_argument(
+        "--layout-cache",
+        action="store_true",
+        help="reuse the chart area and grid of already seen dashboard templates",
+    )
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    extraction_server = ExtractionServer(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        concurrency=args.concurrency,
+        queue_size=args.queue_size,
+        timeout=args.timeout,
+        ocr_mode=args.ocr_mode,
+        ocr_cache=OcrCache(cache_dir=args.ocr_cache_dir),
+        layout_cache=LayoutCache() if args.layout_cache else None,
+    )
+    try:
+        asyncio.run(_serve(extraction_server))
+    except KeyboardInterrupt:
+        pass
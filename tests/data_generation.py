@@ -1,5 +1,7 @@
 import os
+import tempfile
 
+import cv2
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
@@ -8,6 +10,7 @@ from matplotlib.ticker import ScalarFormatter
 
 TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 SEP = ";"
+FONT = cv2.FONT_HERSHEY_SIMPLEX
 
 
 def simulate_time_series(
@@ -19,12 +22,43 @@ def simulate_time_series(
     return pd.DataFrame({"date": dates, "value": prices})
 
 
+def axis_label_tokens(fig):
+    """
+    Tick labels of the current axes as OCR-like tokens in image pixel
+    coordinates: (words, bboxes) with [left, top, right, bottom] per word.
+    Only labels of ticks within the axis limits are returned, in reading order
+    (top to bottom, left to right) like tesseract emits them.
+    """
+    fig.canvas.draw()
+    renderer = fig.canvas.get_renderer()
+    ax = fig.gca()
+    height = fig.bbox.height
+    axes_box = ax.get_window_extent(renderer)
+    words, bboxes = [], []
+    for is_x, labels in ((True, ax.get_xticklabels()), (False, ax.get_yticklabels())):
+        lo, hi = (axes_box.x0, axes_box.x1) if is_x else (axes_box.y0, axes_box.y1)
+        for label in labels:
+            text = label.get_text().replace("\u2212", "-").strip()
+            box = label.get_window_extent(renderer)
+            center = (box.x0 + box.x1) / 2 if is_x else (box.y0 + box.y1) / 2
+            if not text or not lo - 1 <= center <= hi + 1:
+                continue
+            words.append(text)
+            bboxes.append(
+                [int(box.x0), int(height - box.y1), int(box.x1), int(height - box.y0)]
+            )
+    order = sorted(range(len(words)), key=lambda i: (bboxes[i][1], bboxes[i][0]))
+    return [words[i] for i in order], [bboxes[i] for i in order]
+
+
 def generate_linear_scaled(
     start_date,
     end_date,
     start_value=100,
     output_csv="simulated_close_prices.csv",
     output_image="simulated_close_prices.png",
+    figsize=(12, 6),
+    dpi=None,
 ):
     trend = np.random.choice([-1, 1])  # Randomly choose upward or downward trend
     ts = simulate_time_series(
@@ -32,7 +66,7 @@ def generate_linear_scaled(
     )
     ts.to_csv(output_csv, index=False, sep=SEP)
 
-    plt.figure(figsize=(12, 6))
+    fig = plt.figure(figsize=figsize, dpi=dpi)
     plt.plot(ts["date"], ts["value"], label="Value")
     plt.xlabel("Date")
     plt.ylabel("Value")
@@ -40,6 +74,80 @@ def generate_linear_scaled(
     plt.legend()
     # plt.grid()
     plt.savefig(output_image)
+    tokens = axis_label_tokens(fig)
+    plt.close(fig)
+    return tokens
+
+
+def render_template_chart(
+    values, y_labels=(40, 30, 20, 10), until=500, label_shift=0, grid_step=50
+):
+    """
+    Chart of a fixed template, like a dashboard or a live chart renders it:
+    frame, grid and labels stay put while the line changes.
+
+    :param values: line values, spread evenly over the plot width
+    :param y_labels: y-axis labels from top to bottom, one per grid row
+    :param until: the line is drawn up to this column
+    :param label_shift: moves the labels away from their grid lines
+    :param grid_step: distance between grid rows
+    :return: the image and the (words, bboxes) of its labels
+    """
+    img = np.full((300, 520), 255, dtype=np.uint8)
+    x1, y1, x2, y2 = 60, 20, 500, 250
+    cv2.rectangle(img, (x1, y1), (x2, y2), 0, 1)
+    words, bboxes = [], []
+    rows = range(y2 - len(y_labels) * grid_step, y2, grid_step)
+    for label, y in zip(y_labels, rows):
+        img[y, x1:x2] = 176
+        text = str(label)
+        (width, height), baseline = cv2.getTextSize(text, FONT, 0.5, 1)
+        left, bottom = 52 - width - label_shift, y + height // 2
+        cv2.putText(img, text, (left, bottom), FONT, 0.5, 0, 1)
+        words.append(text)
+        bboxes.append([left, bottom - height, left + width, bottom + baseline])
+    for i, x in enumerate(range(120, x2, 110)):
+        img[y1:y2, x] = 176
+        text = str(2020 + i)
+        (width, height), baseline = cv2.getTextSize(text, FONT, 0.5, 1)
+        left, bottom = x - width // 2 + label_shift, 275
+        cv2.putText(img, text, (left, bottom), FONT, 0.5, 0, 1)
+        words.append(text)
+        bboxes.append([left, bottom - height, left + width, bottom + baseline])
+    xs = np.arange(x1 + 1, min(until, x2))
+    ys = np.interp(xs, np.linspace(x1, x2, len(values)), values)
+    points = np.stack([xs, y2 - 5 * ys], axis=1).astype(np.int32)
+    cv2.polylines(img, [points], False, 0, 1)
+    return img, words, bboxes
+
+
+def linear_chart_fixture(seed, figsize=(8, 4), dpi=100):
+    """
+    Render a linear chart into a new temporary directory and register its axis
+    labels with a `FakeOcrBackend`, for tests that run the whole pipeline.
+
+    :param seed: seed of the simulated series
+    :return: (temporary directory, image path, backend, words); the caller
+        cleans the directory up
+    """
+    # Imported here so that this module still runs as a script from tests/
+    from image_io import load_image
+    from ocr_backends import FakeOcrBackend
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    image_path = os.path.join(tmp_dir.name, "chart.png")
+    np.random.seed(seed)
+    words, bboxes = generate_linear_scaled(
+        "2023-01-02",
+        "2023-12-29",
+        output_csv=os.path.join(tmp_dir.name, "chart.csv"),
+        output_image=image_path,
+        figsize=figsize,
+        dpi=dpi,
+    )
+    backend = FakeOcrBackend()
+    backend.add(load_image(image_path, color=False), words, bboxes)
+    return tmp_dir, image_path, backend, words
 
 
 def generate_log_scaled(
@@ -48,6 +156,8 @@ def generate_log_scaled(
     start_value=100,
     output_csv="simulated_close_prices_log.csv",
     output_image="simulated_close_prices_log.png",
+    figsize=(12, 6),
+    dpi=None,
 ):
     trend = np.random.choice([-1, 1])  # Randomly choose upward or downward trend
     ts = simulate_time_series(
@@ -61,7 +171,7 @@ def generate_log_scaled(
     scale = LogScale(1, base=log_base)
     ts.to_csv(output_csv, index=False, sep=SEP)
 
-    plt.figure(figsize=(12, 6))
+    fig = plt.figure(figsize=figsize, dpi=dpi)
     plt.plot(ts["date"], ts["value"], label="Log-Scaled Value")
     plt.xlabel("Date")
     plt.ylabel("Log-Scaled Value")
@@ -74,6 +184,44 @@ def generate_log_scaled(
     plt.legend()
     # plt.grid()
     plt.savefig(output_image)
+    tokens = axis_label_tokens(fig)
+    plt.close(fig)
+    return tokens
+
+
+def generate_multi_series(
+    start_date,
+    end_date,
+    n_series=2,
+    start_value=100,
+    output_csv="simulated_multi_series.csv",
+    output_image="simulated_multi_series.png",
+    figsize=(12, 6),
+    dpi=None,
+):
+    """Plot `n_series` random walks in the default colour cycle."""
+    ts = None
+    for k in range(n_series):
+        trend = np.random.choice([-1, 1])
+        series = simulate_time_series(
+            start_date, end_date, start_value * (k + 1), avg_daily_return=1e-3 * trend
+        )
+        if ts is None:
+            ts = series.rename(columns={"value": f"value_{k}"})
+        else:
+            ts[f"value_{k}"] = series["value"].values
+    ts.to_csv(output_csv, index=False, sep=SEP)
+
+    fig = plt.figure(figsize=figsize, dpi=dpi)
+    for k in range(n_series):
+        plt.plot(ts["date"], ts[f"value_{k}"], label=f"Value {k}")
+    plt.xlabel("Date")
+    plt.ylabel("Value")
+    plt.title("Simulated Values Over Time")
+    plt.savefig(output_image)
+    tokens = axis_label_tokens(fig)
+    plt.close(fig)
+    return tokens
 
 
 if __name__ == "__main__":
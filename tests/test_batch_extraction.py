@@ -0,0 +1,88 @@
+import os
+from unittest import TestCase
+
+import cv2
+import matplotlib
+
+matplotlib.use("Agg")
+
+from chart_extraction import (  # noqa: E402
+    extract_batch,
+    extract_time_series,
+    iter_extract_batch,
+)
+from image_io import load_image  # noqa: E402
+from ocr_backends import FakeOcrBackend  # noqa: E402
+from tests.data_generation import linear_chart_fixture  # noqa: E402
+
+MISSING = ["missing_0.png", "missing_1.png", "missing_2.png"]
+
+
+def _exit_worker(img):
+    # Unknown images kill the worker process, like a segfault in the OCR engine
+    os._exit(1)
+
+
+class TestBatchExtraction(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir, cls.image_path, cls.backend, _ = linear_chart_fixture(4)
+        cls.expected = extract_time_series(cls.image_path, ocr_backend=cls.backend)
+        # same chart, but unknown to the backend
+        cls.crash_path = os.path.join(cls.tmp_dir.name, "crash.png")
+        cv2.imwrite(cls.crash_path, 255 - load_image(cls.image_path, color=False))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_failures_are_isolated_inline(self):
+        results = extract_batch(MISSING, workers=1)
+        self.assertEqual([r.path for r in results], MISSING)
+        self.assertEqual([r.index for r in results], [0, 1, 2])
+        for r in results:
+            self.assertEqual(r.status, "error")
+            self.assertIsNone(r.time_series)
+            self.assertTrue(r.error.startswith("FileNotFoundError"))
+
+    def test_process_pool_keeps_input_order(self):
+        results = extract_batch(MISSING, workers=2)
+        self.assertEqual([r.path for r in results], MISSING)
+        self.assertTrue(all(r.status == "error" for r in results))
+
+    def test_unordered_streaming_yields_every_image(self):
+        results = list(iter_extract_batch(MISSING, workers=2, ordered=False))
+        self.assertEqual(sorted(r.index for r in results), [0, 1, 2])
+
+    def test_results_match_single_runs(self):
+        paths = [self.image_path, MISSING[0], self.image_path, self.image_path]
+        results = extract_batch(
+            paths, workers=2, max_pending=2, ocr_backend=self.backend
+        )
+        self.assertEqual([r.index for r in results], [0, 1, 2, 3])
+        self.assertEqual([r.path for r in results], paths)
+        self.assertEqual([r.status for r in results], ["ok", "error", "ok", "ok"])
+        for r in results[::2]:
+            self.assertEqual(r.time_series, self.expected)
+            self.assertIsNone(r.error)
+
+    def test_worker_crash_fails_only_its_image(self):
+        backend = FakeOcrBackend(self.backend.results, default=_exit_worker)
+        paths = [self.image_path, self.crash_path, self.image_path] * 2
+        for ordered in (True, False):
+            with self.subTest(ordered=ordered):
+                results = list(
+                    iter_extract_batch(
+                        paths, workers=2, ordered=ordered, ocr_backend=backend
+                    )
+                )
+                if not ordered:
+                    results.sort(key=lambda r: r.index)
+                self.assertEqual([r.index for r in results], list(range(6)))
+                for r, path in zip(results, paths):
+                    if path == self.crash_path:
+                        self.assertEqual(r.status, "error")
+                        self.assertTrue(r.error.startswith("BrokenProcessPool"))
+                    else:
+                        self.assertEqual(r.status, "ok")
+                        self.assertEqual(r.time_series, self.expected)
@@ -0,0 +1,45 @@
+from unittest import TestCase
+
+import cv2
+import numpy as np
+
+from color_segmentation import quantize_line_colors, split_series_masks
+
+
+def draw_lines(colors, size=(120, 200)):
+    """White image with one anti-aliased sine line per colour."""
+    img = np.full((*size, 3), 255, dtype=np.uint8)
+    xs = np.arange(size[1])
+    for k, color in enumerate(colors):
+        ys = size[0] / (len(colors) + 1) * (k + 1) + 10 * np.sin(xs / (15 + 5 * k))
+        points = np.stack([xs, ys], axis=1).round().astype(np.int32)
+        cv2.polylines(img, [points], False, color, 2, cv2.LINE_AA)
+    return img
+
+
+class TestColorSegmentation(TestCase):
+    def test_antialiased_pixels_join_their_line(self):
+        colors = [(180, 119, 31), (14, 127, 255)]
+        img = draw_lines(colors)
+        mask = (cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) < 250).astype(np.uint8)
+        masks, found = split_series_masks(img, mask, n_series=2)
+        self.assertEqual(len(masks), 2)
+        self.assertEqual((masks[0] & masks[1]).sum(), 0)
+        self.assertEqual((masks[0] | masks[1]).sum(), mask.sum())
+        # Each mask lies in the band of one line
+        rows = [np.nonzero(m)[0].mean() for m in masks]
+        self.assertEqual(sorted(np.round(np.array(rows) / 40)), [1, 2])
+        for color in found:
+            distance = np.abs(np.array(colors) - color).sum(axis=1).min()
+            self.assertLess(distance, 40)
+
+    def test_number_of_colors_is_detected(self):
+        img = draw_lines([(180, 119, 31), (14, 127, 255), (44, 160, 44)])
+        ys, xs = np.nonzero(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) < 250)
+        line_colors = quantize_line_colors(img[ys, xs])
+        self.assertEqual(len(line_colors.centers), 3)
+        self.assertTrue(np.all(np.diff(line_colors.sizes) <= 0))
+
+    def test_empty(self):
+        line_colors = quantize_line_colors(np.zeros((0, 3), dtype=np.uint8), 2)
+        self.assertEqual(len(line_colors.centers), 0)
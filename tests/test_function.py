@@ -0,0 +1,84 @@
+import pickle
+from datetime import datetime
+from multiprocessing import shared_memory
+from unittest import TestCase
+
+import numpy as np
+
+from function import Linear, LinearDatetime, Logarithmic, scale_from_array
+
+
+class TestScales(TestCase):
+    def setUp(self):
+        self.px = np.array([-20.0, 0.0, 35.5, 100.0, 250.0])
+
+    def test_linear_array_matches_scalar(self):
+        scale = Linear(knots=[0, 100, 200], values=[10.0, 5.0, 0.0])
+        values = scale.call_array(self.px)
+        self.assertEqual(values.dtype, np.float64)
+        self.assertEqual(values.tolist(), [scale(p) for p in self.px])
+        np.testing.assert_allclose(scale.invert_array(values), self.px)
+
+    def test_logarithmic_array_matches_scalar(self):
+        scale = Logarithmic(knots=[0, 100, 200], values=[1000.0, 100.0, 10.0])
+        values = scale.call_array(self.px)
+        self.assertEqual(values.tolist(), [scale(p) for p in self.px])
+        np.testing.assert_allclose(scale.invert_array(values), self.px)
+
+    def test_linear_datetime_array(self):
+        scale = LinearDatetime(
+            knots=[0, 100], datetimes=[datetime(2024, 1, 1), datetime(2024, 1, 11)]
+        )
+        dates = scale.call_array(self.px)
+        self.assertEqual(dates.dtype, np.dtype("datetime64[ns]"))
+        self.assertEqual(dates[3], np.datetime64("2024-01-11"))
+        self.assertEqual(scale(35.5), datetime(2024, 1, 4, 13, 12))
+        self.assertEqual(dates.astype("datetime64[us]").tolist()[2], scale(35.5))
+        np.testing.assert_allclose(scale.invert_array(dates), self.px)
+        self.assertEqual(scale.invert(datetime(2024, 1, 6)), 50.0)
+
+    def test_compact_transfer(self):
+        scales = [
+            Linear(knots=[0, 100, 200], values=[10.0, 5.0, 0.0]),
+            Logarithmic(knots=[0, 100, 200], values=[1000.0, 100.0, 10.0]),
+            LinearDatetime(
+                knots=[0, 100], datetimes=[datetime(2024, 1, 1), datetime(2024, 1, 11)]
+            ),
+        ]
+        for scale in scales:
+            # evaluators are only built when needed
+            self.assertNotIn("interpolator", vars(scale))
+            copy = pickle.loads(pickle.dumps(scale))
+            self.assertIs(type(copy), type(scale))
+            np.testing.assert_array_equal(copy.to_array(), scale.to_array())
+            np.testing.assert_array_equal(
+                copy.call_array(self.px), scale.call_array(self.px)
+            )
+
+            array = scale.to_array()
+            memory = shared_memory.SharedMemory(create=True, size=array.nbytes)
+            try:
+                memory.buf[: array.nbytes] = array.tobytes()
+                shared = scale_from_array(scale.KIND, memory.buf[: array.nbytes])
+                self.assertEqual(shared(35.5), scale(35.5))
+                del shared
+            finally:
+                memory.close()
+                memory.unlink()
+
+        with self.assertRaises(ValueError):
+            scale_from_array("spline", scales[0].to_array())
+
+    def test_points_are_read_only(self):
+        scales = {
+            "values": Linear(knots=[0, 100, 200], values=[10.0, 5.0, 0.0]),
+            "log_values": Logarithmic(knots=[0, 100], values=[1000.0, 10.0]),
+            "timestamps": LinearDatetime(
+                knots=[0, 100], datetimes=[datetime(2024, 1, 1), datetime(2024, 1, 11)]
+            ),
+        }
+        for name, scale in scales.items():
+            points = getattr(scale, name)
+            np.testing.assert_array_equal(points, scale.points)
+            with self.subTest(name=name), self.assertRaises(ValueError):
+                points[0] = 0.0
@@ -0,0 +1,80 @@
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+
+from chart_extraction import fill_gaps_in_time_series
+from gap_filling import fill_gaps
+from timeseries import TimeSeries
+
+NAN = np.nan
+
+
+class TestGapFilling(TestCase):
+    def setUp(self):
+        self.values = np.array(
+            [
+                [NAN, 1.0],
+                [0.0, NAN],
+                [NAN, NAN],
+                [NAN, NAN],
+                [6.0, 4.0],
+                [NAN, NAN],
+            ]
+        )
+
+    def test_midpoint(self):
+        values, valid = fill_gaps(self.values)
+        np.testing.assert_array_equal(values[:, 0], [NAN, 0.0, 3.0, 3.0, 6.0, NAN])
+        np.testing.assert_array_equal(values[:, 1], [1.0, 2.5, 2.5, 2.5, 4.0, NAN])
+        np.testing.assert_array_equal(valid, ~np.isnan(values))
+
+    def test_linear(self):
+        values, _ = fill_gaps(self.values, mode="linear")
+        np.testing.assert_array_equal(values[:, 0], [NAN, 0.0, 2.0, 4.0, 6.0, NAN])
+        np.testing.assert_array_equal(values[:, 1], [1.0, 1.75, 2.5, 3.25, 4.0, NAN])
+
+    def test_max_gap_and_none(self):
+        values, valid = fill_gaps(self.values, mode="linear", max_gap=2)
+        np.testing.assert_array_equal(values[:, 0], [NAN, 0.0, 2.0, 4.0, 6.0, NAN])
+        self.assertFalse(valid[1:4, 1].any())
+        values, valid = fill_gaps(self.values, mode="none")
+        np.testing.assert_array_equal(valid, ~np.isnan(self.values))
+
+    def test_does_not_mutate_input(self):
+        values = self.values.copy()
+        valid = ~np.isnan(values)
+        valid_before = valid.copy()
+        fill_gaps(values, valid, mode="linear")
+        np.testing.assert_array_equal(values, self.values)
+        np.testing.assert_array_equal(valid, valid_before)
+
+    def test_mask_overrides_values(self):
+        values, valid = fill_gaps([1.0, 5.0, 3.0], valid=[True, False, True])
+        np.testing.assert_array_equal(values, [1.0, 2.0, 3.0])
+        self.assertTrue(valid.all())
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            fill_gaps(self.values, mode="cubic")
+
+    def test_compatibility_wrapper(self):
+        time_series = [
+            (x, [None if np.isnan(v) else v])
+            for x, v in enumerate([1.0, NAN, 3.0, NAN, NAN, NAN, NAN, NAN, 9.0])
+        ]
+        result = fill_gaps_in_time_series(time_series, window_size=5)
+        self.assertIs(result, time_series)
+        self.assertEqual(result[1], (1, [2.0]))
+        self.assertEqual(result[4], (4, [None]))  # longer than window_size - 1
+
+    def test_compatibility_wrapper_accepts_time_series(self):
+        values = [1.0, NAN, 3.0, NAN, NAN, NAN, NAN, NAN, 9.0]
+        x = np.arange(len(values)).astype("datetime64[D]")
+        time_series = TimeSeries(x, np.array(values))
+        result = fill_gaps_in_time_series(time_series, window_size=5)
+        self.assertIsInstance(result, TimeSeries)
+        self.assertEqual(result, time_series.fill_gaps("midpoint", 4))
+        self.assertEqual(result[1], (datetime(1970, 1, 2), [2.0]))
+        self.assertEqual(result[4], (datetime(1970, 1, 5), [None]))
+        self.assertFalse(time_series.valid[1].any())  # the input is unchanged
@@ -0,0 +1,336 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import cv2
+import numpy as np
+
+from geometry import (
+    cluster_data,
+    crop_axis_label_strips,
+    cut_chart_area,
+    cut_chart_area_pyramid,
+    detect_grid,
+    find_clusters,
+    find_largest_empty_rectangle,
+    find_panels,
+    get_column_bboxes,
+    get_lines,
+    get_row_bboxes,
+    min_pool_pyramid,
+    remove_grid,
+)
+from image_io import ink_mask
+from ocr_utils import ocr_axis_strips
+
+
+def _reference_column_bboxes(bboxes, x_overlap_thresh=0.7):
+    # Quadratic grouping that `get_column_bboxes` must reproduce exactly
+    ids, columns = [], []
+    used = set()
+    for i, box in enumerate(bboxes):
+        if i in used:
+            continue
+        col, col_ids = [box], [i]
+        used.add(i)
+        for j, other in enumerate(bboxes):
+            if j in used:
+                continue
+            overlap = max(0, min(box[2], other[2]) - max(box[0], other[0]))
+            width = min(box[2] - box[0], other[2] - other[0])
+            if width > 0 and overlap / width > x_overlap_thresh:
+                col.append(other)
+                col_ids.append(j)
+                used.add(j)
+        if len(col) > 1:
+            columns.append(col)
+            ids.append(col_ids)
+    return ids, columns
+
+
+def _random_bboxes(rng, n):
+    left = rng.integers(0, 1000, n)
+    top = rng.integers(0, 1000, n)
+    width = rng.integers(0, 60, n)
+    height = rng.integers(0, 20, n)
+    return np.stack([left, top, left + width, top + height], axis=1).tolist()
+
+
+def _reference_largest_empty_rectangle(img_shape, bboxes):
+    # Pixel-level histogram search that the compressed version must reproduce
+    mask = np.zeros(img_shape[:2], dtype=np.uint8)
+    for left, top, right, bottom in bboxes:
+        cv2.rectangle(mask, (left, top), (right, bottom), 255, -1)
+    binary = mask == 0
+    height, width = binary.shape
+    heights = np.zeros(width + 1, dtype=int)
+    max_area, max_rect = 0, (0, 0, 0, 0)
+    for i in range(height):
+        heights[:width] = np.where(binary[i], heights[:width] + 1, 0)
+        stack, j = [], 0
+        while j <= width:
+            if not stack or heights[j] >= heights[stack[-1]]:
+                stack.append(j)
+                j += 1
+            else:
+                h = heights[stack.pop()]
+                w = j if not stack else j - stack[-1] - 1
+                if h * w > max_area:
+                    max_area = h * w
+                    max_rect = (stack[-1] + 1 if stack else 0, i - h + 1, w, h)
+    return max_rect
+
+
+def _draw_chart():
+    img = np.full((400, 600), 255, dtype=np.uint8)
+    cv2.rectangle(img, (80, 40), (560, 340), 0, 1)  # plot frame
+    xs = np.arange(81, 560)
+    ys = (190 + 100 * np.sin(xs / 40)).astype(int)
+    img[ys, xs] = 0  # the line
+    for i, y in enumerate(range(60, 340, 70)):
+        cv2.putText(img, str(100 - 10 * i), (30, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 0)
+    for i, x in enumerate(range(90, 560, 120)):
+        cv2.putText(img, f"202{i}", (x, 370), cv2.FONT_HERSHEY_SIMPLEX, 0.5, 0)
+    return img
+
+
+class TestAxisStrips(TestCase):
+    def setUp(self):
+        self.img = _draw_chart()
+
+    def test_strips_cover_labels_only(self):
+        strips = crop_axis_label_strips(self.img, pad=10)
+        self.assertEqual(len(strips), 2)
+        volume = sum(crop.size for _, _, crop in strips)
+        self.assertLess(volume, 0.25 * self.img.size)
+        for x_offset, y_offset, crop in strips:
+            ys, xs = np.nonzero(crop < 250)
+            xs, ys = xs + x_offset, ys + y_offset
+            inside = (xs > 80) & (xs < 560) & (ys > 40) & (ys < 340)
+            self.assertFalse(inside.any())
+
+    def test_ocr_axis_strips_maps_boxes_back(self):
+        strips = crop_axis_label_strips(self.img)
+        with patch("ocr_utils.ocr", return_value=(["w"], [[10, 10, 20, 15]])):
+            words, bboxes = ocr_axis_strips(self.img)
+        self.assertEqual(words, ["w"] * len(strips))
+        self.assertEqual(
+            sorted(bboxes),
+            sorted([[x + 10, y + 10, x + 20, y + 15] for x, y, _ in strips]),
+        )
+
+
+class TestBboxGrouping(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.bboxes = [_random_bboxes(rng, n) for n in (0, 1, 5, 50, 300)]
+
+    def test_columns_match_reference(self):
+        for bboxes in self.bboxes:
+            ids, columns = get_column_bboxes(bboxes)
+            exp_ids, exp_columns = _reference_column_bboxes(bboxes)
+            self.assertEqual(ids, exp_ids)
+            self.assertEqual([c.tolist() for c in columns], exp_columns)
+
+    def test_outlier_widths_match_reference(self):
+        rng = np.random.default_rng(1)
+        bboxes = _random_bboxes(rng, 300)
+        # a wide box overlapping nothing, one covering everything, a degenerate one
+        bboxes += [[2000, 0, 9000, 10], [-10, 0, 1100, 10], [500, 0, 500, 10]]
+        for order in (bboxes, bboxes[::-1]):
+            ids, columns = get_column_bboxes(order)
+            exp_ids, exp_columns = _reference_column_bboxes(order)
+            self.assertEqual(ids, exp_ids)
+            self.assertEqual([c.tolist() for c in columns], exp_columns)
+
+    def test_rows_match_reference(self):
+        for bboxes in self.bboxes:
+            transposed = [[b[1], b[0], b[3], b[2]] for b in bboxes]
+            ids, rows = get_row_bboxes(bboxes)
+            exp_ids, _ = _reference_column_bboxes(transposed)
+            self.assertEqual(ids, exp_ids)
+            self.assertEqual(
+                [r.tolist() for r in rows], [[bboxes[i] for i in g] for g in exp_ids]
+            )
+
+
+class TestLargestEmptyRectangle(TestCase):
+    def test_matches_pixel_search(self):
+        rng = np.random.default_rng(0)
+        for _ in range(100):
+            height, width = rng.integers(5, 40, 2)
+            bboxes = []
+            for _ in range(rng.integers(0, 8)):
+                left, top = rng.integers(-3, width + 2), rng.integers(-3, height + 2)
+                right, bottom = left + rng.integers(0, 15), top + rng.integers(0, 10)
+                bboxes.append((int(left), int(top), int(right), int(bottom)))
+            self.assertEqual(
+                find_largest_empty_rectangle((height, width), bboxes),
+                _reference_largest_empty_rectangle((height, width), bboxes),
+                f"Failed for {(height, width)}: {bboxes}",
+            )
+
+    def test_fully_covered(self):
+        self.assertEqual(
+            find_largest_empty_rectangle((10, 10), [(0, 0, 9, 9)]), (0, 0, 0, 0)
+        )
+
+
+class TestClusters(TestCase):
+    def test_find_clusters(self):
+        clusters = find_clusters([30, 1, 2, 12, 4, 31, 10], margin=2)
+        np.testing.assert_array_equal(clusters.values, [1, 2, 4, 10, 12, 30, 31])
+        np.testing.assert_array_equal(clusters.starts, [0, 3, 5])
+        np.testing.assert_array_equal(clusters.ends, [3, 5, 7])
+        np.testing.assert_array_equal(clusters.sizes, [3, 2, 2])
+        np.testing.assert_array_equal(clusters.centers, [7 / 3, 11.0, 30.5])
+        self.assertEqual(cluster_data([30, 1, 2], margin=2), [[1, 2], [30]])
+
+    def test_empty_input(self):
+        clusters = find_clusters([], margin=5)
+        self.assertEqual(clusters.starts.size, 0)
+        self.assertEqual(clusters.centers.size, 0)
+        self.assertEqual(cluster_data(np.array([], dtype=int), margin=5), [])
+
+
+def _draw_grid_chart(rng, height, width):
+    # Plot with a frame, light grid lines, a noisy line and label boxes
+    img = np.full((height, width), 255, dtype=np.uint8)
+    left, top = int(rng.integers(40, 80)), int(rng.integers(10, 40))
+    right, bottom = width - int(rng.integers(10, 40)), height - int(
+        rng.integers(40, 60)
+    )
+    cv2.rectangle(img, (left, top), (right, bottom), 0, 1)
+    for y in np.linspace(top, bottom, int(rng.integers(3, 8)))[1:-1].astype(int):
+        img[y, left:right] = 176
+    for x in np.linspace(left, right, int(rng.integers(3, 8)))[1:-1].astype(int):
+        img[top:bottom, x] = 176
+    xs = np.arange(left + 1, right)
+    ys = np.clip(
+        (top + bottom) / 2 + np.cumsum(rng.normal(0, 2, xs.size)), top + 1, bottom - 1
+    ).astype(int)
+    img[ys, xs] = int(rng.integers(0, 120))
+    rows_bboxes = [
+        [x, bottom + 10, x + 30, bottom + 22] for x in range(left, right, 90)
+    ]
+    columns_bboxes = [[5, y, left - 10, y + 10] for y in range(top, bottom, 50)]
+    return img, rows_bboxes, columns_bboxes
+
+
+class TestPyramid(TestCase):
+    def test_min_pool_pyramid(self):
+        rng = np.random.default_rng(0)
+        gray = rng.integers(0, 256, size=(21, 34), dtype=np.uint8)
+        for levels in (1, 2, 3):
+            factor = 2**levels
+            expected = [
+                [
+                    gray[i : i + factor, j : j + factor].min()
+                    for j in range(0, 34, factor)
+                ]
+                for i in range(0, 21, factor)
+            ]
+            np.testing.assert_array_equal(min_pool_pyramid(gray, levels), expected)
+
+    def test_matches_full_resolution(self):
+        rng = np.random.default_rng(1)
+        for _ in range(20):
+            height, width = (int(v) for v in rng.integers(200, 700, 2))
+            gray, rows_bboxes, columns_bboxes = _draw_grid_chart(rng, height, width)
+            thresh = ink_mask(gray)
+            chart_area, area_loc, grid_l, grid = cut_chart_area(
+                thresh, rows_bboxes, columns_bboxes
+            )
+            grid_rows = np.flatnonzero(chart_area.mean(axis=1) > 0.5)
+            grid_cols = np.flatnonzero(chart_area.mean(axis=0) > 0.5)
+            for levels in (1, 2, 3):
+                with self.subTest(shape=(height, width), levels=levels):
+                    pyramid = cut_chart_area_pyramid(
+                        gray, rows_bboxes, columns_bboxes, levels
+                    )
+                    self.assertEqual(pyramid[:2], (area_loc, grid_l))
+                    np.testing.assert_array_equal(pyramid[2].mask, grid.mask)
+                    np.testing.assert_array_equal(pyramid[3], chart_area)
+            # the grid is re-indexed to the chart area, as if detected on it
+            np.testing.assert_array_equal(grid.mask, detect_grid(chart_area).mask)
+            # solid grid lines are found as by the ink share of rows / columns
+            np.testing.assert_array_equal(grid.rows, grid_rows)
+            np.testing.assert_array_equal(grid.cols, grid_cols)
+
+
+class TestPanels(TestCase):
+    def test_grid_of_charts(self):
+        chart = _draw_chart()
+        height, width = chart.shape
+        canvas = np.full((2 * height, 3 * width), 255, dtype=np.uint8)
+        cells = [(0, 0), (0, 1), (0, 2), (1, 0), (1, 1)]  # the last one is empty
+        for row, column in cells:
+            canvas[
+                row * height : (row + 1) * height,
+                column * width : (column + 1) * width,
+            ] = chart
+        panels = find_panels(canvas)
+        self.assertEqual(len(panels), len(cells))
+        for (x1, y1, x2, y2), (row, column) in zip(panels, cells):
+            # every panel holds its plot frame and labels, nothing of the others
+            self.assertLessEqual(x1, column * width + 30)
+            self.assertGreaterEqual(x2, column * width + 561)
+            self.assertGreater(x1, column * width - (width - 560))
+            self.assertLessEqual(y1, row * height + 40)
+            self.assertGreaterEqual(y2, row * height + 375)
+            self.assertGreater(y1, row * height - (height - 375))
+
+    def test_skewed_lines(self):
+        chart = _draw_chart()
+        canvas = np.vstack([np.hstack([chart, chart])] * 2)
+        expected = find_panels(canvas)
+        self.assertEqual(len(expected), 4)
+        # the ends of every frame line 1 pixel apart
+        lines = get_lines(canvas)
+        skewed = lines.copy()
+        skewed[:, 3] += lines[:, 1] == lines[:, 3]
+        skewed[:, 2] += lines[:, 0] == lines[:, 2]
+        with patch("geometry.get_lines", return_value=skewed):
+            self.assertEqual(find_panels(canvas), expected)
+            self.assertEqual(find_panels(canvas, max_skew=0), [(0, 0, 1200, 800)])
+
+    def test_single_chart(self):
+        chart = _draw_chart()
+        self.assertEqual(find_panels(chart), [(0, 0, 600, 400)])
+        blank = np.full((100, 100), 255, dtype=np.uint8)
+        self.assertEqual(find_panels(blank), [(0, 0, 100, 100)])
+        self.assertEqual(len(get_lines(blank)), 0)
+        self.assertEqual(get_lines(chart).shape[1], 4)
+
+
+class TestGrid(TestCase):
+    def setUp(self):
+        self.ink = np.zeros((100, 200), dtype=np.uint8)
+        self.ink[30, :] = 1  # solid
+        self.ink[60, ::4] = self.ink[60, 1::4] = 1  # dashed
+        self.ink[::3, 100] = 1  # dotted
+        self.line = np.zeros_like(self.ink)
+        for y in range(10, 90):  # steep line, 2 pixels wide
+            self.line[y, 40 + y // 10 : 42 + y // 10] = 1
+        self.line[80, 90:111] = 1  # short flat piece over the dotted grid
+        self.ink |= self.line
+
+    def test_detect_grid(self):
+        grid = detect_grid(self.ink)
+        self.assertEqual(grid.rows.tolist(), [30, 60])
+        self.assertEqual(grid.cols.tolist(), [100])
+        # only ink pixels, and none of the line away from the grid
+        self.assertFalse((grid.mask & ~self.ink).any())
+        self.assertFalse(grid.mask[10:25, :90].any())
+        # without gap closing only the solid line is found
+        grid = detect_grid(self.ink, max_gap=0)
+        self.assertEqual(grid.rows.tolist(), [30])
+        self.assertEqual(grid.cols.tolist(), [])
+
+    def test_remove_grid_keeps_crossings(self):
+        lines = remove_grid(self.ink, detect_grid(self.ink).mask)
+        # grid pixels are gone, the line pixels crossing the grid are kept
+        self.assertEqual(np.flatnonzero(lines[30]).tolist(), [43])
+        self.assertEqual(np.flatnonzero(lines[60]).tolist(), [46])
+        self.assertTrue(lines[80, 90:111].all())
+        self.assertFalse((lines & ~self.line).any())
+        self.assertEqual(lines[:, 100].sum(), 1)
@@ -0,0 +1,100 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import cv2
+import matplotlib
+import numpy as np
+
+matplotlib.use("Agg")
+
+from chart_extraction import extract_time_series  # noqa: E402
+from image_io import ink_mask, load_image  # noqa: E402
+from tests.data_generation import linear_chart_fixture  # noqa: E402
+
+
+class TestLoadImage(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.image_path = os.path.join(cls.tmp_dir.name, "image.png")
+        rng = np.random.default_rng(0)
+        cls.bgr = rng.integers(0, 256, size=(20, 30, 3), dtype=np.uint8)
+        cv2.imwrite(cls.image_path, cls.bgr)
+        with open(cls.image_path, "rb") as f:
+            cls.encoded = f.read()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_path_bytes_and_memoryview_agree(self):
+        for color in (True, False):
+            expected = load_image(self.image_path, color=color)
+            for source in (
+                self.encoded,
+                bytearray(self.encoded),
+                memoryview(self.encoded),
+            ):
+                np.testing.assert_array_equal(load_image(source, color=color), expected)
+        np.testing.assert_array_equal(load_image(self.image_path), self.bgr)
+        self.assertEqual(load_image(self.image_path, color=False).shape, (20, 30))
+
+    def test_array_in_requested_format_is_not_copied(self):
+        self.assertIs(load_image(self.bgr), self.bgr)
+        gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        self.assertIs(load_image(gray, color=False), gray)
+
+    def test_array_conversions(self):
+        gray = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2GRAY)
+        bgra = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2BGRA)
+        np.testing.assert_array_equal(load_image(self.bgr, color=False), gray)
+        np.testing.assert_array_equal(load_image(bgra, color=False), gray)
+        np.testing.assert_array_equal(load_image(bgra), self.bgr)
+        self.assertEqual(load_image(gray).shape, (20, 30, 3))
+        np.testing.assert_array_equal(load_image(gray[:, :, None], color=False), gray)
+
+    def test_errors(self):
+        with self.assertRaises(FileNotFoundError):
+            load_image(os.path.join(self.tmp_dir.name, "missing.png"))
+        with self.assertRaises(ValueError):
+            load_image(b"not an image")
+        with self.assertRaises(ValueError):
+            load_image(b"")
+        with self.assertRaises(ValueError):
+            load_image(self.bgr.astype(np.float32))
+        with self.assertRaises(ValueError):
+            load_image(np.zeros((4, 4, 2), dtype=np.uint8))
+        with self.assertRaises(TypeError):
+            load_image(42)
+
+    def test_ink_mask(self):
+        gray = np.arange(256, dtype=np.uint8).reshape(16, 16)
+        mask = ink_mask(gray)
+        self.assertEqual(mask.dtype, np.uint8)
+        np.testing.assert_array_equal(mask, (gray < 250).astype(np.uint8))
+        np.testing.assert_array_equal(ink_mask(gray, 10), (gray < 10).astype(np.uint8))
+
+
+class TestExtractionInputs(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir, cls.image_path, cls.backend, _ = linear_chart_fixture(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_bytes_and_array_match_path(self):
+        expected = extract_time_series(self.image_path, ocr_backend=self.backend)
+        with open(self.image_path, "rb") as f:
+            encoded = f.read()
+        sources = {
+            "bytes": encoded,
+            "memoryview": memoryview(encoded),
+            "gray": load_image(self.image_path, color=False),
+        }
+        for name, source in sources.items():
+            with self.subTest(source=name):
+                result = extract_time_series(source, ocr_backend=self.backend)
+                self.assertEqual(result, expected)
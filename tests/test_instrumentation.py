@@ -0,0 +1,93 @@
+import json
+from unittest import TestCase
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+from chart_extraction import (  # noqa: E402
+    ChartPipeline,
+    extract_batch,
+    extract_time_series,
+)
+from instrumentation import COUNTERS, ExtractionMetrics  # noqa: E402
+from tests.data_generation import linear_chart_fixture  # noqa: E402
+
+
+class TestExtractionMetrics(TestCase):
+    def test_stage_accumulates_time(self):
+        metrics = ExtractionMetrics()
+        with metrics.stage("ocr"):
+            sum(range(10000))
+        with metrics.stage("ocr"):
+            pass
+        wall, cpu = metrics.stages["ocr"]
+        self.assertGreater(wall, 0)
+        self.assertGreaterEqual(cpu, 0)
+
+    def test_merge(self):
+        total = ExtractionMetrics()
+        other = ExtractionMetrics()
+        total.count("ocr_tokens", 3)
+        other.count("ocr_tokens", 4)
+        other.stages["tracing"] = [1.0, 0.5]
+        total.merge(other)
+        self.assertEqual(total.runs, 2)
+        self.assertEqual(total.counters["ocr_tokens"], 7)
+        self.assertEqual(total.stages["tracing"], [1.0, 0.5])
+        # a part of an extraction already counted
+        total.merge(other, count_runs=False)
+        self.assertEqual(total.runs, 2)
+        self.assertEqual(total.counters["ocr_tokens"], 11)
+
+    def test_exports(self):
+        metrics = ExtractionMetrics(labels={"image": 'a "b"'})
+        metrics.stages["ocr"] = [0.25, 0.125]
+        metrics.count("gaps_filled", 2)
+
+        data = json.loads(metrics.to_json_line())
+        self.assertEqual(data["counters"]["gaps_filled"], 2)
+        self.assertEqual(data["stages"]["ocr"], {"wall_s": 0.25, "cpu_s": 0.125})
+
+        text = metrics.to_prometheus()
+        self.assertIn(
+            'chart_extraction_stage_wall_seconds_total{image="a \\"b\\"",stage="ocr"}'
+            " 0.250000",
+            text,
+        )
+        self.assertIn('chart_extraction_gaps_filled_total{image="a \\"b\\""} 2', text)
+
+
+class TestPipelineMetrics(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir, cls.image_path, cls.backend, words = linear_chart_fixture(0)
+        cls.n_tokens = len(words)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_metrics_are_opt_in(self):
+        metrics = ExtractionMetrics()
+        with_metrics = extract_time_series(
+            self.image_path, ocr_backend=self.backend, metrics=metrics
+        )
+        without = extract_time_series(self.image_path, ocr_backend=self.backend)
+        self.assertEqual(with_metrics, without)
+
+        self.assertEqual(set(metrics.stages), set(ChartPipeline.STAGES))
+        self.assertEqual(set(metrics.counters), set(COUNTERS))
+        self.assertEqual(metrics.counters["ocr_tokens"], self.n_tokens)
+        traced = sum(value[0] is not None for _, value in without)
+        self.assertEqual(
+            metrics.counters["columns_traced"] + metrics.counters["gaps_filled"],
+            traced,
+        )
+
+    def test_batch_collects_metrics(self):
+        results = extract_batch(
+            [self.image_path], workers=1, collect_metrics=True, ocr_backend=self.backend
+        )
+        self.assertEqual(results[0].status, "ok")
+        self.assertGreater(results[0].metrics.counters["columns_traced"], 0)
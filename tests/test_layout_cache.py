@@ -0,0 +1,156 @@
+import pickle
+from unittest import TestCase
+
+import numpy as np
+
+from chart_extraction import ChartPipeline
+from instrumentation import ExtractionMetrics
+from layout_cache import LayoutCache, layout_fingerprint
+from ocr_backends import FakeOcrBackend
+from ocr_utils import label_crop, ocr_label_crops
+from tests.data_generation import render_template_chart
+
+
+def _register(backend, img, words, bboxes, reads=None):
+    # Full image OCR and OCR of every label crop: the word inside the padding
+    backend.add(img, words, bboxes)
+    for word, bbox in zip(words, bboxes):
+        crop = label_crop(img, bbox)
+        h, w = crop.shape
+        text, word_bbox = (reads or {}).get(word, (word, None))
+        backend.add(crop, [text], [word_bbox or [14, 14, w - 14, h - 14]])
+
+
+class TestLayoutFingerprint(TestCase):
+    def test_same_template_same_fingerprint(self):
+        first, _, _ = render_template_chart([5, 20, 12, 30, 25])
+        second, _, _ = render_template_chart([30, 2, 18, 7, 40])
+        self.assertEqual(layout_fingerprint(first), layout_fingerprint(second))
+        other_grid, _, _ = render_template_chart([5, 20, 12, 30, 25], grid_step=45)
+        self.assertNotEqual(layout_fingerprint(first), layout_fingerprint(other_grid))
+        self.assertNotEqual(
+            layout_fingerprint(first), layout_fingerprint(first[:, :-10].copy())
+        )
+
+    def test_ocr_label_crops(self):
+        img, words, bboxes = render_template_chart([5, 20, 12, 30, 25])
+        backend = FakeOcrBackend()
+        _register(backend, img, words, bboxes)
+        self.assertEqual(ocr_label_crops(img, bboxes, backend=backend), words)
+        self.assertEqual(ocr_label_crops(img, [], backend=backend), [])
+        blank = np.full_like(img, 255)
+        self.assertEqual(
+            ocr_label_crops(blank, bboxes[:2], backend=backend), [None] * 2
+        )
+        # a word reaching the edge of its crop may be cut off
+        backend = FakeOcrBackend()
+        _register(backend, img, words, bboxes, reads={"30": ("30", [10, 14, 30, 30])})
+        texts = ocr_label_crops(img, bboxes, backend=backend)
+        self.assertEqual(texts, [None if word == "30" else word for word in words])
+
+
+class TestLayoutCache(TestCase):
+    def setUp(self):
+        self.backend = FakeOcrBackend()
+        self.charts = {}
+        for name, values, shift in (
+            ("first", [5, 20, 12, 30, 25], 0),
+            ("second", [30, 2, 18, 7, 40], 0),
+            ("moved_labels", [10, 10, 35, 20, 5], 6),
+        ):
+            img, words, bboxes = render_template_chart(values, label_shift=shift)
+            _register(self.backend, img, words, bboxes)
+            self.charts[name] = img
+        self.expected = {
+            name: ChartPipeline(ocr_backend=self.backend).run(img).time_series
+            for name, img in self.charts.items()
+        }
+
+    def test_hit_reuses_layout(self):
+        cache = LayoutCache()
+        pipeline = ChartPipeline(ocr_backend=self.backend, layout_cache=cache)
+        first = pipeline.run(self.charts["first"])
+        self.assertIsNone(first.layout)
+        self.assertEqual(first.time_series, self.expected["first"])
+
+        calls = self.backend.calls
+        metrics = ExtractionMetrics()
+        second = ChartPipeline(
+            ocr_backend=self.backend, layout_cache=cache, metrics=metrics
+        ).run(self.charts["second"])
+        self.assertIsNotNone(second.layout)
+        self.assertEqual(second.location, first.location)
+        # only the label crops were OCR-ed
+        self.assertEqual(self.backend.calls - calls, len(first.bboxes))
+        self.assertEqual(second.time_series, self.expected["second"])
+        self.assertEqual(metrics.counters["layout_hits"], 1)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_stale_layout_falls_back(self):
+        cache = LayoutCache()
+        pipeline = ChartPipeline(ocr_backend=self.backend, layout_cache=cache)
+        pipeline.run(self.charts["first"])
+        artifacts = pipeline.run(self.charts["moved_labels"])
+        self.assertIsNone(artifacts.layout)
+        self.assertEqual(artifacts.time_series, self.expected["moved_labels"])
+        self.assertEqual(cache.stats()["stale"], 1)
+        # the layout of the moved labels replaced the stale one
+        artifacts = pipeline.run(self.charts["moved_labels"])
+        self.assertIsNotNone(artifacts.layout)
+
+    def test_misread_labels_fall_back(self):
+        cache = LayoutCache()
+        pipeline = ChartPipeline(ocr_backend=self.backend, layout_cache=cache)
+        pipeline.run(self.charts["first"])
+        for reads in ({"30": ("3O", [14, 14, 30, 30])}, {"2021": ("2025", None)}):
+            img, words, bboxes = render_template_chart([10, 10, 35, 20, 5])
+            img[-1, -1] = 0  # a new image of the template
+            _register(self.backend, img, words, bboxes, reads)
+            with self.subTest(reads=reads):
+                artifacts = pipeline.run(img)
+                self.assertIsNone(artifacts.layout)
+                expected = ChartPipeline(ocr_backend=self.backend).run(img)
+                self.assertEqual(artifacts.time_series, expected.time_series)
+        self.assertEqual(cache.stats()["stale"], 2)
+
+    def test_only_valid_labels_are_learnt(self):
+        cache = LayoutCache()
+        pipeline = ChartPipeline(ocr_backend=self.backend, layout_cache=cache)
+        for y_labels in ((40, 30, 30, 10), (40, 30, "x", 10)):
+            img, words, bboxes = render_template_chart([5, 20], y_labels)
+            _register(self.backend, img, words, bboxes)
+            pipeline.run(img)
+        self.assertEqual(cache.stats()["items"], 0)
+
+    def test_negative_labels_are_learnt(self):
+        cache = LayoutCache()
+        img, words, bboxes = render_template_chart([5, 20], (1, 0, -1, -2))
+        _register(self.backend, img, words, bboxes)
+        ChartPipeline(ocr_backend=self.backend, layout_cache=cache).run(img)
+        self.assertEqual(cache.stats()["items"], 1)
+
+    def test_pyramid_and_lru(self):
+        cache = LayoutCache(max_items=1)
+        pipeline = ChartPipeline(
+            ocr_backend=self.backend, layout_cache=cache, pyramid_levels=2
+        )
+        pipeline.run(self.charts["first"])
+        self.assertEqual(
+            pipeline.run(self.charts["second"]).time_series, self.expected["second"]
+        )
+        other, words, bboxes = render_template_chart([1, 2, 3], grid_step=45)
+        _register(self.backend, other, words, bboxes)
+        pipeline.run(other)
+        self.assertEqual(cache.stats()["items"], 1)
+        self.assertIsNone(pipeline.run(self.charts["second"]).layout)
+
+    def test_pickle_drops_layouts(self):
+        cache = LayoutCache(levels=3)
+        ChartPipeline(ocr_backend=self.backend, layout_cache=cache).run(
+            self.charts["first"]
+        )
+        copy = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(copy.levels, 3)
+        self.assertEqual(copy.stats()["items"], 0)
+        self.assertEqual(cache.stats()["items"], 1)
@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+import cv2
+
+from chart_extraction import ChartPipeline
+from instrumentation import ExtractionMetrics
+from live_session import LiveChartSession
+from ocr_backends import FakeOcrBackend
+from tests.data_generation import render_template_chart
+
+
+class TestLiveChartSession(TestCase):
+    def setUp(self):
+        self.backend = FakeOcrBackend()
+        values = [5, 20, 12, 30, 25, 35, 18]
+        self.frames = []
+        for until in (200, 260, 261, 400, 500):
+            self.frames.append(self._add(values, until))
+        # a change in the middle of the plot, e.g. a revised point
+        self.frames.append(self._add([5, 20, 12, 38, 25, 35, 18], 500))
+        # a new y-axis scale
+        self.frames.append(self._add(values, 500, labels=(60, 40, 20, 0)))
+        self.frames.append(self._add(values, 500, labels=(60, 40, 20, 0)))
+
+    def _add(self, values, until, labels=(30, 20, 10, 0)):
+        # Capture of a live chart: the line grows and changes, the axes stay put
+        img, words, bboxes = render_template_chart(values, labels, until)
+        self.backend.add(img, words, bboxes)
+        return img
+
+    def test_matches_full_run(self):
+        metrics = ExtractionMetrics()
+        session = LiveChartSession(ocr_backend=self.backend, metrics=metrics)
+        previous = None
+        for i, frame in enumerate(self.frames):
+            expected = ChartPipeline(ocr_backend=self.backend).run(frame).time_series
+            calls = self.backend.calls
+            update = session.update(frame)
+            self.assertEqual(update.time_series, expected)
+            self.assertIs(session.time_series, update.time_series)
+            # the axes are only OCR-ed again when they changed
+            self.assertEqual(update.full, i in (0, 6))
+            self.assertEqual(self.backend.calls - calls, int(update.full))
+
+            if previous is None:
+                self.assertEqual(len(update.changed), len(expected))
+            else:
+                differs = [
+                    k
+                    for k, (old, new) in enumerate(zip(previous, expected))
+                    if old != new
+                ]
+                self.assertEqual(update.changed.tolist(), differs)
+            self.assertEqual(
+                update.changed_points(), [expected[k] for k in update.changed]
+            )
+            previous = expected
+
+        # an identical frame changes nothing and is not traced again
+        columns = metrics.counters["columns_traced"]
+        update = session.update(self.frames[-1])
+        self.assertFalse(update.full)
+        self.assertEqual(update.changed_points(), [])
+        self.assertEqual(metrics.counters["columns_traced"], columns)
+
+    def test_retraces_changed_columns_only(self):
+        metrics = ExtractionMetrics()
+        session = LiveChartSession(ocr_backend=self.backend, metrics=metrics)
+        session.update(self.frames[1])
+        columns = metrics.counters["columns_traced"]
+        update = session.update(self.frames[2])
+        self.assertFalse(update.full)
+        self.assertLess(metrics.counters["columns_traced"] - columns, 20)
+        self.assertGreater(len(update.changed), 0)
+
+    def test_reset_and_new_size(self):
+        session = LiveChartSession(ocr_backend=self.backend)
+        session.update(self.frames[0])
+        session.reset()
+        self.assertIsNone(session.time_series)
+        self.assertTrue(session.update(self.frames[1]).full)
+
+        img, words, bboxes = render_template_chart([5, 20, 12], until=300)
+        img = cv2.copyMakeBorder(img, 0, 10, 0, 10, cv2.BORDER_CONSTANT, value=255)
+        self.backend.add(img, words, bboxes)
+        self.assertTrue(session.update(img).full)
+
+    def test_multi_series_keeps_axes(self):
+        frames = [cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR) for frame in self.frames]
+        session = LiveChartSession(ocr_backend=self.backend, n_series=2)
+        session.update(frames[0])
+        calls = self.backend.calls
+        update = session.update(frames[1])
+        self.assertFalse(update.full)
+        self.assertEqual(self.backend.calls, calls)
+        expected = ChartPipeline(ocr_backend=self.backend, n_series=2).run(frames[1])
+        self.assertEqual(update.time_series, expected.time_series)
@@ -0,0 +1,138 @@
+import importlib.util
+import os
+import stat
+import tempfile
+import threading
+from multiprocessing import Pipe
+from unittest import TestCase, mock, skipUnless
+
+import cv2
+import numpy as np
+
+import ocr_backends
+from ocr_backends import FakeOcrBackend, TesseractWorkerBackend
+from ocr_cache import OcrCache
+from ocr_utils import ocr
+
+FAKE_TESSERACT = """#!/bin/sh
+cat > /dev/null
+printf 'level\\tpage_num\\tblock_num\\tpar_num\\tline_num\\tword_num\\t'
+printf 'left\\ttop\\twidth\\theight\\tconf\\ttext\\n'
+printf '1\\t1\\t0\\t0\\t0\\t0\\t0\\t0\\t64\\t32\\t-1\\t\\n'
+printf '5\\t1\\t1\\t1\\t1\\t1\\t3\\t4\\t20\\t10\\t96\\t2024\\n'
+"""
+
+
+class TestFakeOcrBackend(TestCase):
+    def setUp(self):
+        self.img = np.zeros((32, 64), dtype=np.uint8)
+        self.backend = FakeOcrBackend()
+        self.backend.add(self.img, ["2024"], [[3, 4, 23, 14]])
+
+    def test_lookup_by_content(self):
+        self.assertEqual(
+            ocr(self.img.copy(), backend=self.backend), (["2024"], [[3, 4, 23, 14]])
+        )
+        self.assertEqual(ocr(self.img + 1, backend=self.backend), ([], []))
+
+    def test_default_callable(self):
+        backend = FakeOcrBackend(default=lambda img: (["x"], [[0, 0, *img.shape]]))
+        self.assertEqual(backend.recognize(self.img), (["x"], [[0, 0, 32, 64]]))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "fixture.json")
+            self.backend.save(path)
+            loaded = FakeOcrBackend.load(path)
+        self.assertEqual(loaded.recognize(self.img), (["2024"], [[3, 4, 23, 14]]))
+
+    def test_cache_skips_backend(self):
+        cache = OcrCache()
+        ocr(self.img, cache=cache, backend=self.backend)
+        ocr(self.img, cache=cache, backend=self.backend)
+        self.assertEqual(self.backend.calls, 1)
+
+
+class TestTesseractWorkerBackend(TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.img = np.full((32, 64), 255, dtype=np.uint8)
+
+    def test_workers_parse_tesseract_tsv(self):
+        cmd = os.path.join(self.tmp_dir.name, "tesseract")
+        with open(cmd, "w") as f:
+            f.write(FAKE_TESSERACT)
+        os.chmod(cmd, os.stat(cmd).st_mode | stat.S_IEXEC)
+
+        with TesseractWorkerBackend(
+            workers=1, tesseract_cmd=cmd, engine="cli"
+        ) as backend:
+            for _ in range(2):
+                self.assertEqual(
+                    backend.recognize(self.img), (["2024"], [[3, 4, 23, 14]])
+                )
+
+    def test_worker_errors_are_reported(self):
+        missing = os.path.join(self.tmp_dir.name, "no-tesseract")
+        with TesseractWorkerBackend(
+            workers=1, tesseract_cmd=missing, engine="cli"
+        ) as backend:
+            with self.assertRaisesRegex(RuntimeError, "Traceback(.|\n)*not found"):
+                backend.recognize(self.img)
+
+    def test_dead_worker_is_replaced(self):
+        cmd = os.path.join(self.tmp_dir.name, "tesseract")
+        with open(cmd, "w") as f:
+            f.write(FAKE_TESSERACT)
+        os.chmod(cmd, os.stat(cmd).st_mode | stat.S_IEXEC)
+
+        with TesseractWorkerBackend(
+            workers=1, tesseract_cmd=cmd, engine="cli"
+        ) as backend:
+            backend.recognize(self.img)
+            process, _ = backend._processes[0]
+            process.kill()
+            process.join()
+            with self.assertRaises(RuntimeError) as cm:
+                backend.recognize(self.img)
+            self.assertIsInstance(cm.exception.__cause__, (EOFError, OSError))
+            self.assertEqual(backend.recognize(self.img), (["2024"], [[3, 4, 23, 14]]))
+
+    def test_worker_reuses_its_engine(self):
+        engines = []
+
+        def engine(config, tesseract_cmd):
+            engines.append(config)
+            return lambda img: ([str(img.sum())], [[0, 0, *img.shape[::-1]]])
+
+        conn, child_conn = Pipe()
+        with mock.patch.dict(ocr_backends._ENGINES, {"tesserocr": engine}):
+            worker = threading.Thread(
+                target=ocr_backends._tesseract_worker,
+                args=(child_conn, "tesserocr", "--psm 11", "tesseract"),
+            )
+            worker.start()
+            for value in range(3):
+                conn.send(np.full((2, 3), value, dtype=np.uint8))
+                self.assertEqual(
+                    conn.recv(), ("ok", ([str(6 * value)], [[0, 0, 3, 2]]))
+                )
+            conn.send(None)
+            worker.join()
+        self.assertEqual(engines, ["--psm 11"])
+
+    def test_unknown_engine(self):
+        with self.assertRaises(ValueError):
+            TesseractWorkerBackend(engine="spline")
+
+    @skipUnless(importlib.util.find_spec("tesserocr"), "tesserocr is not installed")
+    def test_tesserocr_engine(self):
+        img = np.full((80, 240), 255, dtype=np.uint8)
+        cv2.putText(img, "2024", (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 1.5, 0, 3)
+        with TesseractWorkerBackend(workers=1) as backend:
+            for _ in range(2):
+                words, bboxes = backend.recognize(img)
+                self.assertEqual(words, ["2024"])
+                left, top, right, bottom = bboxes[0]
+                self.assertTrue(left < 30 and top < 35 and right > 110 and bottom > 55)
@@ -0,0 +1,99 @@
+import os
+import pickle
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from ocr_cache import OcrCache
+from ocr_utils import ocr
+
+TESSERACT_OUTPUT = {
+    "text": ["", "2024", "10"],
+    "left": [0, 5, 40],
+    "top": [0, 7, 9],
+    "width": [0, 20, 10],
+    "height": [0, 8, 8],
+}
+
+
+class TestOcrCache(TestCase):
+    def setUp(self):
+        self.img = np.arange(64 * 48, dtype=np.uint32).reshape(64, 48).astype(np.uint8)
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_identical_images_skip_tesseract(self):
+        cache = OcrCache(cache_dir=self.tmp_dir.name)
+        with patch(
+            "ocr_backends.pytesseract.image_to_data", return_value=TESSERACT_OUTPUT
+        ) as image_to_data:
+            first = ocr(self.img, cache=cache)
+            second = ocr(self.img.copy(), cache=cache)
+        self.assertEqual(image_to_data.call_count, 1)
+        self.assertEqual(first, (["2024", "10"], [[5, 7, 25, 15], [40, 9, 50, 17]]))
+        self.assertEqual(first, second)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_disk_tier_survives_new_cache_instance(self):
+        key = OcrCache.make_key(self.img, "--psm 11")
+        OcrCache(cache_dir=self.tmp_dir.name).put(key, (["a"], [[1, 2, 3, 4]]))
+
+        cache = pickle.loads(pickle.dumps(OcrCache(cache_dir=self.tmp_dir.name)))
+        self.assertEqual(cache.get(key), (["a"], [[1, 2, 3, 4]]))
+        self.assertEqual(cache.stats()["disk_hits"], 1)
+        self.assertIsNone(cache.get(OcrCache.make_key(self.img, "--psm 6")))
+
+    def test_eviction(self):
+        cache = OcrCache(
+            max_memory_items=2, cache_dir=self.tmp_dir.name, max_disk_bytes=100
+        )
+        keys = [OcrCache.make_key(self.img + i, "") for i in range(4)]
+        for key in keys:
+            cache.put(key, (["word"], [[0, 0, 1, 1]]))
+        self.assertEqual(cache.stats()["memory_items"], 2)
+        disk_bytes = sum(size for _, size, _ in cache._disk_entries())
+        self.assertLessEqual(disk_bytes, 100)
+        self.assertIsNotNone(cache.get(keys[-1]))
+
+    def test_overwrite_keeps_disk_size(self):
+        cache = OcrCache(cache_dir=self.tmp_dir.name)
+        key = OcrCache.make_key(self.img, "")
+        for _ in range(3):
+            cache.put(key, (["word"], [[0, 0, 1, 1]]))
+        disk_bytes = sum(size for _, size, _ in cache._disk_entries())
+        self.assertEqual(cache._disk_bytes, disk_bytes)
+
+    def test_failed_write_is_not_fatal(self):
+        cache = OcrCache(cache_dir=self.tmp_dir.name)
+        key = OcrCache.make_key(self.img, "")
+        with patch("ocr_cache.os.replace", side_effect=OSError("disk full")):
+            with self.assertLogs("ocr_cache", "WARNING"):
+                cache.put(key, (["word"], [[0, 0, 1, 1]]))
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+        self.assertEqual(cache._disk_bytes, 0)
+        self.assertEqual(cache.get(key), (["word"], [[0, 0, 1, 1]]))
+
+    def test_malformed_disk_entry_is_a_miss(self):
+        cache = OcrCache(cache_dir=self.tmp_dir.name)
+        key = OcrCache.make_key(self.img, "")
+        for content in (
+            "[1, 2]",
+            '{"words": ["word"]}',
+            '{"words": "word", "bboxes": [[0, 0, 1, 1]]}',
+            '{"words": ["word"], "bboxes": [[0, 0, 1]]}',
+            '{"words": ["word", "more"], "bboxes": [[0, 0, 1, 1]]}',
+            "{",
+        ):
+            with open(os.path.join(self.tmp_dir.name, f"{key}.json"), "w") as f:
+                f.write(content)
+            with self.subTest(content=content):
+                self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.stats()["misses"], 6)
+        # OCR runs and replaces the entry
+        cache.put(key, (["word"], [[0, 0, 1, 1]]))
+        self.assertEqual(
+            OcrCache(cache_dir=self.tmp_dir.name).get(key), (["word"], [[0, 0, 1, 1]])
+        )
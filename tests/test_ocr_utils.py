@@ -1,14 +1,68 @@
+from datetime import datetime
 from unittest import TestCase
 
-from ocr_utils import texts_to_datetimes
+import numpy as np
+
+from date_utils import DateComponentClassifier, classify_date_component
+from ocr_utils import (
+    clear_label_caches,
+    parse_axis_labels,
+    parse_number,
+    texts_to_datetimes,
+    texts_to_numbers,
+)
 from tests.test_data import texts_to_datetimes_data
 
 
 class TestUtils(TestCase):
     def setUp(self):
-        pass
+        clear_label_caches()
 
     def test_texts_to_datetimes(self):
         for i, (texts, expected) in enumerate(texts_to_datetimes_data):
             result = texts_to_datetimes(texts)
             self.assertEqual(result, expected, f"Failed for input {i}: {texts}")
+
+    def test_texts_to_numbers(self):
+        texts = ["1,5", "1.5k", " 2M", "3 b", "45%", "-7", "abc", "", "k", "1.5k"]
+        np.testing.assert_array_equal(
+            texts_to_numbers(texts),
+            [1.5, 1500.0, 2e6, 3e9, 0.45, -7.0, np.nan, np.nan, np.nan, 1500.0],
+        )
+        # every distinct label is parsed once
+        info = parse_number.cache_info()
+        self.assertEqual(info.misses, len(set(texts)))
+        texts_to_numbers(texts)
+        self.assertEqual(parse_number.cache_info().misses, info.misses)
+
+    def test_classify_date_component(self):
+        classifier = DateComponentClassifier()
+        for text, expected in (
+            ("2024", "year"),
+            ("Jan", "month"),
+            ("september", "month"),
+            ("12", "month"),
+            ("31", "day"),
+            ("2023-05", "year and month"),
+            ("May 2023", "year and month"),
+            ("Dec 25", "month and day"),
+            ("25 Dec", "month and day"),
+            ("25.12.2023", "day, month and year"),
+        ):
+            self.assertEqual(classifier.classify(text), expected, text)
+            self.assertEqual(classify_date_component(text), expected, text)
+
+    def test_parse_axis_labels(self):
+        numbers, dates = parse_axis_labels(
+            ["10", "20", "30"], ["2020", "Jul", "2021", "Jul"]
+        )
+        self.assertEqual(numbers, [10.0, 20.0, 30.0])
+        self.assertEqual(
+            dates,
+            [
+                datetime(2020, 1, 1),
+                datetime(2020, 7, 1),
+                datetime(2021, 1, 1),
+                datetime(2021, 7, 1),
+            ],
+        )
@@ -0,0 +1,268 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import cv2
+import matplotlib
+import numpy as np
+import pandas as pd
+
+matplotlib.use("Agg")
+
+from chart_extraction import (  # noqa: E402
+    ChartPipeline,
+    extract_panels,
+    extract_time_series,
+    fill_gaps_in_time_series,
+    iter_fill_gaps,
+    iter_time_series,
+)
+from image_io import load_image  # noqa: E402
+from instrumentation import ExtractionMetrics  # noqa: E402
+from ocr_backends import FakeOcrBackend  # noqa: E402
+from tests.data_generation import (  # noqa: E402
+    SEP,
+    generate_linear_scaled,
+    generate_multi_series,
+    linear_chart_fixture,
+)
+from timeseries import TimeSeries  # noqa: E402
+
+
+class TestChartPipeline(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir, cls.image_path, cls.backend, _ = linear_chart_fixture(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def test_run_matches_extract_time_series(self):
+        artifacts = ChartPipeline(ocr_backend=self.backend).run(self.image_path)
+        expected = extract_time_series(self.image_path, ocr_backend=self.backend)
+        self.assertEqual(artifacts.time_series, expected)
+        self.assertEqual(artifacts.gray.ndim, 2)
+        self.assertEqual(len(artifacts.texts), len(artifacts.bboxes))
+        x1, y1, x2, y2 = artifacts.location
+        self.assertEqual(artifacts.chart_area.shape, (y2 - y1, x2 - x1))
+
+    def test_rerun_skips_upstream_stages(self):
+        artifacts = ChartPipeline(ocr_backend=self.backend).run(self.image_path)
+        calls = self.backend.calls
+        chart_area = artifacts.chart_area.copy()
+
+        tuned = ChartPipeline(allowed_margin=2, gap_fill="linear").rerun(
+            artifacts, "tracing"
+        )
+        self.assertEqual(self.backend.calls, calls)
+        self.assertIs(tuned.x_scale, artifacts.x_scale)
+        self.assertEqual(len(tuned.time_series), len(artifacts.time_series))
+        np.testing.assert_array_equal(artifacts.chart_area, chart_area)
+
+        # The source artifacts are left untouched and can be reused
+        again = ChartPipeline().rerun(artifacts, "fill_gaps")
+        self.assertEqual(again.time_series, artifacts.time_series)
+
+    def test_stream_matches_run(self):
+        expected = extract_time_series(self.image_path, ocr_backend=self.backend)
+        for chunk_size in (1, 100, 4096):
+            points = iter_time_series(
+                self.image_path, ocr_backend=self.backend, chunk_size=chunk_size
+            )
+            self.assertEqual(list(points), expected)
+
+    def test_pyramid_matches_full_resolution(self):
+        expected = ChartPipeline(ocr_backend=self.backend).run(self.image_path)
+        for levels in (1, 2, 3):
+            artifacts = ChartPipeline(
+                ocr_backend=self.backend, pyramid_levels=levels
+            ).run(self.image_path)
+            self.assertIsNone(artifacts.thresh)
+            self.assertEqual(artifacts.location, expected.location)
+            np.testing.assert_array_equal(
+                artifacts.grid_y_component_map, expected.grid_y_component_map
+            )
+            np.testing.assert_array_equal(
+                artifacts.grid_x_component, expected.grid_x_component
+            )
+            np.testing.assert_array_equal(artifacts.chart_area, expected.chart_area)
+            self.assertEqual(artifacts.time_series, expected.time_series)
+
+        # artifacts decoded in pyramid mode can be re-run at full resolution
+        again = ChartPipeline(ocr_backend=self.backend).rerun(
+            artifacts, "cut_chart_area"
+        )
+        self.assertEqual(again.time_series, expected.time_series)
+
+    def test_streaming_gap_filling(self):
+        rng = np.random.default_rng(0)
+        for n in (0, 3, 12, 60):
+            values = rng.random((n, 2)).tolist()
+            for row, gaps in zip(values, rng.random((n, 2)) < 0.6):
+                for k in np.flatnonzero(gaps):
+                    row[k] = None
+            time_series = [(x, row) for x, row in enumerate(values)]
+            expected = fill_gaps_in_time_series(
+                [(x, list(row)) for x, row in time_series], window_size=4
+            )
+            self.assertEqual(list(iter_fill_gaps(time_series, max_gap=3)), expected)
+            for mode, max_gap in (
+                ("linear", None),
+                ("linear", 2),
+                ("midpoint", 1),
+                ("midpoint", 0),
+                ("none", None),
+            ):
+                series = TimeSeries.from_points(time_series)
+                expected = series.fill_gaps(mode, max_gap).to_points()
+                points = iter_fill_gaps(time_series, mode, max_gap)
+                self.assertEqual(list(points), expected)
+
+    def test_unknown_stage(self):
+        with self.assertRaises(ValueError):
+            ChartPipeline().rerun(None, "unknown")
+
+
+class TestMultiSeries(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir = tempfile.TemporaryDirectory()
+        cls.image_path = os.path.join(cls.tmp_dir.name, "chart.png")
+        cls.csv_path = os.path.join(cls.tmp_dir.name, "chart.csv")
+        np.random.seed(2)
+        words, bboxes = generate_multi_series(
+            "2023-01-02",
+            "2023-12-29",
+            n_series=2,
+            output_csv=cls.csv_path,
+            output_image=cls.image_path,
+            figsize=(8, 4),
+            dpi=100,
+        )
+        gray = cv2.cvtColor(cv2.imread(cls.image_path), cv2.COLOR_BGR2GRAY)
+        cls.backend = FakeOcrBackend()
+        cls.backend.add(gray, words, bboxes)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp_dir.cleanup()
+
+    def relative_errors(self, time_series, k):
+        truth = pd.read_csv(self.csv_path, sep=SEP, parse_dates=["date"])
+        truth_x = truth["date"].values.astype("datetime64[s]").astype(float)
+        points = [(x, values[k]) for x, values in time_series if values[k] is not None]
+        x = np.array([np.datetime64(x, "s") for x, _ in points]).astype(float)
+        y = np.array([value for _, value in points])
+        errors = []
+        for column in ("value_0", "value_1"):
+            error = np.abs(np.interp(x, truth_x, truth[column]) - y)
+            errors.append(np.median(error) / truth[column].mean())
+        return errors
+
+    def test_series_are_traced_against_shared_scales(self):
+        calls = self.backend.calls
+        artifacts = ChartPipeline(ocr_backend=self.backend, n_series=2).run(
+            self.image_path
+        )
+        self.assertEqual(self.backend.calls, calls + 1)
+        self.assertEqual(len(artifacts.series_masks), 2)
+        self.assertTrue(all(len(v) == 2 for _, v in artifacts.time_series))
+
+        # Every traced series follows exactly one of the plotted series
+        matched = set()
+        for k in range(2):
+            errors = self.relative_errors(artifacts.time_series, k)
+            self.assertLess(min(errors), 0.05)
+            self.assertGreater(max(errors), 0.2)
+            matched.add(int(np.argmin(errors)))
+        self.assertEqual(matched, {0, 1})
+
+    def test_number_of_series_is_detected(self):
+        time_series = extract_time_series(
+            self.image_path, ocr_backend=self.backend, n_series=None
+        )
+        self.assertEqual(len(time_series[0][1]), 2)
+
+
+class TestPanels(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # 2 x 2 grid of charts with an empty cell
+        tmp_dir = tempfile.TemporaryDirectory()
+        np.random.seed(3)
+        tiles = []
+        for i in range(3):
+            path = os.path.join(tmp_dir.name, f"chart_{i}.png")
+            words, bboxes = generate_linear_scaled(
+                "2023-01-02",
+                "2023-12-29",
+                output_csv=os.path.join(tmp_dir.name, "chart.csv"),
+                output_image=path,
+                figsize=(6, 3.5),
+                dpi=100,
+            )
+            tiles.append((load_image(path, color=False), words, bboxes))
+        tmp_dir.cleanup()
+
+        height, width = tiles[0][0].shape
+        cls.image = np.full((2 * height, 2 * width), 255, dtype=np.uint8)
+        cls.words, cls.bboxes = [], []
+        for (tile, words, bboxes), (row, column) in zip(
+            tiles, [(0, 0), (0, 1), (1, 0)]
+        ):
+            x, y = column * width, row * height
+            cls.image[y : y + height, x : x + width] = tile
+            cls.words += words
+            cls.bboxes += [
+                [x1 + x, y1 + y, x2 + x, y2 + y] for x1, y1, x2, y2 in bboxes
+            ]
+        cls.backend = FakeOcrBackend()
+        cls.backend.add(cls.image, cls.words, cls.bboxes)
+
+    def test_panels_match_single_chart_runs(self):
+        calls = self.backend.calls
+        metrics = ExtractionMetrics()
+        results = extract_panels(self.image, ocr_backend=self.backend, metrics=metrics)
+        # one shared OCR pass
+        self.assertEqual(self.backend.calls, calls + 1)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(metrics.runs, 1)
+        self.assertIn("panel_detection", metrics.stages)
+        self.assertGreater(metrics.counters["columns_traced"], 0)
+
+        for index, result in enumerate(results):
+            self.assertEqual((result.index, result.status), (index, "ok"))
+            x1, y1, x2, y2 = result.box
+            crop = self.image[y1:y2, x1:x2].copy()
+            backend = FakeOcrBackend()
+            words, bboxes = [], []
+            for word, (left, top, right, bottom) in zip(self.words, self.bboxes):
+                if x1 <= (left + right) / 2 < x2 and y1 <= (top + bottom) / 2 < y2:
+                    words.append(word)
+                    bboxes.append([left - x1, top - y1, right - x1, bottom - y1])
+            backend.add(crop, words, bboxes)
+            expected = ChartPipeline(ocr_backend=backend).run(crop)
+            self.assertEqual(result.time_series, expected.time_series)
+            self.assertEqual(result.artifacts.location, expected.location)
+
+    def test_failing_panel(self):
+        image = self.image.copy()
+        height, width = image.shape
+        # a framed panel without labels or line
+        cv2.rectangle(
+            image, (width // 2 + 80, height // 2 + 30), (width - 30, height - 50), 0, 1
+        )
+        backend = FakeOcrBackend()
+        backend.add(image, self.words, self.bboxes)
+        results = ChartPipeline(ocr_backend=backend).run_panels(image, max_workers=2)
+        self.assertEqual([r.status for r in results], ["ok", "ok", "ok", "error"])
+        self.assertIsNone(results[3].time_series)
+        self.assertIsNotNone(results[3].error)
+
+    def test_single_chart(self):
+        height, width = self.image.shape
+        chart = self.image[: height // 2, : width // 2].copy()
+        results = ChartPipeline(ocr_backend=self.backend).run_panels(chart)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0].box, (0, 0, width // 2, height // 2))
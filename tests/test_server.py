@@ -0,0 +1,225 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+from unittest import TestCase
+
+import cv2
+import matplotlib
+import numpy as np
+
+matplotlib.use("Agg")
+
+from chart_extraction import extract_time_series  # noqa: E402
+from ocr_backends import FakeOcrBackend  # noqa: E402
+from server import ExtractionServer, parse_options  # noqa: E402
+from tests.data_generation import linear_chart_fixture  # noqa: E402
+
+
+class SlowOcrBackend(FakeOcrBackend):
+    def __init__(self, delay, **kwargs):
+        super().__init__(**kwargs)
+        self.delay = delay
+
+    def recognize(self, img):
+        time.sleep(self.delay)
+        return super().recognize(img)
+
+
+class ServerThread:
+    """Run an `ExtractionServer` on an event loop in a background thread."""
+
+    def __init__(self, server):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        self._call(self.server.start())
+        self.host, self.port = self.server.address
+        return self
+
+    def __exit__(self, *exc):
+        self._call(self.server.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(60)
+
+    def request(self, method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            response = conn.getresponse()
+            return response.status, dict(response.getheaders()), response.read()
+        finally:
+            conn.close()
+
+
+class TestParseOptions(TestCase):
+    def test_options(self):
+        self.assertEqual(parse_options(""), {"format": "json"})
+        self.assertEqual(
+            parse_options("n_series=0&gap_fill=linear&max_gap=none&format=csv"),
+            {"format": "csv", "n_series": None, "gap_fill": "linear", "max_gap": None},
+        )
+        self.assertEqual(parse_options("n_series=2&max_gap=3")["max_gap"], 3)
+
+    def test_invalid_options(self):
+        for query in (
+            "format=xml",
+            "n_series=-1",
+            "n_series=two",
+            "gap_fill=cubic",
+            "max_gap=x",
+            "unknown=1",
+        ):
+            with self.subTest(query=query), self.assertRaises(ValueError):
+                parse_options(query)
+
+
+class TestExtractionServer(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp_dir, cls.image_path, cls.backend, _ = linear_chart_fixture(3)
+        with open(cls.image_path, "rb") as f:
+            cls.encoded = f.read()
+        cls.server = ServerThread(
+            ExtractionServer(port=0, workers=1, ocr_backend=cls.backend)
+        )
+        cls.server.__enter__()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.__exit__(None, None, None)
+        cls.tmp_dir.cleanup()
+
+    def test_extract_matches_library(self):
+        status, headers, body = self.server.request("POST", "/extract", self.encoded)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers["Content-Type"], "application/json")
+        result = json.loads(body)
+        expected = extract_time_series(self.image_path, ocr_backend=self.backend)
+        self.assertEqual(
+            result["dates"], [x.isoformat() for x, _ in expected.to_points()]
+        )
+        self.assertEqual(result["values"], [v for _, v in expected.to_points()])
+
+    def test_csv_output(self):
+        status, headers, body = self.server.request(
+            "POST", "/extract?format=csv&gap_fill=none", self.encoded
+        )
+        self.assertEqual(status, 200)
+        lines = body.decode().splitlines()
+        self.assertEqual(lines[0], "date;value")
+        expected = extract_time_series(self.image_path, ocr_backend=self.backend)
+        self.assertEqual(len(lines), len(expected) + 1)
+
+    def test_client_errors(self):
+        cases = [
+            ("GET", "/nowhere", None, 404),
+            ("GET", "/extract", None, 405),
+            ("POST", "/extract?format=xml", self.encoded, 400),
+            ("POST", "/extract", b"", 400),
+            ("POST", "/extract", b"not an image", 422),
+        ]
+        for method, path, body, expected_status in cases:
+            with self.subTest(method=method, path=path):
+                status, _, body = self.server.request(method, path, body)
+                self.assertEqual(status, expected_status)
+                self.assertIn("error", json.loads(body))
+
+    def test_health_and_metrics(self):
+        status, _, body = self.server.request("GET", "/healthz")
+        self.assertEqual(status, 200)
+        health = json.loads(body)
+        self.assertEqual(health["status"], "ok")
+        self.assertEqual(health["workers"], 1)
+
+        self.server.request("POST", "/extract", self.encoded)
+        status, headers, body = self.server.request("GET", "/metrics")
+        self.assertEqual(status, 200)
+        text = body.decode()
+        self.assertIn('chart_extraction_http_responses_total{code="200"}', text)
+        self.assertIn('chart_extraction_stage_wall_seconds_total{stage="ocr"}', text)
+        runs = [line for line in text.splitlines() if line.startswith("chart_")]
+        runs = dict(line.rsplit(" ", 1) for line in runs)
+        self.assertGreaterEqual(int(runs["chart_extraction_runs_total"]), 1)
+        self.assertEqual(runs["chart_extraction_queued_jobs"], "0")
+
+
+class TestBackpressure(TestCase):
+    # A valid image, so that the job reaches the slow OCR stage
+    blank = cv2.imencode(".png", np.full((60, 80), 255, np.uint8))[1].tobytes()
+
+    def _wait_for(self, server, key, value):
+        for _ in range(500):
+            _, _, body = server.request("GET", "/healthz")
+            if json.loads(body)[key] == value:
+                return
+            time.sleep(0.01)
+        self.fail(f"{key} never reached {value}")
+
+    def test_full_queue_is_rejected(self):
+        backend = SlowOcrBackend(1.0)
+        server = ExtractionServer(
+            port=0, workers=1, queue_size=1, timeout=30, ocr_backend=backend
+        )
+        with ServerThread(server) as thread:
+            statuses = []
+            clients = [
+                threading.Thread(
+                    target=lambda: statuses.append(
+                        thread.request("POST", "/extract", self.blank)[0]
+                    )
+                )
+                for _ in range(2)
+            ]
+            clients[0].start()
+            self._wait_for(thread, "in_flight", 1)
+            clients[1].start()
+            self._wait_for(thread, "queued", 1)
+
+            status, headers, _ = thread.request("POST", "/extract", self.blank)
+            self.assertEqual(status, 429)
+            self.assertEqual(headers["Retry-After"], "1")
+            for client in clients:
+                client.join()
+            # both accepted charts have no labels, but they were processed
+            self.assertEqual(sorted(statuses), [422, 422])
+
+    def test_timeout(self):
+        server = ExtractionServer(
+            port=0, workers=1, timeout=0.2, ocr_backend=SlowOcrBackend(1.0)
+        )
+        with ServerThread(server) as thread:
+            status, _, body = thread.request("POST", "/extract", self.blank)
+            self.assertEqual(status, 504)
+            self.assertIn("error", json.loads(body))
+
+
+class TestWorkerPool(TestCase):
+    def test_health_reports_dead_workers(self):
+        server = ExtractionServer(port=0, workers=1, ocr_backend=FakeOcrBackend())
+        with ServerThread(server) as thread:
+            self.assertEqual(thread.request("GET", "/healthz")[0], 200)
+            (process,) = server._pool._processes.values()
+            process.kill()
+            process.join()
+
+            status, _, body = thread.request("GET", "/healthz")
+            self.assertEqual(status, 503)
+            self.assertEqual(json.loads(body)["status"], "restarting")
+            for _ in range(500):
+                status, _, body = thread.request("GET", "/healthz")
+                if status == 200:
+                    break
+                time.sleep(0.01)
+            self.assertEqual(json.loads(body)["status"], "ok")
+            # the new pool serves jobs
+            blank = TestBackpressure.blank
+            self.assertEqual(thread.request("POST", "/extract", blank)[0], 422)
@@ -0,0 +1,58 @@
+from datetime import datetime
+from unittest import TestCase
+
+import numpy as np
+
+from timeseries import TimeSeries
+
+POINTS = [
+    (datetime(2024, 1, 1), [1.5, None]),
+    (datetime(2024, 1, 2, 6, 0, 0, 250), [None, 2.0]),
+    (datetime(2024, 1, 3), [3.25, 4.0]),
+]
+
+
+class TestTimeSeries(TestCase):
+    def setUp(self):
+        self.series = TimeSeries.from_points(POINTS)
+
+    def test_columns(self):
+        self.assertEqual(self.series.x.dtype, np.dtype("datetime64[ns]"))
+        self.assertEqual(self.series.values.shape, (3, 2))
+        np.testing.assert_array_equal(
+            self.series.valid, [[True, False], [False, True], [True, True]]
+        )
+        self.assertEqual(self.series.n_series, 2)
+        self.assertEqual(len(self.series), 3)
+
+    def test_compatibility_view(self):
+        self.assertEqual(self.series.to_points(), POINTS)
+        self.assertEqual(list(self.series), POINTS)
+        self.assertEqual(self.series, POINTS)
+        self.assertEqual(self.series[1], POINTS[1])
+        self.assertEqual(self.series[-1], POINTS[-1])
+        self.assertEqual(self.series[1:], POINTS[1:])
+        for x_value, values in self.series:
+            self.assertIsInstance(x_value, datetime)
+            self.assertIsInstance(values, list)
+
+    def test_zero_copy_conversions(self):
+        self.assertIs(self.series.to_numpy(), self.series.values)
+        df = self.series.to_pandas()
+        self.assertEqual(list(df.columns), ["value_0", "value_1"])
+        self.assertTrue(np.shares_memory(df.to_numpy(), self.series.values))
+        self.assertTrue(np.shares_memory(df.index.asi8, self.series.x))
+        self.assertEqual(int(df.isna().sum().sum()), 2)
+
+    def test_mask_is_applied_to_values(self):
+        series = TimeSeries([1.0, 2.0], [[5.0], [6.0]], valid=[[True], [False]])
+        self.assertEqual(series.to_points(), [(1.0, [5.0]), (2.0, [None])])
+        self.assertEqual(list(series.to_pandas().columns), ["value"])
+        with self.assertRaises(ValueError):
+            TimeSeries([1.0, 2.0], [[5.0], [6.0]], valid=[True, False])
+        with self.assertRaises(ValueError):
+            TimeSeries([1.0], [[5.0], [6.0]])
+
+    def test_equality(self):
+        self.assertEqual(self.series, TimeSeries.from_points(POINTS))
+        self.assertNotEqual(self.series, TimeSeries.from_points(POINTS[:2]))
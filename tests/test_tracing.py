@@ -0,0 +1,106 @@
+from unittest import TestCase
+
+import numpy as np
+
+from chart_extraction import (
+    extract_time_series_from_chart_area,
+    iter_line_values,
+    locate_line_pixels,
+)
+from function import Linear
+from geometry import cluster_data
+
+
+def _reference_trace(chart_area, x_scale, y_scale, grid_x, grid_y_map, margin, rev):
+    # Per-column tracer the vectorized implementation must reproduce exactly
+    time_series = []
+    width = chart_area.shape[1]
+    for x in range(width - 1, -1, -1) if rev else range(width):
+        x_date = x_scale(x)
+        if x in grid_x:
+            time_series.append((x_date, [None]))
+            continue
+        ys = np.nonzero(chart_area[~grid_y_map, x])[0]
+        if ys.size == 0:
+            time_series.append((x_date, [None]))
+            continue
+        unique_diffs = np.unique(np.diff(ys))
+        y = np.mean(ys)
+        if unique_diffs.size > 1 and any(d > margin for d in unique_diffs[1:]):
+            recent = [p for _, pts in time_series[-5:] for p in pts if p is not None]
+            if recent:
+                inverted = y_scale.invert(np.mean(recent))
+                clusters = cluster_data(ys, margin)
+                y = np.mean(min(clusters, key=lambda c: abs(np.mean(c) - inverted)))
+        time_series.append((x_date, [y_scale(y)]))
+    return time_series[::-1] if rev else time_series
+
+
+class TestTracing(TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.areas = []
+        for _ in range(20):
+            area = (rng.random((60, 80)) < rng.uniform(0.02, 0.2)).astype(np.uint8)
+            grid_y_map = np.zeros(60, dtype=bool)
+            grid_y_map[rng.choice(60, 3, replace=False)] = True
+            grid_x = np.sort(rng.choice(80, 4, replace=False))
+            self.areas.append((area, grid_x, grid_y_map))
+        self.x_scale = Linear(knots=[0, 79], values=[0.0, 1.0])
+        self.y_scale = Linear(knots=[0, 59], values=[100.0, 0.0])
+
+    def test_matches_reference_tracer(self):
+        for i, (area, grid_x, grid_y_map) in enumerate(self.areas):
+            for rev in (False, True):
+                expected = _reference_trace(
+                    area, self.x_scale, self.y_scale, grid_x, grid_y_map, 5, rev
+                )
+                result = extract_time_series_from_chart_area(
+                    area,
+                    self.x_scale,
+                    self.y_scale,
+                    grid_x,
+                    grid_y_map,
+                    grid_l=0,
+                    x_offset=0,
+                    y_offset=0,
+                    allowed_margin=5,
+                    reversed=rev,
+                )
+                self.assertEqual(result, expected, f"Failed for area {i}")
+
+    def test_chunked_tracing_matches_reference(self):
+        for i, (area, grid_x, grid_y_map) in enumerate(self.areas):
+            for rev in (False, True):
+                expected = _reference_trace(
+                    area, self.x_scale, self.y_scale, grid_x, grid_y_map, 5, rev
+                )
+                expected = [value[0] for _, value in expected]
+                for chunk_size in (1, 7, 80):
+                    values = list(
+                        iter_line_values(
+                            area,
+                            self.y_scale,
+                            grid_x,
+                            grid_y_map,
+                            y_offset=0,
+                            reversed=rev,
+                            chunk_size=chunk_size,
+                        )
+                    )
+                    self.assertEqual(
+                        values[::-1] if rev else values,
+                        expected,
+                        f"Failed for area {i}, chunk size {chunk_size}",
+                    )
+
+    def test_locate_line_pixels(self):
+        area = np.zeros((20, 4), dtype=np.uint8)
+        area[[3, 4, 5], 0] = 1  # single cluster
+        area[[2, 12], 1] = 1  # one gap only -> not ambiguous
+        area[[2, 3, 15], 2] = 1  # two clusters -> ambiguous
+        counts, means, ambiguous = locate_line_pixels(area, allowed_margin=5)
+        np.testing.assert_array_equal(counts, [3, 2, 3, 0])
+        np.testing.assert_array_equal(means[:3], [4.0, 7.0, 20 / 3])
+        self.assertTrue(np.isnan(means[3]))
+        np.testing.assert_array_equal(ambiguous, [False, False, True, False])
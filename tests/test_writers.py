@@ -0,0 +1,50 @@
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from unittest import TestCase
+
+import pandas as pd
+
+from writers import CsvWriter, JsonLinesWriter, open_writer
+
+POINTS = [
+    (datetime(2024, 1, 1), [1.5, None]),
+    (datetime(2024, 1, 2), [None, 2.0]),
+    (datetime(2024, 1, 3, 12), [3.25, 4.0]),
+]
+
+
+class TestWriters(TestCase):
+    def test_csv_round_trip(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "series.csv")
+            with open_writer(path) as writer:
+                self.assertIsInstance(writer, CsvWriter)
+                self.assertEqual(writer.write_all(iter(POINTS)), 3)
+            df = pd.read_csv(path, sep=";", parse_dates=["date"])
+        self.assertEqual(list(df.columns), ["date", "value_0", "value_1"])
+        self.assertEqual(df["date"].tolist(), [p[0] for p in POINTS])
+        self.assertEqual(df["value_0"].isna().tolist(), [False, True, False])
+        self.assertEqual(df["value_1"].iloc[2], 4.0)
+
+    def test_csv_single_series_header(self):
+        buffer = io.StringIO()
+        CsvWriter(buffer).write((datetime(2024, 1, 1), [1.0]))
+        self.assertEqual(buffer.getvalue().splitlines()[0], "date;value")
+
+    def test_json_lines(self):
+        buffer = io.StringIO()
+        with JsonLinesWriter(buffer, flush_every=1) as writer:
+            writer.write_all(POINTS)
+        records = [json.loads(line) for line in buffer.getvalue().splitlines()]
+        self.assertEqual(len(records), 3)
+        self.assertEqual(
+            records[0], {"date": "2024-01-01T00:00:00", "values": [1.5, None]}
+        )
+        self.assertFalse(buffer.closed)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            open_writer("series.xlsx")
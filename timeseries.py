@@ -0,0 +1,143 @@
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from function import datetime64_to_datetimes
+from gap_filling import fill_gaps
+
+
+class TimeSeries:
+    """
+    Columnar extraction result: one row per pixel column, one column per series.
+
+    - `x`: `datetime64[ns]` array (or float64 for charts with a numeric x axis)
+    - `values`: float64 array of shape (n, n_series), NaN where there is no value
+    - `valid`: bool array of the same shape, False for gaps
+
+    This takes 8 bytes per column plus 9 bytes per value, instead of a tuple,
+    a list, a `datetime` and boxed floats per column. For compatibility the
+    object also behaves like the former list of `(datetime, [value, ...])`
+    tuples with None for gaps: it can be iterated, indexed and compared to such
+    a list, and `to_points` returns it.
+    """
+
+    __slots__ = ("x", "values", "valid")
+
+    def __init__(self, x, values, valid: Optional[np.ndarray] = None):
+        x = np.asarray(x)
+        if x.dtype.kind == "M":
+            x = x.astype("datetime64[ns]", copy=False)
+        else:
+            x = x.astype(np.float64, copy=False)
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, None]
+        if values.ndim != 2 or len(values) != len(x):
+            raise ValueError(
+                f"Values of shape {values.shape} do not match {len(x)} x values"
+            )
+        if valid is None:
+            valid = ~np.isnan(values)
+        else:
+            valid = np.asarray(valid, dtype=bool)
+            if valid.shape != values.shape:
+                raise ValueError(
+                    f"Mask of shape {valid.shape} does not match values of "
+                    f"shape {values.shape}"
+                )
+            if not np.isnan(values[~valid]).all():
+                values = np.where(valid, values, np.nan)
+        self.x = x
+        self.values = values
+        self.valid = valid
+
+    @classmethod
+    def from_points(cls, points: Iterable) -> "TimeSeries":
+        """Build from `(x, [value, ...])` tuples, e.g. from `iter_time_series`."""
+        points = list(points)
+        if not points:
+            return cls(np.array([], dtype="datetime64[ns]"), np.zeros((0, 1)))
+        x_values, values = zip(*points)
+        x = np.array(x_values)
+        if x.dtype == object:  # python datetimes
+            x = x.astype("datetime64[us]")
+        return cls(x, np.array(values, dtype=np.float64))
+
+    @property
+    def n_series(self) -> int:
+        return self.values.shape[1]
+
+    def __len__(self):
+        return len(self.x)
+
+    def x_list(self) -> list:
+        """x values as python objects (datetimes rounded to microseconds)."""
+        if self.x.dtype.kind == "M":
+            return datetime64_to_datetimes(self.x)
+        return self.x.tolist()
+
+    def to_points(self) -> list:
+        """The former result format: list of (datetime, [value or None, ...])."""
+        rows = self.values.astype(object)
+        rows[~self.valid] = None
+        return list(zip(self.x_list(), rows.tolist()))
+
+    def fill_gaps(self, mode: str = "midpoint", max_gap: Optional[int] = None):
+        """New `TimeSeries` with gaps filled, see `gap_filling.fill_gaps`."""
+        values, valid = fill_gaps(self.values, self.valid, mode=mode, max_gap=max_gap)
+        return TimeSeries(self.x, values, valid)
+
+    def to_numpy(self) -> np.ndarray:
+        """The (n, n_series) value matrix (not a copy; gaps are NaN)."""
+        return self.values
+
+    def to_pandas(self, columns: Optional[list] = None) -> pd.DataFrame:
+        """
+        DataFrame indexed by x with one column per series, sharing memory with
+        this object (gaps are NaN).
+
+        :param columns: column names (default - "value" for a single series,
+            "value_0", "value_1", ... for several)
+        """
+        if columns is None:
+            columns = (
+                ["value"]
+                if self.n_series == 1
+                else [f"value_{k}" for k in range(self.n_series)]
+            )
+        index = pd.Index(self.x, copy=False, name="date")
+        return pd.DataFrame(self.values, index=index, columns=columns, copy=False)
+
+    def __iter__(self):
+        return iter(self.to_points())
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return TimeSeries(self.x[item], self.values[item], self.valid[item])
+        index = range(len(self))[item]  # normalizes negative indices
+        x_value = self[index : index + 1].x_list()[0]
+        values = self.values[index].tolist()
+        valid = self.valid[index].tolist()
+        return x_value, [v if ok else None for v, ok in zip(values, valid)]
+
+    def __eq__(self, other):
+        if isinstance(other, TimeSeries):
+            return all(
+                [
+                    np.array_equal(self.x, other.x),
+                    np.array_equal(self.valid, other.valid),
+                    np.array_equal(self.values, other.values, equal_nan=True),
+                ]
+            )
+        if isinstance(other, (list, tuple)):
+            return self.to_points() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return (
+            f"TimeSeries(n={len(self)}, n_series={self.n_series}, "
+            f"gaps={int((~self.valid).sum())})"
+        )
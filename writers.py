@@ -0,0 +1,119 @@
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Iterable, Optional
+
+SEP = ";"
+
+
+def _format_x(x_value):
+    return x_value.isoformat() if isinstance(x_value, date) else x_value
+
+
+class TimeSeriesWriter(ABC):
+    """
+    Incremental writer of `(x, [value, ...])` points.
+
+    Points are written as they come, so a stream from `iter_time_series` goes
+    to disk with bounded memory. Accepts a path or an open text file; a file
+    opened by the writer is closed by `close`.
+    """
+
+    def __init__(self, file, flush_every: int = 0):
+        """
+        :param file: path or text file object
+        :param flush_every: flush the file after this many points (0 - leave
+            it to the file buffering), so that readers can follow the output
+        """
+        self._owns_file = isinstance(file, (str, os.PathLike))
+        self.file = open(file, "w", newline="") if self._owns_file else file
+        self.flush_every = flush_every
+        self.count = 0
+
+    @abstractmethod
+    def _write(self, x_value, values):
+        pass
+
+    def write(self, point):
+        x_value, values = point
+        self._write(x_value, values)
+        self.count += 1
+        if self.flush_every and self.count % self.flush_every == 0:
+            self.file.flush()
+
+    def write_all(self, points: Iterable) -> int:
+        """Write every point of an iterable; return the number of points written."""
+        start = self.count
+        for point in points:
+            self.write(point)
+        return self.count - start
+
+    def close(self):
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvWriter(TimeSeriesWriter):
+    """
+    CSV output in the layout of the test data: `date;value` for a single series,
+    `date;value_0;value_1;...` for several. Gaps are written as empty fields.
+    """
+
+    def __init__(
+        self,
+        file,
+        columns: Optional[list] = None,
+        delimiter: str = SEP,
+        flush_every: int = 0,
+    ):
+        """
+        :param columns: header (default - derived from the first point)
+        :param delimiter: field delimiter
+        """
+        super().__init__(file, flush_every=flush_every)
+        self.columns = columns
+        self._writer = csv.writer(self.file, delimiter=delimiter)
+
+    def _write(self, x_value, values):
+        if self.count == 0:
+            if self.columns is None:
+                names = (
+                    ["value"]
+                    if len(values) == 1
+                    else [f"value_{k}" for k in range(len(values))]
+                )
+                self.columns = ["date", *names]
+            self._writer.writerow(self.columns)
+        row = ["" if value is None else value for value in values]
+        self._writer.writerow([_format_x(x_value), *row])
+
+
+class JsonLinesWriter(TimeSeriesWriter):
+    """One JSON object per point: `{"date": ..., "values": [...]}`."""
+
+    def _write(self, x_value, values):
+        record = {"date": _format_x(x_value), "values": list(values)}
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+WRITERS = {".csv": CsvWriter, ".jsonl": JsonLinesWriter, ".ndjson": JsonLinesWriter}
+
+
+def open_writer(path: str, **kwargs) -> TimeSeriesWriter:
+    """Writer chosen by the file extension (.csv, .jsonl or .ndjson)."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(
+            f"Unknown output format: {extension}. Expected one of {list(WRITERS)}"
+        )
+    return WRITERS[extension](path, **kwargs)